@@ -0,0 +1,165 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Pick the cost with benchmarks/password_cost.py so one verify stays inside the login latency budget
+PASSWORD_HASHER = "scrypt"
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = 600_000
+
+# Hashing releases the GIL, so a small pool verifies in parallel while capping how many cores a login wave can take
+VERIFY_WORKERS = 2
+
+SESSION_TTL = 3600
+# Set CURIOSCOPE_SESSION_SECRET to share tokens across processes; otherwise they only live as long as this one
+SESSION_SECRET = os.environ.get("CURIOSCOPE_SESSION_SECRET", "").encode() or secrets.token_bytes(32)
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+# Encoded as scrypt$n$r$p$salt$hash
+class ScryptHasher:
+    name = "scrypt"
+
+    def __init__(self, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+        self.n = n
+        self.r = r
+        self.p = p
+
+    def _derive(self, password, salt, n, r, p):
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p, dklen=32)
+
+    def hash(self, password):
+        salt = os.urandom(16)
+        digest = self._derive(password, salt, self.n, self.r, self.p)
+        return f"{self.name}${self.n}${self.r}${self.p}${_b64encode(salt)}${_b64encode(digest)}"
+
+    def verify(self, password, encoded):
+        _, n, r, p, salt, digest = encoded.split("$")
+        return hmac.compare_digest(self._derive(password, _b64decode(salt), int(n), int(r), int(p)), _b64decode(digest))
+
+    def needs_rehash(self, encoded):
+        return encoded.split("$")[1:4] != [str(self.n), str(self.r), str(self.p)]
+
+
+# Encoded as pbkdf2_sha256$iterations$salt$hash
+class Pbkdf2Hasher:
+    name = "pbkdf2_sha256"
+
+    def __init__(self, iterations=PBKDF2_ITERATIONS):
+        self.iterations = iterations
+
+    def hash(self, password):
+        salt = os.urandom(16)
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, self.iterations)
+        return f"{self.name}${self.iterations}${_b64encode(salt)}${_b64encode(digest)}"
+
+    def verify(self, password, encoded):
+        _, iterations, salt, digest = encoded.split("$")
+        computed = hashlib.pbkdf2_hmac("sha256", password.encode(), _b64decode(salt), int(iterations))
+        return hmac.compare_digest(computed, _b64decode(digest))
+
+    def needs_rehash(self, encoded):
+        return encoded.split("$")[1] != str(self.iterations)
+
+
+HASHERS = {ScryptHasher.name: ScryptHasher, Pbkdf2Hasher.name: Pbkdf2Hasher}
+
+_hasher = HASHERS[PASSWORD_HASHER]()
+_verify_pool = ThreadPoolExecutor(max_workers=VERIFY_WORKERS, thread_name_prefix="password-verify")
+
+
+# Unsalted hex SHA-256 written by the original hash_password
+def is_legacy_hash(encoded):
+    return len(encoded) == 64 and "$" not in encoded
+
+
+def hash_password(password):
+    return _hasher.hash(password)
+
+
+# Returns (matches, needs_rehash); legacy and outdated-cost hashes always need a rehash
+def verify_password(password, encoded):
+    if not encoded:
+        return False, False
+    if is_legacy_hash(encoded):
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), encoded), True
+
+    scheme = encoded.split("$", 1)[0]
+    if scheme not in HASHERS:
+        return False, False
+    matches = HASHERS[scheme]().verify(password, encoded)
+    return matches, scheme != _hasher.name or _hasher.needs_rehash(encoded)
+
+
+# Hash of a random password under the current hasher, checked when the username doesn't exist so an unknown user
+# takes as long to reject as a wrong password. Rebuilt if the hasher is swapped (benchmarks do that).
+_dummy_hash = (None, None)
+
+
+def dummy_hash():
+    global _dummy_hash
+    hasher, encoded = _dummy_hash
+    if hasher is not _hasher:
+        encoded = _hasher.hash(secrets.token_urlsafe(16))
+        _dummy_hash = (_hasher, encoded)
+    return encoded
+
+
+def hash_password_bounded(password):
+    return _verify_pool.submit(hash_password, password).result()
+
+
+def verify_password_bounded(password, encoded):
+    return _verify_pool.submit(verify_password, password, encoded).result()
+
+
+# username|expiry|nonce|signature, HMAC-signed so a rerun can trust it without touching the database. The nonce
+# keeps tokens issued to the same user in the same second apart, since the token also keys their sessions row.
+def issue_session_token(username, ttl=SESSION_TTL):
+    payload = f"{username}|{int(time.time() + ttl)}|{secrets.token_urlsafe(16)}"
+    signature = hmac.new(SESSION_SECRET, payload.encode(), hashlib.sha256).digest()
+    return _b64encode(f"{payload}|{_b64encode(signature)}".encode())
+
+
+# (username, expiry) from a genuine, unexpired token, otherwise None
+def _decode_session_token(token):
+    # Anything a client can put in the URL lands here, so every decode step must fail as None, never raise
+    try:
+        username, expires, nonce, signature = _b64decode(token).decode().rsplit("|", 3)
+        signature = _b64decode(signature)
+        expires = int(expires)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    expected = hmac.new(SESSION_SECRET, f"{username}|{expires}|{nonce}".encode(), hashlib.sha256).digest()
+    if not hmac.compare_digest(expected, signature) or expires < time.time():
+        return None
+    return username, expires
+
+
+# Username the token was issued to, or None if it is forged, malformed or expired
+def verify_session_token(token):
+    decoded = _decode_session_token(token)
+    return decoded[0] if decoded else None
+
+
+# Sliding expiry: a valid token with less than half of ttl left is replaced by a fresh one, otherwise returned as
+# is; None if it isn't valid
+def renew_session_token(token, ttl=SESSION_TTL):
+    decoded = _decode_session_token(token)
+    if decoded is None:
+        return None
+    username, expires = decoded
+    return issue_session_token(username, ttl) if expires - time.time() < ttl / 2 else token
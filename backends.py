@@ -0,0 +1,133 @@
+import ast
+import os
+
+import cv2
+import numpy as np
+
+# Matches the ultralytics predict() defaults, so every backend hands the same candidates to filter_objects
+BACKEND_MIN_CONFIDENCE = 0.25
+NMS_IOU = 0.7
+MAX_DETECTIONS = 300
+IMAGE_SIZE = 640
+
+# 0 lets ONNX Runtime use every physical core; lower it when several app processes share a box
+ONNX_INTRA_OP_THREADS = int(os.environ.get("CURIOSCOPE_ONNX_THREADS", "0"))
+
+
+# Default PyTorch CPU path
+class UltralyticsBackend:
+    name = "pytorch"
+
+    def __init__(self, model_path):
+        from ultralytics import YOLO
+
+        self.model = YOLO(model_path)
+        self.names = dict(self.model.names)
+
+    # Returns, per frame, a list of (class_id, confidence, [x1, y1, x2, y2]) in frame pixels
+    def predict(self, frames, image_size=IMAGE_SIZE):
+        results = self.model(frames, imgsz=image_size, verbose=False)
+        return [
+            [(int(box.cls[0]), float(box.conf[0]), box.xyxy[0].tolist()) for box in result.boxes]
+            for result in results
+        ]
+
+
+def _letterbox(frame, size):
+    height, width = frame.shape[:2]
+    scale = min(size / height, size / width)
+    resized_w, resized_h = round(width * scale), round(height * scale)
+    pad_x, pad_y = (size - resized_w) / 2, (size - resized_h) / 2
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    left, top = int(round(pad_x - 0.1)), int(round(pad_y - 0.1))
+    canvas[top:top + resized_h, left:left + resized_w] = cv2.resize(frame, (resized_w, resized_h),
+                                                                    interpolation=cv2.INTER_LINEAR)
+    return canvas, scale, left, top
+
+
+# Exported YOLOv8 graph run through ONNX Runtime (OpenVINO execution provider when installed)
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, onnx_path, threads=ONNX_INTRA_OP_THREADS):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        providers = [p for p in ("OpenVINOExecutionProvider", "CPUExecutionProvider") if p in ort.get_available_providers()]
+        self.session = ort.InferenceSession(onnx_path, options, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+        # The ultralytics exporter stores the class map in the model metadata, so names stay identical to PyTorch
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = {int(k): v for k, v in ast.literal_eval(metadata["names"]).items()}
+
+    # The export has dynamic axes, so any multiple of 32 works as the input size
+    def predict(self, frames, image_size=IMAGE_SIZE):
+        letterboxed = [_letterbox(frame, image_size) for frame in frames]
+        batch = np.stack([canvas for canvas, _, _, _ in letterboxed])
+        # BGR HWC uint8 -> RGB CHW float in [0, 1]
+        batch = np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32) / 255.0
+        outputs = self.session.run(None, {self.input_name: batch})[0]
+        return [self._postprocess(output, *params[1:]) for output, params in zip(outputs, letterboxed)]
+
+    # output is (4 + num_classes, anchors): cx, cy, w, h followed by per-class scores
+    def _postprocess(self, output, scale, left, top):
+        predictions = output.T
+        scores = predictions[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
+        keep = confidences > BACKEND_MIN_CONFIDENCE
+        if not keep.any():
+            return []
+        boxes, class_ids, confidences = predictions[keep, :4], class_ids[keep], confidences[keep]
+
+        xywh = np.column_stack([boxes[:, 0] - boxes[:, 2] / 2, boxes[:, 1] - boxes[:, 3] / 2, boxes[:, 2], boxes[:, 3]])
+        indices = cv2.dnn.NMSBoxesBatched(xywh.tolist(), confidences.tolist(), class_ids.tolist(),
+                                          BACKEND_MIN_CONFIDENCE, NMS_IOU, top_k=MAX_DETECTIONS)
+        detections = []
+        for i in np.array(indices).flatten():
+            x, y, w, h = xywh[i]
+            x1, y1 = (x - left) / scale, (y - top) / scale
+            detections.append((int(class_ids[i]), float(confidences[i]), [x1, y1, x1 + w / scale, y1 + h / scale]))
+        return detections
+
+
+# Exports once next to the .pt file and reuses the result on later starts
+def export_onnx(model_path, int8=False):
+    onnx_path = os.path.splitext(model_path)[0] + ".onnx"
+    if not os.path.exists(onnx_path):
+        from ultralytics import YOLO
+
+        YOLO(model_path).export(format="onnx", dynamic=True, simplify=True, imgsz=IMAGE_SIZE)
+    if not int8:
+        return onnx_path
+
+    int8_path = os.path.splitext(model_path)[0] + "-int8.onnx"
+    if not os.path.exists(int8_path):
+        import onnx
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        # Dynamic quantisation keeps metadata (class names) and needs no calibration set;
+        # check it with benchmarks/backend_accuracy.py before switching production to it
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QUInt8)
+        model = onnx.load(int8_path)
+        if not any(prop.key == "names" for prop in model.metadata_props):
+            model.metadata_props.extend(onnx.load(onnx_path).metadata_props)
+            onnx.save(model, int8_path)
+    return int8_path
+
+
+BACKENDS = ("pytorch", "onnx", "onnx-int8")
+
+
+def load_backend(model_path, backend):
+    if backend == "pytorch":
+        return UltralyticsBackend(model_path)
+    if backend in ("onnx", "onnx-int8"):
+        onnx_backend = OnnxBackend(export_onnx(model_path, int8=backend == "onnx-int8"))
+        onnx_backend.name = backend
+        return onnx_backend
+    raise ValueError(f"Unknown detector backend {backend!r}; expected one of {', '.join(BACKENDS)}")
@@ -0,0 +1,130 @@
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+
+import cv2
+
+from detector import filter_objects, get_detector
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv", ".webm"}
+CHUNK_SIZE = 16
+
+
+def collect_inputs(paths):
+    videos, images = [], []
+    for path in paths:
+        files = [path]
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        for file in files:
+            extension = os.path.splitext(file)[1].lower()
+            if extension in VIDEO_EXTENSIONS:
+                videos.append(file)
+            elif extension in IMAGE_EXTENSIONS:
+                images.append(file)
+    return videos, images
+
+
+# Skipped frames are only grabbed, not decoded, which is most of the saving from striding
+def iter_video_chunks(path, stride=1, chunk_size=CHUNK_SIZE, max_frames=None):
+    cap = cv2.VideoCapture(path)
+    chunk = []
+    index = 0
+    taken = 0
+    while max_frames is None or taken < max_frames:
+        if index % stride:
+            if not cap.grab():
+                break
+        else:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            chunk.append(frame)
+            taken += 1
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        index += 1
+    if chunk:
+        yield chunk
+    cap.release()
+
+
+def _record(path, kind, frame_counts, frames, started):
+    return {
+        "path": path,
+        "type": kind,
+        "frames": frames,
+        "objects": sorted(frame_counts),
+        "frame_counts": dict(frame_counts),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def detect_video(path, stride=1, chunk_size=CHUNK_SIZE, max_frames=None):
+    detector = get_detector()
+    started = time.perf_counter()
+    frame_counts = Counter()
+    frames = 0
+    for chunk in iter_video_chunks(path, stride, chunk_size, max_frames):
+        for detections in detector.detect_batch(chunk):
+            frame_counts.update(filter_objects(detections))
+        frames += len(chunk)
+    return [_record(path, "video", frame_counts, frames, started)]
+
+
+def detect_images(paths):
+    detector = get_detector()
+    started = time.perf_counter()
+    loaded = [(path, cv2.imread(path)) for path in paths]
+    loaded = [(path, image) for path, image in loaded if image is not None]
+    results = detector.detect_batch([image for _, image in loaded]) if loaded else []
+    return [_record(path, "image", Counter(filter_objects(detections)), 1, started)
+            for (path, _), detections in zip(loaded, results)]
+
+
+def _run_task(task):
+    kind, payload, options = task
+    if kind == "video":
+        return detect_video(payload, options["stride"], options["chunk_size"], options["max_frames"])
+    return detect_images(payload)
+
+
+# Each worker process loads its own detector; pinning torch/OpenCV threads keeps N workers from oversubscribing cores
+def _init_worker(threads_per_worker):
+    cv2.setNumThreads(threads_per_worker)
+    import torch
+    torch.set_num_threads(threads_per_worker)
+
+
+def run_batch(paths, output, workers=None, stride=1, chunk_size=CHUNK_SIZE, max_frames=None):
+    videos, images = collect_inputs(paths)
+    options = {"stride": stride, "chunk_size": chunk_size, "max_frames": max_frames}
+    tasks = [("video", path, options) for path in videos]
+    tasks += [("images", images[i:i + chunk_size], options) for i in range(0, len(images), chunk_size)]
+    if not tasks:
+        print("No video or image files found.", file=sys.stderr)
+        return 1
+
+    workers = workers or os.cpu_count() or 1
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    started = time.perf_counter()
+    files = frames = 0
+    # spawn rather than fork: torch's thread pools don't survive a fork cleanly
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(min(workers, len(tasks)), initializer=_init_worker, initargs=(threads_per_worker,)) as pool:
+        for records in pool.imap_unordered(_run_task, tasks):
+            for record in records:
+                output.write(json.dumps(record) + "\n")
+                files += 1
+                frames += record["frames"]
+            output.flush()
+
+    elapsed = time.perf_counter() - started
+    print(f"{files} files, {frames} frames in {elapsed:.1f}s ({frames / elapsed:.1f} frames/s, {workers} workers)",
+          file=sys.stderr)
+    return 0
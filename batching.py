@@ -0,0 +1,117 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from detector import filter_objects, get_detector
+from workers import DETECTOR_WORKERS, RemoteDetectorPool
+
+MAX_BATCH_SIZE = 8
+MAX_WAIT_MS = 15
+# Queued by close() behind any pending frames
+_STOP = object()
+
+
+# Collects frames from every active session and runs them through the shared model in micro-batches
+class BatchScheduler:
+    def __init__(self, detector, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.detector = detector
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.frames = 0
+        self.closed = False
+        self.close_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name="batch-scheduler", daemon=True)
+        self.thread.start()
+
+    # Each caller gets a future that resolves to the detections for its own frame only
+    def submit(self, frame):
+        future = Future()
+        with self.close_lock:
+            if self.closed:
+                raise RuntimeError("batch scheduler is closed")
+            self.requests.put((frame, future))
+        return future
+
+    def detect(self, frame):
+        return self.submit(frame).result()
+
+    def detect_objects(self, frame):
+        return filter_objects(self.detect(frame))
+
+    # Block for the first frame, then wait at most max_wait for the batch to fill up. Returns (batch, stopping).
+    def _collect(self):
+        request = self.requests.get()
+        if request is _STOP:
+            return [], True
+        batch = [request]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is _STOP:
+                return batch, True
+            batch.append(request)
+        return batch, False
+
+    def _detect(self, batch):
+        try:
+            results = self.detector.detect_batch([frame for frame, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), detections in zip(batch, results):
+            future.set_result(detections)
+        self.batches += 1
+        self.frames += len(batch)
+
+    def _run(self):
+        while True:
+            batch, stopping = self._collect()
+            if batch:
+                self._detect(batch)
+            if stopping:
+                return
+
+    # Frames already submitted are still detected; later submits raise. Stops and joins the batching thread.
+    def close(self):
+        with self.close_lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.requests.put(_STOP)
+        self.thread.join()
+
+    def metrics(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "frames": self.frames,
+            "mean_batch_size": self.frames / self.batches if self.batches else 0.0,
+            "queue_depth": self.requests.qsize(),
+        }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+# With CURIOSCOPE_DETECTOR_WORKERS set, frames go to the detector worker processes instead of a local model
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            if DETECTOR_WORKERS:
+                _scheduler = RemoteDetectorPool(DETECTOR_WORKERS)
+            else:
+                _scheduler = BatchScheduler(get_detector())
+    return _scheduler
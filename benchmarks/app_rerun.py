@@ -0,0 +1,100 @@
+# Streamlit rerun cost for a logged-in session with insights on screen, scripted with AppTest and the local
+# Gemini stub. Point --script at an older checkout of curioscope.py to get the before/after comparison:
+#
+#   python benchmarks/app_rerun.py --reruns 30
+#   python benchmarks/app_rerun.py --script /tmp/old/curioscope.py --reruns 30
+#
+# AppTest re-executes the whole script for every interaction, fragment or not, so these are full-rerun costs:
+# they show what caching and the single-element leaderboard save. In the browser, interactions inside a
+# fragment (quiz, feedback, leaderboard) also skip everything outside it.
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from common import BENCHMARKS_DIR, percentile
+
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+OBJECTS = ["cup", "laptop"]
+
+
+def timed_runs(step, reruns):
+    latencies = []
+    for i in range(reruns):
+        start = time.perf_counter()
+        step(i)
+        latencies.append(time.perf_counter() - start)
+    return {"p50_ms": round(percentile(latencies, 50) * 1000, 1), "p95_ms": round(percentile(latencies, 95) * 1000, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--script", default=os.path.join(REPO_DIR, "curioscope.py"))
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=300, help="seconds allowed per run, incl. model load")
+    args = parser.parse_args()
+
+    from streamlit.testing.v1 import AppTest
+
+    from auth import issue_session_token
+    from fake_gemini import fake_payload
+
+    os.environ["CURIOSCOPE_FAKE_GEMINI"] = "1"
+    script = os.path.abspath(args.script)
+    # The app keeps its SQLite files and model weights relative to the working directory
+    workdir = tempfile.mkdtemp(prefix="curioscope-rerun-")
+    if os.path.exists(os.path.join(REPO_DIR, "yolov8n.pt")):
+        os.symlink(os.path.join(REPO_DIR, "yolov8n.pt"), os.path.join(workdir, "yolov8n.pt"))
+    os.chdir(workdir)
+    sys.path.insert(0, os.path.dirname(script))
+
+    try:
+        app = AppTest.from_file(script, default_timeout=args.timeout)
+        payload = fake_payload(OBJECTS)
+        quiz = payload["quiz"]
+        with open(script) as f:
+            # Since the insight schema landed, the session holds a validated Insight rather than the raw dict
+            if "shared_insight(" in f.read():
+                from schema import shared_insight
+
+                payload = shared_insight(payload)
+                quiz = payload.quiz
+        app.session_state["authenticated"] = True
+        app.session_state["username"] = "bench"
+        app.session_state["session_token"] = issue_session_token("bench")
+        app.session_state["handoff_token"] = ""
+        app.session_state["detected_objects"] = OBJECTS
+        app.session_state["quiz_data"] = quiz
+        app.session_state["quiz_answers"] = {i: None for i in range(len(quiz))}
+        app.session_state["ai_response"] = payload
+        app.session_state["ai_response_partial"] = False
+
+        start = time.perf_counter()
+        app.run()
+        first_run_ms = (time.perf_counter() - start) * 1000
+        if app.exception:
+            print(app.exception, file=sys.stderr)
+            return 1
+
+        options = list(fake_payload(OBJECTS)["quiz"][0]["options"].values())
+        report = {
+            "script": script,
+            "first_run_ms": round(first_run_ms, 1),
+            "markdown_elements": len(app.markdown),
+            "plain_rerun": timed_runs(lambda i: app.run(), args.reruns),
+            "quiz_answer": timed_runs(lambda i: app.radio(key="quiz_0").set_value(options[i % 2]).run(), args.reruns),
+            "theme_toggle": timed_runs(
+                lambda i: next(b for b in app.sidebar.button if b.label.startswith("Toggle Theme")).click().run(),
+                args.reruns),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
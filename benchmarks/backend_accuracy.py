@@ -0,0 +1,105 @@
+# Speed, memory and accuracy of each detector backend against the PyTorch baseline on the fixture videos.
+# Each backend runs in its own process so peak RSS is per backend. Without recorded clips it runs on the sample
+# photos ultralytics ships (see run.iter_detection_frames); a baseline without detections fails the run instead of
+# reporting perfect accuracy.
+#
+#   python benchmarks/backend_accuracy.py --backends pytorch,onnx,onnx-int8 --frames 200
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+
+from common import peak_rss_mb, percentile
+from run import iter_detection_frames
+
+MATCH_IOU = 0.5
+
+
+def run_backend(backend, max_frames):
+    from detector import CONFIDENCE_THRESHOLD, Detector, filter_objects
+
+    detector = Detector(backend=backend)
+    detector.warmup()
+    latencies, outputs = [], []
+    # Frames are read lazily so decoded video doesn't count towards the backend's peak RSS
+    for frame in iter_detection_frames(max_frames):
+        start = time.perf_counter()
+        detections = detector.detect(frame)
+        latencies.append(time.perf_counter() - start)
+        outputs.append({
+            "objects": sorted(filter_objects(detections)),
+            "boxes": [(d.name, d.box) for d in detections if d.confidence > CONFIDENCE_THRESHOLD],
+        })
+    return {
+        "backend": backend,
+        "frames": len(latencies),
+        "loop_fps": len(latencies) / sum(latencies) if latencies else 0.0,
+        "frame_p50_ms": percentile(latencies, 50) * 1000,
+        "frame_p95_ms": percentile(latencies, 95) * 1000,
+        "model_load_ms": detector.load_time * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+        "outputs": outputs,
+    }
+
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+# Object-set agreement is what the app actually consumes; box recall/precision catch quieter regressions
+def accuracy(baseline, candidate):
+    same_sets, matched, baseline_boxes, candidate_boxes = 0, 0, 0, 0
+    for expected, got in zip(baseline, candidate):
+        same_sets += expected["objects"] == got["objects"]
+        baseline_boxes += len(expected["boxes"])
+        candidate_boxes += len(got["boxes"])
+        unmatched = list(got["boxes"])
+        for name, box in expected["boxes"]:
+            for i, (other_name, other_box) in enumerate(unmatched):
+                if name == other_name and iou(box, other_box) >= MATCH_IOU:
+                    matched += 1
+                    del unmatched[i]
+                    break
+    return {
+        "object_set_agreement": same_sets / len(baseline) if baseline else 1.0,
+        "box_recall": matched / baseline_boxes if baseline_boxes else 1.0,
+        "box_precision": matched / candidate_boxes if candidate_boxes else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", default="pytorch,onnx,onnx-int8", help="comma-separated; the first is the baseline")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--min-agreement", type=float, default=0.95,
+                        help="exit non-zero if any backend's object-set agreement falls below this")
+    args = parser.parse_args()
+
+    backends = args.backends.split(",")
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for backend in backends:
+        with context.Pool(1) as pool:
+            results.append(pool.apply(run_backend, (backend, args.frames)))
+
+    outputs = [result.pop("outputs") for result in results]
+    # Agreement with a baseline that saw nothing would be trivially perfect
+    if not any(frame["boxes"] for frame in outputs[0]):
+        print(f"{backends[0]} detected nothing in the fixture frames; check the clips in benchmarks/fixtures/videos/",
+              file=sys.stderr)
+        return 1
+    baseline_fps = results[0]["loop_fps"]
+    for result, candidate in zip(results, outputs):
+        result.update(accuracy(outputs[0], candidate))
+        result["speedup"] = result["loop_fps"] / baseline_fps if baseline_fps else 0.0
+    print(json.dumps(results, indent=2))
+    return 0 if all(r["object_set_agreement"] >= args.min_agreement for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
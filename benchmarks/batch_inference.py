@@ -0,0 +1,86 @@
+# Throughput vs latency of the batch scheduler, with recorded videos standing in for webcam sessions.
+#
+#   python benchmarks/batch_inference.py clip1.mp4 clip2.mp4 --sessions 16 --batch-sizes 1,4,8,16
+import argparse
+import statistics
+import threading
+import time
+
+import cv2
+
+from common import percentile
+
+from batching import BatchScheduler
+from detector import get_detector
+
+
+# One simulated session: read frames from its video (looping) and wait for each result like the pipeline does
+def run_session(scheduler, video_path, frames, latencies):
+    cap = cv2.VideoCapture(video_path)
+    done = 0
+    while done < frames:
+        ret, frame = cap.read()
+        if not ret:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = cap.read()
+            # Nothing even after rewinding: an empty or unreadable clip would otherwise spin here forever
+            if not ret:
+                break
+        start = time.perf_counter()
+        scheduler.detect(frame)
+        latencies.append(time.perf_counter() - start)
+        done += 1
+    cap.release()
+
+
+def run(detector, videos, sessions, frames, max_batch_size, max_wait_ms):
+    scheduler = BatchScheduler(detector, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    latencies = []
+    threads = [
+        threading.Thread(target=run_session, args=(scheduler, videos[i % len(videos)], frames, latencies))
+        for i in range(sessions)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    scheduler.close()
+    return {
+        "max_batch_size": max_batch_size,
+        "max_wait_ms": max_wait_ms,
+        "throughput_fps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "mean_batch_size": scheduler.metrics()["mean_batch_size"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--frames", type=int, default=50, help="frames per session")
+    parser.add_argument("--batch-sizes", default="1,2,4,8")
+    parser.add_argument("--max-wait-ms", type=float, default=15)
+    args = parser.parse_args()
+
+    for path in args.videos:
+        cap = cv2.VideoCapture(path)
+        readable = cap.isOpened() and cap.read()[0]
+        cap.release()
+        if not readable:
+            parser.error(f"cannot read frames from {path}")
+
+    detector = get_detector()
+    print(f"{'batch':>5} {'wait ms':>8} {'fps':>8} {'p50 ms':>8} {'p95 ms':>8} {'avg batch':>9}")
+    for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+        row = run(detector, args.videos, args.sessions, args.frames, batch_size, args.max_wait_ms)
+        print(f"{row['max_batch_size']:>5} {row['max_wait_ms']:>8.1f} {row['throughput_fps']:>8.1f} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['mean_batch_size']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Concurrent login and score-insert throughput: the original per-call sqlite3.connect helpers vs the pooled
+# WAL repository in db.py. Runs against a throwaway database file. The pooled users are registered with a
+# near-zero hash cost so this measures the database; pass --real-hash-cost to include the password verify.
+#
+#   python benchmarks/db_throughput.py --threads 16 --ops 200
+import argparse
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import common  # noqa: F401 - puts the repository root on sys.path
+
+import auth
+import db
+
+
+# The helpers as they were before the repository layer: a fresh connection and commit per call
+def legacy_hash(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+class LegacyHelpers:
+    def __init__(self, path):
+        self.path = path
+
+    def login_user(self, username, password):
+        conn = sqlite3.connect(self.path)
+        c = conn.cursor()
+        c.execute("SELECT * FROM users WHERE username = ? AND password = ?", (username, legacy_hash(password)))
+        user = c.fetchone()
+        conn.close()
+        return user
+
+    def save_quiz_score(self, username, score):
+        conn = sqlite3.connect(self.path)
+        c = conn.cursor()
+        c.execute("INSERT INTO leaderboard (username, score, timestamp) VALUES (?, ?, ?)",
+                  (username, score, db.now_timestamp()))
+        conn.commit()
+        conn.close()
+
+
+def run(helpers, threads, ops):
+    errors = []
+
+    def worker(n):
+        for i in range(ops):
+            try:
+                if i % 2:
+                    helpers.login_user(f"user{n}", "secret")
+                else:
+                    helpers.save_quiz_score(f"user{n}", i % 5)
+            except sqlite3.OperationalError as e:
+                errors.append(e)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for worker_thread in workers:
+        worker_thread.start()
+    for worker_thread in workers:
+        worker_thread.join()
+    elapsed = time.perf_counter() - start
+    return threads * ops / elapsed, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=200, help="operations per thread, half logins and half inserts")
+    parser.add_argument("--real-hash-cost", action="store_true")
+    args = parser.parse_args()
+    if not args.real_hash_cost:
+        auth._hasher = auth.Pbkdf2Hasher(iterations=1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The legacy helpers get their own database in the default rollback-journal mode they always ran in
+        legacy_path = os.path.join(tmp, "legacy.db")
+        conn = sqlite3.connect(legacy_path)
+        db.migrate(conn)
+        conn.executemany("INSERT INTO users (username, password) VALUES (?, ?)",
+                         [(f"user{n}", legacy_hash("secret")) for n in range(args.threads)])
+        conn.commit()
+        conn.close()
+
+        pool = db.ConnectionPool(os.path.join(tmp, "pooled.db"))
+        with pool.connection() as conn:
+            db.migrate(conn)
+        repository = db.Repository(pool)
+        for n in range(args.threads):
+            repository.register_user(f"user{n}", "secret")
+
+        for name, helpers in (("legacy connect-per-call", LegacyHelpers(legacy_path)), ("pooled WAL repository", repository)):
+            ops_per_second, errors = run(helpers, args.threads, args.ops)
+            print(f"{name:>24}: {ops_per_second:8.0f} ops/s  {errors} lock errors")
+        pool.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Inference calls saved, CPU spent and recall lost by each detection policy, against detecting every frame
+# at full resolution. Frames are fed in order as if each reached the inference stage.
+#
+#   python benchmarks/detection_policies.py --frames 300
+import argparse
+import json
+import sys
+import time
+
+from run import iter_detection_frames
+
+from detector import INFERENCE_SIZE, get_detector
+from pipeline import MOTION_MAX_SKIP, DetectionPolicy
+
+POLICIES = {
+    "baseline": {},
+    "size-320": {"image_size": 320},
+    "stride-3": {"stride": 3},
+    "motion-2": {"motion_threshold": 2.0},
+    "roi-centre": {"roi": (0.15, 0.15, 0.85, 0.85)},
+    "combined": {"image_size": 320, "stride": 2, "motion_threshold": 2.0},
+}
+
+
+# Per-frame object sets as the scan sees them: skipped frames keep the last result
+def run_policy(detector, frames, image_size=INFERENCE_SIZE, stride=1, motion_threshold=0.0, roi=None,
+               max_skip=MOTION_MAX_SKIP):
+    policy = DetectionPolicy(stride=stride, motion_threshold=motion_threshold, max_skip=max_skip, roi=roi)
+    detector.image_size = image_size
+    current, per_frame = set(), []
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for frame in frames:
+        if policy.should_detect(frame):
+            current = detector.detect_objects(policy.prepare(frame))
+        per_frame.append(current)
+    cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+    return per_frame, dict(policy.metrics(), cpu_s=round(cpu, 3), wall_s=round(wall, 3))
+
+
+def recall(baseline, candidate):
+    expected = sum(len(objects) for objects in baseline)
+    found = sum(len(objects & got) for objects, got in zip(baseline, candidate))
+    return found / expected if expected else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--only", default=",".join(POLICIES), help="comma-separated policies; baseline always runs")
+    args = parser.parse_args()
+
+    detector = get_detector()
+    # Recorded clips, or the ultralytics sample photos panned across when there are none
+    frames = list(iter_detection_frames(args.frames))
+    baseline, baseline_metrics = run_policy(detector, frames)
+    scan_objects = set().union(*baseline)
+    # Recall against a baseline that saw nothing would be meaningless
+    if not scan_objects:
+        print("the baseline detected nothing in the fixture frames; check the clips in benchmarks/fixtures/videos/",
+              file=sys.stderr)
+        return 1
+
+    report = {}
+    for name in args.only.split(","):
+        per_frame, metrics = (baseline, baseline_metrics) if name == "baseline" else run_policy(
+            detector, frames, **POLICIES[name])
+        metrics["frame_recall"] = round(recall(baseline, per_frame), 3)
+        # What the user actually gets: the union of names over the scan
+        found = set().union(*per_frame)
+        metrics["scan_recall"] = round(len(found & scan_objects) / len(scan_objects), 3) if scan_objects else 1.0
+        metrics["cpu_vs_baseline"] = round(metrics["cpu_s"] / baseline_metrics["cpu_s"], 3) \
+            if baseline_metrics["cpu_s"] else 0.0
+        report[name] = metrics
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+# Burst load against the insight service with the local Gemini stub: many sessions asking for a few
+# object sets at once. Shows how many upstream calls coalescing saves and how the latency holds up.
+#
+#   python benchmarks/insight_burst.py --requests 200 --object-sets 5 --latency 0.5 --failure-rate 0.1
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import common  # noqa: F401 - puts the repository root on sys.path
+
+from fake_gemini import FakeGeminiModel
+from insight_service import InsightService
+
+OBJECT_SETS = [["cup", "laptop"], ["book", "bottle"], ["scissors"], ["apple", "banana", "orange"],
+               ["clock", "vase"], ["keyboard", "mouse"], ["chair", "potted plant"], ["remote", "tv"]]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--object-sets", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=10.0)
+    args = parser.parse_args()
+
+    model = FakeGeminiModel(latency=args.latency, failure_rate=args.failure_rate)
+    service = InsightService(model, max_concurrency=args.concurrency, rate=args.rate, burst=args.concurrency)
+    sets = OBJECT_SETS[:args.object_sets]
+
+    def one(i):
+        start = time.perf_counter()
+        try:
+            service.fetch(sets[i % len(sets)])
+            return time.perf_counter() - start, None
+        except Exception as e:
+            return time.perf_counter() - start, e
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.requests) as pool:
+        results = list(pool.map(one, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    errors = sum(1 for _, error in results if error)
+    metrics = service.metrics()
+    print(f"requests: {args.requests}  errors: {errors}  wall: {elapsed:.2f}s")
+    print(f"upstream calls: {metrics['upstream_calls']}  stub calls: {model.calls}  "
+          f"coalesced: {metrics['coalesced']}  retries: {metrics['retries']}")
+    print(f"caller p50: {latencies[len(latencies) // 2] * 1000:.0f} ms  "
+          f"p99: {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:.0f} ms")
+    print("upstream latency buckets (s):", metrics["latency_s"]["buckets"])
+    print("queue depth buckets:", metrics["queue_depth"]["buckets"])
+
+
+if __name__ == "__main__":
+    main()
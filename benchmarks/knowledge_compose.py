@@ -0,0 +1,83 @@
+# Upstream calls and prompt/response volume for a stream of random object sets: one prompt per set (insights.py)
+# against fragments from the knowledge store plus a combination call (knowledge.py). Uses the local Gemini stub,
+# so characters stand in for tokens (roughly 4 characters per token).
+#
+#   python benchmarks/knowledge_compose.py --sets 500 --vocabulary 30
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+
+import common  # noqa: F401 - puts the repository root on sys.path
+
+from fake_gemini import FakeGeminiModel
+from insights import InsightCache, fetch_insights
+from knowledge import KnowledgeStore, fetch_composed_insights
+
+VOCABULARY = ["cup", "laptop", "book", "bottle", "scissors", "apple", "banana", "orange", "clock", "vase", "keyboard",
+              "mouse", "chair", "potted plant", "remote", "tv", "cell phone", "backpack", "umbrella", "spoon", "fork",
+              "knife", "bowl", "toothbrush", "teddy bear", "sports ball", "kite", "skateboard", "couch", "bed"]
+
+
+class CountingModel(FakeGeminiModel):
+    def __init__(self):
+        super().__init__()
+        self.prompt_chars = 0
+        self.response_chars = 0
+
+    def generate_content(self, prompt, stream=False):
+        response = super().generate_content(prompt)
+        self.prompt_chars += len(prompt)
+        self.response_chars += len(response.text)
+        return response
+
+
+def simulate(fetch, object_sets):
+    model = CountingModel()
+    checkpoints = {}
+    for i, objects in enumerate(object_sets, 1):
+        fetch(model, objects)
+        if i in (len(object_sets) // 10, len(object_sets) // 2, len(object_sets)):
+            checkpoints[i] = model.calls
+    return {
+        "upstream_calls": model.calls,
+        "calls_after_sets": checkpoints,
+        "prompt_chars": model.prompt_chars,
+        "response_chars": model.response_chars,
+        "approx_tokens": (model.prompt_chars + model.response_chars) // 4,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sets", type=int, default=500, help="object sets requested, in order")
+    parser.add_argument("--vocabulary", type=int, default=len(VOCABULARY), help="distinct objects in play")
+    parser.add_argument("--max-objects", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = VOCABULARY[:args.vocabulary]
+    object_sets = [rng.sample(vocabulary, rng.randint(1, min(args.max_objects, len(vocabulary))))
+                   for _ in range(args.sets)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        monolithic_cache = InsightCache(os.path.join(tmp, "monolithic.db"))
+        composed_cache = InsightCache(os.path.join(tmp, "composed.db"))
+        store = KnowledgeStore(os.path.join(tmp, "knowledge.db"))
+        report = {
+            "sets": args.sets,
+            "distinct_sets": len({tuple(sorted(objects)) for objects in object_sets}),
+            "monolithic": simulate(lambda model, objects: fetch_insights(model, objects, monolithic_cache), object_sets),
+            "composed": simulate(lambda model, objects: fetch_composed_insights(model, objects, store, composed_cache),
+                                 object_sets),
+        }
+    report["token_ratio"] = round(report["composed"]["approx_tokens"] / report["monolithic"]["approx_tokens"], 3)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+# End-to-end load test of one app process: virtual users run the real session flow on their own threads, the
+# way Streamlit runs one script thread per session. Each session registers and logs in, scans a recorded clip
+# through DetectionPipeline (paced like a webcam), gets insights from the Gemini stub the way the app does
+# (streamed through InsightService.stream unless STREAM_RESPONSES is off), submits the quiz through
+# save_quiz_score and reads the leaderboard. Concurrency ramps through --levels; every level reports throughput,
+# per-stage latency percentiles, error rates and CPU/memory, and the summary names the level where throughput
+# stopped scaling.
+#
+#   python benchmarks/load_test.py --levels 1,2,4,8,16 --sessions 3 --gemini-latency 2.0
+#   python benchmarks/load_test.py --levels 4,8 --scan-seconds 4 --gemini-failure-rate 0.05 --cache
+#
+# Needs yolov8n.pt next to the app; clips come from benchmarks/fixtures/videos/ (see run.py).
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from common import BENCHMARKS_DIR, peak_rss_mb, percentile
+from run import fixture_videos
+
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+CAMERA_FPS = 30
+STAGES = ("register", "login", "scan", "insight", "quiz_submit", "leaderboard")
+# Used when a scan finds nothing, so the rest of the flow still runs
+FALLBACK_OBJECTS = ["cup", "book"]
+# Each level must reach at least this multiple of the previous level's throughput to count as still scaling
+SCALING_GAIN = 1.1
+
+
+# Stands in for cv2.VideoCapture(0): plays a recorded clip at camera rate and loops at the end
+class RecordedCamera:
+    def __init__(self, path, fps=CAMERA_FPS):
+        import cv2
+
+        self.cv2 = cv2
+        self.cap = cv2.VideoCapture(path)
+        self.interval = 1.0 / fps
+        self.next_at = time.monotonic()
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        delay = self.next_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_at = max(self.next_at + self.interval, time.monotonic())
+        ret, frame = self.cap.read()
+        if not ret:
+            self.cap.set(self.cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+
+# Samples CPU time, thread count and resident memory while a level runs
+class ResourceMonitor:
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.max_threads = 0
+        self.max_rss_mb = 0.0
+        self.thread = threading.Thread(target=self._run, name="resource-monitor", daemon=True)
+
+    def _rss_mb(self):
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+        except OSError:
+            return peak_rss_mb()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.max_threads = max(self.max_threads, threading.active_count())
+            self.max_rss_mb = max(self.max_rss_mb, self._rss_mb())
+
+    def __enter__(self):
+        self.cpu_started = time.process_time()
+        self.wall_started = time.perf_counter()
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+        wall = time.perf_counter() - self.wall_started
+        self.report = {
+            "cpu_s": round(time.process_time() - self.cpu_started, 2),
+            "cpu_cores_busy": round((time.process_time() - self.cpu_started) / wall, 2) if wall else 0.0,
+            "max_threads": self.max_threads,
+            "max_rss_mb": round(self.max_rss_mb, 1),
+        }
+
+
+class VirtualUser:
+    def __init__(self, name, clip, service, args, latencies, errors, lock):
+        self.name = name
+        self.clip = clip
+        self.service = service
+        self.args = args
+        self.latencies = latencies
+        self.errors = errors
+        self.lock = lock
+
+    def stage(self, stage, call, *call_args, **call_kwargs):
+        start = time.perf_counter()
+        try:
+            result = call(*call_args, **call_kwargs)
+        except Exception as e:
+            with self.lock:
+                self.errors[stage][type(e).__name__] += 1
+            raise
+        with self.lock:
+            self.latencies[stage].append(time.perf_counter() - start)
+        return result
+
+    def scan(self):
+        from batching import get_scheduler
+        from pipeline import DetectionPipeline, ScanStabilizer
+        from preview import PreviewEncoder
+
+        cap = RecordedCamera(self.clip)
+        preview = PreviewEncoder()
+        pipeline = DetectionPipeline(cap, get_scheduler().detect, duration=self.args.scan_seconds,
+                                     stabilizer=ScanStabilizer())
+        objects = pipeline.run(preview.encode)
+        cap.release()
+        if pipeline.error:
+            raise RuntimeError(pipeline.error)
+        tracked = pipeline.report().get("tracker", {}).get("objects", {})
+        return sorted(objects), {name: tracked[name] for name in objects if name in tracked}
+
+    # The app's insight branch without the page rendering; validation is part of the stage, so an unusable payload
+    # counts as an insight error, as it would in the app
+    def insight(self, objects, scene):
+        from insights import STREAM_RESPONSES
+        from schema import InsightSchemaError, shared_insight
+
+        if STREAM_RESPONSES:
+            payload, _ = self.service.stream(objects, lambda key, value: None, scene)
+        else:
+            payload = self.service.fetch(objects, scene=scene)
+        if not payload:
+            raise InsightSchemaError("empty insight response")
+        return shared_insight(payload)
+
+    def session(self, n):
+        from db import get_leaderboard, get_user_rank, login_user, register_user, save_quiz_score
+        from tracker import describe_summary
+
+        def login():
+            if not login_user(username, "secret"):
+                raise RuntimeError("login failed")
+
+        username = f"{self.name}-s{n}"
+        self.stage("register", register_user, username, "secret")
+        self.stage("login", login)
+        objects, tracked = self.stage("scan", self.scan)
+        if not objects:
+            with self.lock:
+                self.errors["scan"]["no_objects"] += 1
+            objects = FALLBACK_OBJECTS
+        insight = self.stage("insight", self.insight, objects, describe_summary(tracked))
+        # Reading and answering the quiz takes a while; the think time keeps the session realistic
+        time.sleep(self.args.think_seconds)
+        score = sum(q.is_correct(random.choice(q.options)) for q in insight.quiz)
+        self.stage("quiz_submit", save_quiz_score, username, score)
+        self.stage("leaderboard", lambda: (get_leaderboard(), get_user_rank(username)))
+
+    # A failed stage ends that session (it is already counted) and the user starts the next one
+    def run(self):
+        for n in range(self.args.sessions):
+            try:
+                self.session(n)
+            except Exception:
+                pass
+
+
+def run_level(level, clips, service, args):
+    from batching import get_scheduler
+
+    latencies = defaultdict(list)
+    errors = defaultdict(lambda: defaultdict(int))
+    lock = threading.Lock()
+    users = [VirtualUser(f"load-{level}-u{n}", clips[n % len(clips)], service, args, latencies, errors, lock)
+             for n in range(level)]
+    service_before = service.metrics()
+    scheduler_before = get_scheduler().metrics()
+    threads = [threading.Thread(target=user.run, name=user.name) for user in users]
+    with ResourceMonitor() as monitor:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall = time.perf_counter() - monitor.wall_started
+
+    service_after = service.metrics()
+    scheduler_after = get_scheduler().metrics()
+    frames = scheduler_after["frames"] - scheduler_before["frames"]
+    # Remote detector workers batch on their side, so only a local BatchScheduler reports batches
+    batches = scheduler_after.get("batches", 0) - scheduler_before.get("batches", 0)
+    completed = len(latencies["leaderboard"])
+    attempted = level * args.sessions
+    return {
+        "users": level,
+        "sessions_completed": completed,
+        "sessions_failed": attempted - completed,
+        "sessions_per_min": round(completed / wall * 60, 2) if wall else 0.0,
+        "wall_s": round(wall, 2),
+        "stages": {stage: {
+            "count": len(latencies[stage]),
+            "p50_ms": round(percentile(latencies[stage], 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies[stage], 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies[stage], 99) * 1000, 1),
+            "errors": dict(errors[stage]),
+            "error_rate": round(sum(count for kind, count in errors[stage].items() if kind != "no_objects")
+                                / attempted, 3),
+        } for stage in STAGES},
+        "detector": {"frames": frames, "mean_batch_size": round(frames / batches, 2) if batches else None},
+        "gemini": {key: service_after[key] - service_before[key]
+                   for key in ("upstream_calls", "coalesced", "retries", "failures")},
+        "resources": monitor.report,
+    }
+
+
+# First level where adding users stopped adding throughput, or where errors crossed the limit
+def saturation(levels, max_error_rate):
+    previous = None
+    for level in levels:
+        errors = max(stage["error_rate"] for stage in level["stages"].values())
+        if errors > max_error_rate:
+            return {"users": level["users"], "reason": f"error rate {errors:.1%}"}
+        if previous and level["sessions_per_min"] < previous["sessions_per_min"] * SCALING_GAIN:
+            slowest = max(STAGES, key=lambda stage: level["stages"][stage]["p95_ms"]
+                          - previous["stages"][stage]["p95_ms"])
+            return {"users": level["users"], "reason": "throughput stopped scaling",
+                    "stage_with_largest_p95_growth": slowest}
+        previous = level
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--levels", default="1,2,4,8", help="comma-separated concurrent user counts, ramped in order")
+    parser.add_argument("--sessions", type=int, default=2, help="sessions each virtual user runs per level")
+    parser.add_argument("--scan-seconds", type=float, default=10, help="upper bound of each scan")
+    parser.add_argument("--think-seconds", type=float, default=1.0, help="pause between insight and quiz submit")
+    parser.add_argument("--gemini-latency", type=float, default=1.0)
+    parser.add_argument("--gemini-failure-rate", type=float, default=0.0)
+    parser.add_argument("--cache", action="store_true", help="serve repeat object sets from the insight cache")
+    parser.add_argument("--real-hash", action="store_true", help="keep the production password hasher")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    clips = [os.path.abspath(path) for path in fixture_videos()]
+    # The app keeps its SQLite files and model weights relative to the working directory
+    workdir = tempfile.mkdtemp(prefix="curioscope-load-")
+    if os.path.exists(os.path.join(REPO_DIR, "yolov8n.pt")):
+        os.symlink(os.path.join(REPO_DIR, "yolov8n.pt"), os.path.join(workdir, "yolov8n.pt"))
+    os.chdir(workdir)
+
+    try:
+        import auth
+        from db import init_db
+        from detector import get_detector
+        from fake_gemini import FakeGeminiModel
+        from insight_service import InsightService
+        from insights import get_insight_cache
+        from knowledge import COMPOSE_INSIGHTS, get_knowledge_store
+        from workers import DETECTOR_WORKERS
+
+        if not args.real_hash:
+            # Password hashing is sized by benchmarks/password_cost.py; here it would only hide the other stages
+            auth._hasher = auth.Pbkdf2Hasher(iterations=1)
+        # Same process-wide setup as load_resources() in the app
+        init_db()
+        if not DETECTOR_WORKERS:
+            get_detector()
+        model = FakeGeminiModel(latency=args.gemini_latency, failure_rate=args.gemini_failure_rate)
+        service = InsightService(model, get_insight_cache() if args.cache else None,
+                                 get_knowledge_store() if COMPOSE_INSIGHTS else None)
+
+        levels = []
+        for level in (int(value) for value in args.levels.split(",")):
+            levels.append(run_level(level, clips, service, args))
+            print(f"{level} users: {levels[-1]['sessions_per_min']} sessions/min", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps({
+        "config": vars(args),
+        "clips": [os.path.basename(clip) for clip in clips],
+        "levels": levels,
+        "saturation": saturation(levels, args.max_error_rate),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+# Times one password verify at increasing cost and recommends the highest cost that fits the latency budget.
+# Run it on the production server cores, then copy the result into auth.py.
+#
+#   python benchmarks/password_cost.py --budget-ms 100
+import argparse
+import statistics
+import time
+
+import common  # noqa: F401 - puts the repository root on sys.path
+
+from auth import Pbkdf2Hasher, ScryptHasher
+
+SCRYPT_COSTS = [2 ** exponent for exponent in range(12, 19)]
+PBKDF2_COSTS = [100_000, 200_000, 400_000, 600_000, 800_000, 1_200_000]
+
+
+def verify_ms(hasher, repeats):
+    encoded = hasher.hash("correct horse battery staple")
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        hasher.verify("correct horse battery staple", encoded)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=100)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    for name, hashers in (
+        ("SCRYPT_N", [(n, ScryptHasher(n=n)) for n in SCRYPT_COSTS]),
+        ("PBKDF2_ITERATIONS", [(iterations, Pbkdf2Hasher(iterations)) for iterations in PBKDF2_COSTS]),
+    ):
+        chosen = None
+        for cost, hasher in hashers:
+            elapsed = verify_ms(hasher, args.repeats)
+            print(f"{name} = {cost:>9}: {elapsed:8.1f} ms")
+            if elapsed <= args.budget_ms:
+                chosen = cost
+        print(f"-> {name} = {chosen}  (within {args.budget_ms:.0f} ms)\n" if chosen else f"-> no {name} fits the budget\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Server CPU and bytes per preview frame: the old path (BGR->RGB copy, then Streamlit PNG-encoding the full
+# array) against PreviewEncoder. Multiply kb_per_frame by pipeline.DISPLAY_FPS for per-client bandwidth.
+#
+#   python benchmarks/preview_cost.py --frames 100
+import argparse
+import io
+import json
+import sys
+import time
+
+import cv2
+from PIL import Image
+
+from run import read_frames
+
+from pipeline import DISPLAY_FPS
+from preview import PreviewEncoder
+
+
+# What st.image does with an ndarray: PIL image, PNG-encoded at full resolution
+def legacy_encode(frame):
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    buffer = io.BytesIO()
+    Image.fromarray(rgb).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def measure(encode, frames):
+    total_bytes = 0
+    start = time.process_time()
+    for frame in frames:
+        total_bytes += len(encode(frame))
+    cpu = time.process_time() - start
+    kb_per_frame = total_bytes / len(frames) / 1024
+    return {
+        "cpu_ms_per_frame": round(cpu / len(frames) * 1000, 2),
+        "kb_per_frame": round(kb_per_frame, 1),
+        "client_kb_per_s": round(kb_per_frame * DISPLAY_FPS, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=100)
+    args = parser.parse_args()
+
+    frames = read_frames(args.frames)
+    if not frames:
+        print("no fixture frames", file=sys.stderr)
+        return 1
+    encoder = PreviewEncoder(draw_boxes=False)
+    boxed = PreviewEncoder(draw_boxes=True)
+    report = {
+        "frames": len(frames),
+        "frame_shape": list(frames[0].shape),
+        "legacy_png": measure(legacy_encode, frames),
+        "jpeg_preview": measure(encoder.encode, frames),
+        "jpeg_preview_with_boxes": measure(boxed.encode, frames),
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+# Reproducible benchmark suite: detection loop, insight parsing and SQLite helpers, all offline.
+# Results go to JSON; pass --baseline to compare against a stored run and fail on regressions.
+#
+#   python benchmarks/run.py --output results.json
+#   python benchmarks/run.py --baseline benchmarks/baseline.json --tolerance 0.15
+#
+# Detection reads the videos in benchmarks/fixtures/videos/ (a synthetic clip is written there if it is empty)
+# and needs yolov8n.pt next to the app so nothing is downloaded.
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+
+from common import FIXTURES_DIR, peak_rss_mb, percentile
+
+VIDEO_DIR = os.path.join(FIXTURES_DIR, "videos")
+RESPONSE_DIR = os.path.join(FIXTURES_DIR, "gemini_responses")
+SYNTHETIC_VIDEO = "synthetic.mp4"
+# Share of each sample photo kept in view while it is panned across
+PAN_CROP = 0.8
+
+# Direction of each metric, for the baseline comparison
+HIGHER_IS_BETTER = ("_fps", "_ops_per_s")
+LOWER_IS_BETTER = ("_ms", "_mb")
+
+
+def write_synthetic_video(path, frames=150, size=(640, 480)):
+    import cv2
+    import numpy as np
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 30, size)
+    for i in range(frames):
+        frame = np.full((size[1], size[0], 3), 200, dtype=np.uint8)
+        cv2.rectangle(frame, (40 + 2 * i, 120), (200 + 2 * i, 360), (40, 90, 160), -1)
+        cv2.circle(frame, (480, 240 + i % 60), 60, (30, 160, 60), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def fixture_videos():
+    videos = sorted(glob.glob(os.path.join(VIDEO_DIR, "*.mp4")))
+    if not videos:
+        os.makedirs(VIDEO_DIR, exist_ok=True)
+        path = os.path.join(VIDEO_DIR, SYNTHETIC_VIDEO)
+        write_synthetic_video(path)
+        videos = [path]
+    return videos
+
+
+# Recorded clips only; the synthetic one holds nothing the model can detect
+def real_videos():
+    return [path for path in sorted(glob.glob(os.path.join(VIDEO_DIR, "*.mp4")))
+            if os.path.basename(path) != SYNTHETIC_VIDEO]
+
+
+# Frames with real objects in them, for the accuracy and recall comparisons. Without recorded clips, the sample
+# photos ultralytics ships offline (bus.jpg, zidane.jpg) are panned across like a handheld camera instead.
+def iter_detection_frames(max_frames, size=(640, 480)):
+    import cv2
+
+    count = 0
+    videos = real_videos()
+    for path in videos:
+        cap = cv2.VideoCapture(path)
+        while count < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            count += 1
+            yield frame
+        cap.release()
+    if videos:
+        return
+
+    from ultralytics.utils import ASSETS
+
+    images = [cv2.imread(str(path)) for path in sorted(ASSETS.glob("*.jpg"))]
+    per_image = -(-max_frames // len(images))
+    for image in images:
+        height, width = image.shape[:2]
+        crop_w, crop_h = int(width * PAN_CROP), int(height * PAN_CROP)
+        for i in range(per_image):
+            if count >= max_frames:
+                return
+            progress = i / max(1, per_image - 1)
+            x, y = int((width - crop_w) * progress), int((height - crop_h) * progress / 2)
+            count += 1
+            yield cv2.resize(image[y:y + crop_h, x:x + crop_w], size, interpolation=cv2.INTER_AREA)
+
+
+def read_frames(max_frames):
+    import cv2
+
+    frames = []
+    for path in fixture_videos():
+        cap = cv2.VideoCapture(path)
+        while len(frames) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+    return frames
+
+
+def bench_detection(max_frames):
+    import cv2
+    from detector import get_detector
+
+    detector = get_detector()
+    latencies = []
+    for path in fixture_videos():
+        cap = cv2.VideoCapture(path)
+        while len(latencies) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            start = time.perf_counter()
+            detector.detect_objects(frame)
+            latencies.append(time.perf_counter() - start)
+        cap.release()
+    return {
+        "backend": detector.backend.name,
+        "frames": len(latencies),
+        "loop_fps": len(latencies) / sum(latencies),
+        "frame_p50_ms": percentile(latencies, 50) * 1000,
+        "frame_p95_ms": percentile(latencies, 95) * 1000,
+        "model_load_ms": detector.load_time * 1000,
+        "warmup_ms": detector.warmup_time * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def bench_parse(repeats):
+    from insights import StreamingInsightParser, parse_response
+
+    responses = []
+    for path in sorted(glob.glob(os.path.join(RESPONSE_DIR, "*.txt"))):
+        with open(path) as f:
+            responses.append(f.read())
+
+    def timed(fn):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for text in responses:
+                fn(text)
+        return (time.perf_counter() - start) / (repeats * len(responses)) * 1000
+
+    def streamed(text):
+        parser = StreamingInsightParser()
+        for i in range(0, len(text), 64):
+            parser.feed(text[i:i + 64])
+        parser.finish()
+
+    return {
+        "responses": len(responses),
+        "parse_ms": timed(parse_response),
+        "streaming_parse_ms": timed(streamed),
+    }
+
+
+def bench_db(threads, ops):
+    import auth
+    import db
+
+    # Measure the database, not the password hash cost (benchmarks/password_cost.py covers that)
+    hasher, auth._hasher = auth._hasher, auth.Pbkdf2Hasher(iterations=1)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            pool = db.ConnectionPool(os.path.join(tmp, "bench.db"))
+            with pool.connection() as conn:
+                db.migrate(conn)
+            repository = db.Repository(pool)
+            for n in range(threads):
+                repository.register_user(f"user{n}", "secret")
+
+            def run(operation):
+                def worker(n):
+                    for i in range(ops):
+                        operation(n, i)
+
+                workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+                start = time.perf_counter()
+                for worker_thread in workers:
+                    worker_thread.start()
+                for worker_thread in workers:
+                    worker_thread.join()
+                return threads * ops / (time.perf_counter() - start)
+
+            results = {
+                "login_ops_per_s": run(lambda n, i: repository.login_user(f"user{n}", "secret")),
+                "score_insert_ops_per_s": run(lambda n, i: repository.save_quiz_score(f"user{n}", i % 5)),
+                "leaderboard_read_ops_per_s": run(lambda n, i: repository.get_leaderboard()),
+                "feedback_insert_ops_per_s": run(lambda n, i: repository.save_feedback(f"user{n}", 7, "nice")),
+            }
+            pool.close()
+            return results
+    finally:
+        auth._hasher = hasher
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for suite, metrics in results.get("suites", {}).items():
+        for name, value in metrics.items():
+            old = baseline.get("suites", {}).get(suite, {}).get(name)
+            if not isinstance(old, (int, float)) or not old:
+                continue
+            change = (value - old) / old
+            if (name.endswith(HIGHER_IS_BETTER) and change < -tolerance) or \
+                    (name.endswith(LOWER_IS_BETTER) and change > tolerance):
+                regressions.append(f"{suite}.{name}: {old:.2f} -> {value:.2f} ({change:+.0%})")
+    return regressions
+
+
+SUITES = {
+    "detection": lambda args: bench_detection(args.frames),
+    "parse": lambda args: bench_parse(args.repeats),
+    "db": lambda args: bench_db(args.threads, args.ops),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--only", default=",".join(SUITES), help="comma-separated suites to run")
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="results JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown per metric")
+    parser.add_argument("--frames", type=int, default=200, help="detection frames to time")
+    parser.add_argument("--repeats", type=int, default=200, help="parse repetitions per response")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=200, help="DB operations per thread and helper")
+    args = parser.parse_args()
+
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "suites": {},
+    }
+    for suite in args.only.split(","):
+        results["suites"][suite] = SUITES[suite](args)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
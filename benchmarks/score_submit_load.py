@@ -0,0 +1,67 @@
+# End-of-class submit storm: every student saves a quiz score and feedback at once. Compares synchronous
+# writes with the write-behind queue and reports commit counts and submit latency percentiles.
+#
+#   python benchmarks/score_submit_load.py --students 200 --submits 5
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from common import percentile
+
+import db
+
+
+def run(mode, students, submits, tmp):
+    pool = db.ConnectionPool(os.path.join(tmp, f"{mode}.db"))
+    with pool.connection() as conn:
+        db.migrate(conn)
+    repository = db.Repository(pool)
+    if mode != "sync":
+        repository.enable_write_behind(durable=mode == "batched-durable")
+
+    latencies = []
+    barrier = threading.Barrier(students)
+
+    def student(n):
+        barrier.wait()
+        for i in range(submits):
+            start = time.perf_counter()
+            repository.save_quiz_score(f"student{n}", i)
+            repository.save_feedback(f"student{n}", 8, "fun")
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=student, args=(n,)) for n in range(students)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if repository.write_queue:
+        repository.write_queue.close()
+    elapsed = time.perf_counter() - start
+    pool.close()
+    return {
+        "commits": pool.commits,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "wall_s": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=100)
+    parser.add_argument("--submits", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'mode':>16} {'commits':>8} {'p50 ms':>8} {'p99 ms':>8} {'wall s':>7}")
+        for mode in ("sync", "batched", "batched-durable"):
+            row = run(mode, args.students, args.submits, tmp)
+            print(f"{mode:>16} {row['commits']:>8} {row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['wall_s']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
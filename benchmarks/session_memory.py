@@ -0,0 +1,93 @@
+# Per-session memory and per-rerun cost of the insight held in session state, for many concurrent users:
+# every session keeping its own decoded dict (each cache hit is a fresh json.loads) against sessions sharing one
+# validated Insight per payload. Uses the saved Gemini responses in benchmarks/fixtures/gemini_responses.
+#
+#   python benchmarks/session_memory.py --sessions 2000 --threads 8
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from common import FIXTURES_DIR, percentile
+
+from insights import parse_response
+from schema import shared_insight
+
+
+# What one rerun of the insight and quiz tabs reads, including scoring every answered question
+def rerun_dict(payload, answers):
+    text = payload.get("detailed_explanation", "") + payload.get("combined_usage", "")
+    for activity in payload.get("step_by_step_activity", []):
+        text += ", ".join(activity["objects"]) + "".join(activity["steps"])
+    score = 0
+    for idx, q in enumerate(payload.get("quiz", [])):
+        list(q["options"].values())
+        score += answers[idx] == q["options"][q["correct_answer"]]
+    return len(text), score
+
+
+def rerun_insight(insight, answers):
+    text = insight.detailed_explanation + insight.combined_usage
+    for activity in insight.activities:
+        text += ", ".join(activity.objects) + "".join(activity.steps)
+    score = 0
+    for idx, q in enumerate(insight.quiz):
+        score += q.is_correct(answers[idx])
+    return len(text), score
+
+
+def measure(build, rerun, texts, sessions, threads, reruns):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    states = [build(texts[i % len(texts)]) for i in range(sessions)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+    def session_reruns(state):
+        latencies = []
+        answers = {i: None for i in range(16)}
+        for _ in range(reruns):
+            start = time.perf_counter()
+            rerun(state, answers)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    with ThreadPoolExecutor(threads) as pool:
+        latencies = [value for result in pool.map(session_reruns, states) for value in result]
+    return {
+        "bytes_per_session": round(total / sessions),
+        "rerun_p50_us": round(percentile(latencies, 50) * 1e6, 2),
+        "rerun_p95_us": round(percentile(latencies, 95) * 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--reruns", type=int, default=20, help="reruns per session")
+    args = parser.parse_args()
+
+    texts = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "gemini_responses", "*.txt"))):
+        with open(path) as f:
+            texts.append(f.read())
+
+    report = {
+        "sessions": args.sessions,
+        "distinct_payloads": len(texts),
+        "dict_per_session": measure(parse_response, rerun_dict, texts, args.sessions, args.threads, args.reruns),
+        "shared_insight": measure(lambda text: shared_insight(parse_response(text)), rerun_insight, texts,
+                                  args.sessions, args.threads, args.reruns),
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# Cost of the IoU tracker per frame next to the model call it follows, on the recorded fixtures, plus a crowded
+# synthetic scene (many boxes of one class jittering in place) to show association cost as tracks pile up.
+#
+#   python benchmarks/tracker_overhead.py --frames 300 --crowd 50
+import argparse
+import json
+import random
+import sys
+import time
+
+from common import percentile
+from run import read_frames
+
+from detector import Detection, filter_detections, get_detector
+from tracker import IoUTracker, describe_summary
+
+FIXTURE_FPS = 30
+
+
+def time_updates(tracker, per_frame, fps=FIXTURE_FPS):
+    latencies = []
+    for i, detections in enumerate(per_frame):
+        start = time.perf_counter()
+        tracker.update(detections, now=i / fps)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def crowd_frames(count, frames, seed=0):
+    rng = random.Random(seed)
+    anchors = [(rng.uniform(0, 600), rng.uniform(0, 440)) for _ in range(count)]
+    per_frame = []
+    for _ in range(frames):
+        detections = []
+        for x, y in anchors:
+            x, y = x + rng.uniform(-3, 3), y + rng.uniform(-3, 3)
+            detections.append(Detection("book", rng.uniform(0.5, 0.95), [x, y, x + 40, y + 40]))
+        per_frame.append(detections)
+    return per_frame
+
+
+def summarize(latencies):
+    return {"p50_us": round(percentile(latencies, 50) * 1e6, 1), "p95_us": round(percentile(latencies, 95) * 1e6, 1),
+            "max_us": round(max(latencies) * 1e6, 1) if latencies else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--crowd", type=int, default=50, help="boxes per frame in the synthetic crowded scene")
+    args = parser.parse_args()
+
+    detector = get_detector()
+    per_frame, inference = [], []
+    for frame in read_frames(args.frames):
+        start = time.perf_counter()
+        detections = filter_detections(detector.detect(frame))
+        inference.append(time.perf_counter() - start)
+        per_frame.append(detections)
+
+    tracker = IoUTracker()
+    fixtures = summarize(time_updates(tracker, per_frame))
+    inference_p50_us = percentile(inference, 50) * 1e6
+    fixtures["inference_p50_us"] = round(inference_p50_us, 1)
+    fixtures["overhead_vs_inference"] = round(fixtures["p50_us"] / inference_p50_us, 5) if inference_p50_us else 0.0
+    fixtures["detections_per_frame"] = round(sum(map(len, per_frame)) / len(per_frame), 2) if per_frame else 0.0
+    fixtures["tracks"] = tracker.next_id - 1
+    fixtures["scene"] = describe_summary(tracker.summary())
+
+    crowd_tracker = IoUTracker()
+    crowd = summarize(time_updates(crowd_tracker, crowd_frames(args.crowd, args.frames)))
+    crowd["boxes_per_frame"] = args.crowd
+    crowd["tracks"] = crowd_tracker.next_id - 1
+    crowd["overhead_vs_inference"] = round(crowd["p50_us"] / inference_p50_us, 5) if inference_p50_us else 0.0
+
+    print(json.dumps({"frames": len(per_frame), "fixtures": fixtures, "crowd": crowd}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+import argparse
+import json
+import sys
+
+from knowledge import PREFETCH_BATCH_SIZE
+from precompute import PRECOMPUTE_MIN_COUNT, PRECOMPUTE_TOP
+
+# Headless entry point: python -m curioscope <command> ...
+
+
+def detect(args):
+    from batch_detect import CHUNK_SIZE, run_batch
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        return run_batch(args.inputs, output, args.workers, args.stride, args.chunk_size or CHUNK_SIZE, args.max_frames)
+    finally:
+        if args.output:
+            output.close()
+
+
+# Fills the knowledge store offline so live sessions only ever pay for the combination call
+def prefetch(args):
+    from insight_service import TRANSIENT_ERRORS, InsightService, create_model
+    from knowledge import get_knowledge_store
+    from schema import InsightSchemaError
+
+    names = args.objects
+    if not names:
+        from detector import EXCLUDED_CLASSES, get_detector
+
+        names = [name for name in get_detector().names.values() if name not in EXCLUDED_CLASSES]
+    store = get_knowledge_store()
+    missing = store.missing(names)
+    service = InsightService(create_model(), store=store)
+    failed = 0
+    for start in range(0, len(missing), args.batch_size):
+        batch = missing[start:start + args.batch_size]
+        try:
+            fetched = service.fetch_fragments(batch)
+        except (json.JSONDecodeError, InsightSchemaError, *TRANSIENT_ERRORS) as e:
+            fetched = {}
+            print(f"batch {batch} failed: {e!r}", file=sys.stderr)
+        failed += len(batch) - len(fetched)
+        print(f"{min(start + args.batch_size, len(missing))}/{len(missing)} objects", file=sys.stderr)
+    print(json.dumps(dict(store.stats(), requested=len(names), fetched=len(missing) - failed, failed=failed)))
+    return 1 if failed else 0
+
+
+# Pre-generates insights for the most frequent logged detection sets so those scans are served from the cache
+def precompute(args):
+    from datetime import datetime, timedelta
+
+    from db import get_repository
+    from insight_service import InsightService, create_model
+    from insights import get_insight_cache
+    from knowledge import COMPOSE_INSIGHTS, get_knowledge_store
+    from precompute import precompute as run_precompute
+
+    since = (datetime.now() - timedelta(days=args.since_days)).isoformat(sep=" ") if args.since_days else None
+    detection_sets = get_repository().get_detection_sets(since)
+    service = InsightService(create_model(), get_insight_cache(), get_knowledge_store() if COMPOSE_INSIGHTS else None)
+    report = run_precompute(service, detection_sets, args.top, args.min_count, args.dry_run)
+    print(json.dumps(report, indent=2))
+    return 1 if report["failed"] else 0
+
+
+# Serves detection to app workers over the network (see workers.py); frames from all of them share micro-batches
+def detector_worker(args):
+    from batching import BatchScheduler
+    from detector import get_detector
+    from workers import parse_address, serve
+
+    scheduler = BatchScheduler(get_detector())
+    print(f"detector worker listening on {args.listen}", file=sys.stderr)
+    serve(parse_address(args.listen), scheduler)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m curioscope")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    detect_parser = commands.add_parser("detect", help="detect objects in video files or image folders, writing JSONL")
+    detect_parser.add_argument("inputs", nargs="+", help="video files, image files or directories")
+    detect_parser.add_argument("-o", "--output", help="JSONL output file (default: stdout)")
+    detect_parser.add_argument("-w", "--workers", type=int, help="worker processes (default: all cores)")
+    detect_parser.add_argument("--stride", type=int, default=1, help="run detection on every Nth video frame")
+    detect_parser.add_argument("--chunk-size", type=int, help="frames decoded and batched together")
+    detect_parser.add_argument("--max-frames", type=int, help="stop each video after this many sampled frames")
+    detect_parser.set_defaults(handler=detect)
+
+    prefetch_parser = commands.add_parser("prefetch", help="generate knowledge-store fragments for the detector's classes")
+    prefetch_parser.add_argument("objects", nargs="*", help="object names (default: every non-excluded COCO class)")
+    prefetch_parser.add_argument("--batch-size", type=int, default=PREFETCH_BATCH_SIZE, help="objects per Gemini request")
+    prefetch_parser.set_defaults(handler=prefetch)
+
+    precompute_parser = commands.add_parser("precompute", help="pre-generate insights for the most frequent logged object sets")
+    precompute_parser.add_argument("--top", type=int, default=PRECOMPUTE_TOP, help="how many object sets to cover")
+    precompute_parser.add_argument("--min-count", type=int, default=PRECOMPUTE_MIN_COUNT,
+                                   help="skip sets logged fewer times than this")
+    precompute_parser.add_argument("--since-days", type=int, help="only rank scans from the last N days")
+    precompute_parser.add_argument("--dry-run", action="store_true", help="report the ranking and hit rate only")
+    precompute_parser.set_defaults(handler=precompute)
+
+    worker_parser = commands.add_parser("detector-worker", help="serve detection to app workers on a TCP port")
+    worker_parser.add_argument("--listen", default="127.0.0.1:6001", help="host:port to accept app connections on")
+    worker_parser.set_defaults(handler=detector_worker)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,111 +1,112 @@
+import os
+import sys
+
+# `python -m curioscope detect ...` runs headless; `streamlit run curioscope.py` serves the app.
+# Re-exec into cli.py so multiprocessing workers re-import that instead of this script.
+if __name__ == "__main__" and "streamlit" not in sys.modules:
+    cli_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cli.py")
+    os.execv(sys.executable, [sys.executable, cli_path, *sys.argv[1:]])
+
 import cv2
-import time
-from datetime import datetime
+import logging
 import streamlit as st
 import json
-import google.generativeai as genai
-import sqlite3
-import hashlib
-from ultralytics import YOLO
+from html import escape
 from streamlit.components.v1 import html
-
-genai.configure(api_key="YOUR_GEMINI_API_KEY")  
-model = genai.GenerativeModel("gemini-1.5-flash")
-
-CONFIDENCE_THRESHOLD = 0.5
-EXCLUDED_CLASSES = {"person", "face", "human face", "man", "woman", "boy", "girl", "hand", "foot", "eye", "mouth", "leg"}
-DETECTION_DURATION = 10
-
-def init_db():
-    conn = sqlite3.connect("users.db")
-    c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE,
-            password TEXT
-        )
-    """)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS leaderboard (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT,
-            score INTEGER,
-            timestamp DATETIME
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def register_user(username, password):
-    conn = sqlite3.connect("users.db")
-    c = conn.cursor()
-    try:
-        c.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, hash_password(password)))
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False
-    finally:
-        conn.close()
-
-def login_user(username, password):
-    conn = sqlite3.connect("users.db")
-    c = conn.cursor()
-    c.execute("SELECT * FROM users WHERE username = ? AND password = ?", (username, hash_password(password)))
-    user = c.fetchone()
-    conn.close()
-    return user
-
-# Save quiz score to the leaderboard
-def save_quiz_score(username, score):
-    conn = sqlite3.connect("users.db")
-    c = conn.cursor()
-    c.execute("INSERT INTO leaderboard (username, score, timestamp) VALUES (?, ?, ?)",
-              (username, score, datetime.now()))
-    conn.commit()
-    conn.close()
-
-# Fetch leaderboard data
-def get_leaderboard():
-    conn = sqlite3.connect("users.db")
-    c = conn.cursor()
-    c.execute("""
-        SELECT username, score, timestamp
-        FROM leaderboard
-        ORDER BY score DESC, timestamp ASC
-        LIMIT 10
-    """)
-    leaderboard_data = c.fetchall()
-    conn.close()
-    return leaderboard_data
-
-
-    
-    # Save the quiz score to the leaderboard
-    
-
+from auth import issue_session_token, renew_session_token, verify_session_token
+from batching import get_scheduler
+from db import (delete_session, get_leaderboard, get_user_rank, init_db, load_session, log_detection_set, login_user,
+                register_user, save_feedback, save_quiz_score, save_session)
+from detector import get_detector
+from insight_service import TRANSIENT_ERRORS, create_model, get_insight_service
+from metrics import profiled, span, start_exporter
+from insights import STREAM_RESPONSES, get_insight_cache
+from knowledge import COMPOSE_INSIGHTS, get_knowledge_store
+from pipeline import SCAN_MODE, DetectionPipeline, ScanStabilizer
+from preview import PreviewEncoder
+from schema import InsightSchemaError, shared_insight
+from tracker import describe_summary
+from workers import DETECTOR_WORKERS
+
+scan_logger = logging.getLogger("curioscope.scan")
+
+# Lifetime of the token in the URL. It is re-issued at every saved step and the previous one deleted, so a URL
+# left in a shared browser's history stops working soon after the user moves on or logs out.
+HANDOFF_TTL = 900
+
+# How long the sidebar cache/store counters may lag; each refresh is a COUNT(*) per store
+SIDEBAR_STATS_TTL = 10
 
 if "authenticated" not in st.session_state:
     st.session_state.authenticated = False
     st.session_state.username = ""
+    st.session_state.session_token = ""
+    st.session_state.handoff_token = ""
     st.session_state.detected_objects = []
+    st.session_state.scene = ""
     st.session_state.quiz_data = []
     st.session_state.quiz_answers = {}
     st.session_state.ai_response = {}
+    st.session_state.ai_response_partial = False
+
+if "theme" not in st.session_state:
+    st.session_state.theme = "light"
 
 def logout():
+    if st.session_state.handoff_token:
+        delete_session(st.session_state.handoff_token)
+    st.query_params.pop("session", None)
     st.session_state.authenticated = False
     st.session_state.username = ""
+    st.session_state.session_token = ""
+    st.session_state.handoff_token = ""
     st.session_state.detected_objects = []
+    st.session_state.scene = ""
     st.session_state.quiz_data = []
     st.session_state.quiz_answers = {}
+    st.session_state.quiz_result = ""
     st.session_state.ai_response = {}
     st.rerun()
 
+# What a session needs to carry on from another app worker, saved at each step of the flow under a short-lived
+# handoff token that the URL carries. The insight goes in as its payload and is validated again on restore.
+HANDOFF_KEYS = ("detected_objects", "scene", "quiz_answers", "ai_response_partial", "feedback_submitted", "theme")
+
+def save_handoff():
+    state = {key: st.session_state.get(key) for key in HANDOFF_KEYS}
+    state["ai_response"] = st.session_state.ai_response.to_payload() if st.session_state.ai_response else None
+    previous = st.session_state.handoff_token
+    token = issue_session_token(st.session_state.username, HANDOFF_TTL)
+    save_session(token, st.session_state.username, state, HANDOFF_TTL)
+    st.session_state.handoff_token = token
+    st.query_params["session"] = token
+    if previous:
+        delete_session(previous)
+
+def restore_handoff(token):
+    username = verify_session_token(token)
+    saved = load_session(token) if username else None
+    if saved is None or saved[0] != username:
+        return False
+    state = saved[1]
+    st.session_state.authenticated = True
+    st.session_state.username = username
+    # The URL token only carries the handoff; this worker's session gets its own full-length token
+    st.session_state.session_token = issue_session_token(username)
+    st.session_state.handoff_token = token
+    for key in HANDOFF_KEYS:
+        if key in state:
+            st.session_state[key] = state[key]
+    # JSON object keys come back as strings
+    st.session_state.quiz_answers = {int(idx): answer for idx, answer in (state.get("quiz_answers") or {}).items()}
+    if state.get("ai_response"):
+        insight = shared_insight(state["ai_response"])
+        st.session_state.ai_response = insight
+        st.session_state.quiz_data = insight.quiz
+    # Rotated straight away, so a copied URL restores the session at most once
+    save_handoff()
+    return True
+
 def login_page():
     st.title("🔑 Login or Register")
     tab1, tab2 = st.tabs(["🔐 Login", "📝 Register"])
@@ -118,6 +119,9 @@ def login_page():
             if login_user(username, password):
                 st.session_state.authenticated = True
                 st.session_state.username = username
+                st.session_state.session_token = issue_session_token(username)
+                # Puts a handoff token in the URL so a reconnect that lands on another app worker can restore the session
+                save_handoff()
                 st.success("✅ Login successful!")
                 st.rerun()
             else:
@@ -133,13 +137,86 @@ def login_page():
             else:
                 st.error("❌ Username already exists. Try another one.")
 
-init_db()
+# Render insight sections as they stream in; the full tabs take over on the rerun once the response is complete
+def stream_insights_to_page(objects, scene=None):
+    live = {}
+
+    def on_event(key, value):
+        if not live:
+            live["tabs"] = st.tabs(["📜 AI Insights", "🛠 Step-by-Step Activity", "📝 Quiz"])
+            live["activities"] = 0
+            live["questions"] = 0
+        insights_tab, activity_tab, quiz_tab = live["tabs"]
+
+        if key == "detailed_explanation":
+            insights_tab.markdown(f"🏷 *Detailed Explanation:*\n\n{value}")
+        elif key == "combined_usage":
+            insights_tab.markdown(f"🎭 *Combined Usage:*\n\n{value}")
+        elif key == "step_by_step_activity" and isinstance(value, dict):
+            live["activities"] += 1
+            with activity_tab:
+                st.write(f"### Activity {live['activities']}")
+                st.write(f"*Objects:* {', '.join(value.get('objects', []))}")
+                for step in value.get("steps", []):
+                    st.write(f"- {step}")
+        elif key == "quiz" and isinstance(value, dict):
+            live["questions"] += 1
+            quiz_tab.write(f"*Q{live['questions']}: {value.get('question', '')}*")
+
+    # Cache hits come straight back; otherwise the service streams (or joins another session's identical request)
+    # under its concurrency and rate limits. With COMPOSE_INSIGHTS only the combination part streams.
+    return insight_service.stream(objects, on_event, scene)
+
+# Process-wide setup, run on the first script run only; every later rerun and session gets the same objects back
+@st.cache_resource
+def load_resources():
+    init_db()
+    # Prometheus /metrics endpoint or periodic metrics log, if configured
+    start_exporter()
+    model = create_model()
+    # Shared across sessions: one event loop, one concurrency/rate budget, one upstream call per in-flight object set
+    insight_service = get_insight_service(model, get_insight_cache(), get_knowledge_store() if COMPOSE_INSIGHTS else None)
+    # Loads and warms the shared model; later sessions reuse it. With detector workers the model lives in those
+    detector = None if DETECTOR_WORKERS else get_detector()
+    return model, insight_service, detector
+
+@st.cache_data(ttl=SIDEBAR_STATS_TTL)
+def sidebar_stats():
+    return {
+        "cache": get_insight_cache().stats(),
+        "knowledge": get_knowledge_store().stats() if COMPOSE_INSIGHTS else None,
+        "detector": detector.metrics() if detector else get_scheduler().metrics(),
+    }
+
+model, insight_service, detector = load_resources()
+# A session that starts without state on this worker (first visit to it, or a reconnect the load balancer sent
+# elsewhere) picks up where it left off when the URL carries a valid session token
+if not st.session_state.authenticated and st.query_params.get("session"):
+    restore_handoff(st.query_params["session"])
+# Opt-in per session with ?profile=1 in the URL; profiles land in profiles/
+profiling = st.query_params.get("profile") == "1"
+# Reruns trust the signed token (one HMAC) instead of re-verifying the password; an expired one logs the user out.
+# Active sessions slide: a token past half its lifetime is re-issued, so only an idle session runs out.
+if st.session_state.authenticated:
+    if verify_session_token(st.session_state.session_token) != st.session_state.username:
+        logout()
+    st.session_state.session_token = renew_session_token(st.session_state.session_token)
 if not st.session_state.authenticated:
     login_page()
 else:
     st.sidebar.write(f"👤 Logged in as: {st.session_state.username}")
     if st.sidebar.button("Logout"):
         logout()
+    sidebar = sidebar_stats()
+    detector_metrics = sidebar["detector"]
+    cache_stats = sidebar["cache"]
+    st.sidebar.caption(f"💾 Insight cache: {cache_stats['entries']} entries · {cache_stats['hit_rate']:.0%} hit rate")
+    if sidebar["knowledge"]:
+        st.sidebar.caption(f"📚 Knowledge store: {sidebar['knowledge']['objects']} objects")
+    if detector:
+        st.sidebar.caption(f"🧠 Detector ({detector_metrics['backend']}) load: {detector_metrics['load_time_s']:.2f}s · warmup: {detector_metrics['warmup_time_s']:.2f}s")
+    else:
+        st.sidebar.caption(f"🧠 Detector: {detector_metrics['workers']} remote workers · {detector_metrics['mean_round_trip_ms']} ms per frame")
     
     st.title("📷 CurioScope: Real-Time Object Detection & AI Insights")
     st.write("Click 'Start Detection' to scan objects and get structured insights.")
@@ -150,36 +227,42 @@ else:
             st.error("Could not access the webcam. Please check your camera.")
             st.stop()
 
-        model_yolo = YOLO("yolov8n.pt")
         frame_placeholder = st.empty()
-        detected_objects = set()
-        start_time = time.time()
-
-        while time.time() - start_time < DETECTION_DURATION:
-            ret, frame = cap.read()
-            if not ret:
-                st.error("Failed to capture frame.")
-                break
-
-            results = model_yolo(frame)
 
-            for result in results:
-                for box in result.boxes:
-                    conf = float(box.conf[0])
-                    cls = int(box.cls[0])
-                    object_name = model_yolo.names[cls].lower().strip()
+        preview = PreviewEncoder()
 
-                    if conf > CONFIDENCE_THRESHOLD and object_name not in EXCLUDED_CLASSES:
-                        detected_objects.add(object_name)
+        def show_frame(frame, detections):
+            jpeg = preview.encode(frame, detections)
+            if jpeg is not None:
+                with span("preview_push"):
+                    frame_placeholder.image(jpeg, use_container_width=True)
 
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frame_placeholder.image(frame, channels="RGB", use_container_width=True)
+        # Frames from all sessions share micro-batches on the process-wide model
+        stabilizer = ScanStabilizer() if SCAN_MODE == "adaptive" else None
+        pipeline = DetectionPipeline(cap, get_scheduler().detect, stabilizer=stabilizer)
+        with profiled(f"scan-{st.session_state.username}", profiling):
+            detected_objects = pipeline.run(show_frame)
+        if pipeline.error:
+            st.error(pipeline.error)
 
         cap.release()
         cv2.destroyAllWindows()
 
+        stats = pipeline.report()
+        stats["preview"] = preview.metrics()
+        st.caption(
+            f"📈 Scanned for {stats['scan']['elapsed_s']}s · capture {stats['capture']['fps']} fps · inference {stats['inference']['fps']} fps "
+            f"({stats['inference']['dropped_frames']} stale frames skipped, {stats['policy']['inference_calls']} model calls) · preview {stats['display']['fps']} fps, {stats['preview']['kb_per_s']} KB/s"
+        )
+        scan_logger.info("pipeline stats: %s", json.dumps(stats))
         st.session_state.detected_objects = list(detected_objects)
-        print("Detected Objects:", st.session_state.detected_objects)  # Debugging
+        # "3 books, held in view for 6 s", limited to the objects the scan confirmed
+        tracked = stats.get("tracker", {}).get("objects", {})
+        st.session_state.scene = describe_summary({name: tracked[name] for name in detected_objects if name in tracked})
+        if detected_objects:
+            # Feeds the precompute job (`python -m curioscope precompute`), which ranks the common object sets
+            log_detection_set(st.session_state.username, detected_objects)
+        save_handoff()
 
     if st.session_state.detected_objects:
         st.write("### ✅ Detected Objects:")
@@ -188,86 +271,45 @@ else:
 
     if not st.session_state.ai_response:
         if st.session_state.detected_objects:
-            object_prompt = f"""
-            You are an AI that provides structured details about objects. Given a list of objects, return a JSON response with:
-
-            1. *"detailed_explanation"* – A detailed explanation of the detected objects and their significance.
-            2. *"combined_usage"* – If objects can interact, describe how they can be used together in a meaningful way.
-            3. *"step_by_step_activity"* – Activities involving detected objects.
-            4. *"quiz"* – At least *4 multiple-choice questions (MCQs)* with:
-               - "question": The question text.
-               - "options": {{"A": "Option A", "B": "Option B", "C": "Option C", "D": "Option D"}}
-               - "correct_answer": The correct option as a string (e.g., "B").
-            5. *"youtube_links"* – Provide at least *3 YouTube links*.
-
-            Objects: {', '.join(st.session_state.detected_objects)}
-
-            ### *Expected JSON Format*
-            {{
-                "detailed_explanation": "Extensive explanation...",
-                "combined_usage": "How objects can be used together...",
-                "step_by_step_activity": [
-                    {{
-                        "objects": ["Object1", "Object2"],
-                        "steps": [
-                            "Step 1: Do this...",
-                            "Step 2: Then do this...",
-                            "Step 3: Complete the action..."
-                        ]
-                    }}
-                ],
-                "youtube_links": ["https://youtube.com/video1", "https://youtube.com/video2"],
-                "quiz": [
-                    {{
-                        "question": "Example question?",
-                        "options": {{"A": "Option A", "B": "Option B", "C": "Option C", "D": "Option D"}},
-                        "correct_answer": "B"
-                    }}
-                ]
-            }}
-            """
-
-            response = model.generate_content(object_prompt)
-
-            output_text = response.text.strip()
-            if output_text.startswith("```json"):
-                output_text = output_text[7:-3].strip()
-
             try:
-                structured_output = json.loads(output_text)
+                streaming = STREAM_RESPONSES
+                with profiled(f"insights-{st.session_state.username}", profiling):
+                    if streaming:
+                        structured_output, complete = stream_insights_to_page(st.session_state.detected_objects,
+                                                                                    st.session_state.get("scene"))
+                    else:
+                        structured_output = insight_service.fetch(st.session_state.detected_objects,
+                                                                   scene=st.session_state.get("scene"))
+                        complete = True
                 if not structured_output:
                     st.error("The AI did not return a valid response. Please try again.")
                 else:
-                    st.session_state.ai_response = structured_output
-                    st.session_state.quiz_data = structured_output.get("quiz", [])
+                    # Validated once here; sessions that got the same payload share one Insight object
+                    insight = shared_insight(structured_output)
+                    st.session_state.ai_response = insight
+                    st.session_state.ai_response_partial = not complete
+                    st.session_state.quiz_data = insight.quiz
                     st.session_state.quiz_answers = {i: None for i in range(len(st.session_state.quiz_data))}
-            except json.JSONDecodeError:
+                    save_handoff()
+                    if streaming:
+                        st.rerun()
+            except (json.JSONDecodeError, InsightSchemaError):
                 st.error("Failed to parse the AI response. Please try again.")
+            except TRANSIENT_ERRORS:
+                st.error("The AI service is busy right now. Please try again in a moment.")
         else:
             st.warning("No objects detected. Please try again.")
 if st.sidebar.button("Reset Session"):
     st.session_state.detected_objects = []
+    st.session_state.scene = ""
     st.session_state.ai_response = {}
     st.session_state.quiz_answers = {}
+    st.session_state.quiz_result = ""
+    # The button is shown before login too; only a logged-in session has a handoff to update
+    if st.session_state.authenticated:
+        save_handoff()
     st.rerun()
 
-def save_feedback(username, rating, feedback):
-    conn = sqlite3.connect("users.db")
-    c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS feedback (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT,
-            rating INTEGER,
-            feedback TEXT,
-            timestamp DATETIME
-        )
-    """)
-    c.execute("INSERT INTO feedback (username, rating, feedback, timestamp) VALUES (?, ?, ?, ?)",
-              (username, rating, feedback, datetime.now()))
-    conn.commit()
-    conn.close()
-
 def embed_youtube_video(url):
     try:
         video_id = url.split("v=")[1].split("&")[0]  # Extract video ID from URL
@@ -282,190 +324,179 @@ def embed_youtube_video(url):
 if "feedback_submitted" not in st.session_state:
     st.session_state.feedback_submitted = False
 
+LEADERBOARD_COLORS = {
+    "dark": {"width": "100%", "text": "#ffffff", "border": "#444", "stripe": "#2d2d2d", "hover": "#444"},
+    "light": {"width": "50%", "text": "#000000", "border": "#ddd", "stripe": "#f2f2f2", "hover": "#ddd"},
+}
+
+# The whole table goes out as one markdown element; rebuilt only when the rows or the theme change
+@st.cache_data(max_entries=64)
+def leaderboard_html(rows, theme):
+    colors = LEADERBOARD_COLORS[theme]
+    body = "".join(
+        f"<tr><td>{rank}</td><td>{escape(str(username))}</td><td>{score}</td><td>{escape(str(timestamp))}</td></tr>"
+        for rank, (username, score, timestamp) in enumerate(rows, start=1)
+    )
+    return f"""
+        <style>
+        .leaderboard-table {{
+            width: {colors['width']};
+            border-collapse: collapse;
+            color: {colors['text']};
+        }}
+        .leaderboard-table th, .leaderboard-table td {{
+            padding: 12px;
+            text-align: left;
+            border-bottom: 1px solid {colors['border']};
+        }}
+        .leaderboard-table th {{
+            background-color: #4CAF50;
+            color: white;
+        }}
+        .leaderboard-table tr:nth-child(even) {{
+            background-color: {colors['stripe']};
+        }}
+        .leaderboard-table tr:hover {{
+            background-color: {colors['hover']};
+        }}
+        </style>
+        <table class="leaderboard-table">
+            <tr><th>Rank</th><th>Username</th><th>Score</th><th>Date</th></tr>
+            {body}
+        </table>
+    """
+
+# Fragments: widgets inside them rerun only their own function, so answering a quiz question or moving the
+# feedback slider doesn't re-execute the detection UI, the insight tabs or the leaderboard
+@st.fragment
+def quiz_tab():
+    st.subheader("📝 Take the Quiz!")
+    score = 0
+    total_questions = len(st.session_state.quiz_data)
+
+    # Set on submit and shown after the full rerun below
+    if st.session_state.get("quiz_result"):
+        st.success(st.session_state.quiz_result)
+
+    for idx, q in enumerate(st.session_state.quiz_data):
+        st.write(f"*Q{idx+1}: {q.question}*")
+
+        selected_answer = st.radio(
+            f"Select an answer for Q{idx+1}:",
+            q.options,
+            key=f"quiz_{idx}",
+            index=None
+        )
+
+        if selected_answer:
+            st.session_state.quiz_answers[idx] = selected_answer
+
+    if st.button("Submit Quiz"):
+        for idx, q in enumerate(st.session_state.quiz_data):
+            if q.is_correct(st.session_state.quiz_answers[idx]):
+                score += 1
+        st.session_state.quiz_result = f"🎉 You scored {score}/{total_questions}!"
+
+        save_quiz_score(st.session_state.username, score)
+        save_handoff()
+        # A fragment rerun would leave the leaderboard fragment showing the rank from before this score
+        st.rerun()
+
+@st.fragment
+def feedback_tab():
+    st.markdown(f"<h3 style='text-align: center;'>📝 Feedback</h3>", unsafe_allow_html=True)
+
+    if not st.session_state.feedback_submitted:
+        st.write("We value your feedback! Please rate your learning session and let us know how we can improve.")
+        rating = st.slider("Rate your learning session (1 = Poor, 10 = Excellent)", 1, 10, 5)
+        feedback = st.text_area("Any suggestions for improvement?")
+
+        if st.button("Submit Feedback"):
+            save_feedback(st.session_state.username, rating, feedback)
+            st.session_state.feedback_submitted = True
+            save_handoff()
+            st.success("Thank you for your feedback!")
+
+            # Suggest improvements based on the rating
+            if rating <= 5:
+                st.warning("We're sorry to hear that your experience wasn't great.")
+
+            elif 6 <= rating <= 8:
+                st.info("Thank you for your feedback! Here are some ways we can make your experience even better:")
+
+            else:
+                st.success("We're thrilled you enjoyed the session! Here are some ideas for future enhancements:")
+
+    else:
+        st.write("Thank you for your feedback! We appreciate your input.")
+
+@st.fragment
+def leaderboard_tab():
+    st.markdown(f"<h3 style='text-align: center;'>🏆 Leaderboard</h3>", unsafe_allow_html=True)
+
+    # Served from the repository's short-lived cache, which is dropped whenever a new score is written
+    leaderboard_data = get_leaderboard()
+
+    if leaderboard_data:
+        st.write("Here are the top performers:")
+
+    my_rank = get_user_rank(st.session_state.username)
+    if my_rank:
+        st.write(f"🎯 Your best score: {my_rank[1]} (rank #{my_rank[0]})")
+
+    if leaderboard_data:
+        rows = tuple(tuple(row) for row in leaderboard_data)
+        st.markdown(leaderboard_html(rows, st.session_state.theme), unsafe_allow_html=True)
+    else:
+        st.write("No scores yet. Be the first to take the quiz!")
+
 if st.session_state.ai_response:
-    structured_output = st.session_state.ai_response
+    insight = st.session_state.ai_response
+    if st.session_state.ai_response_partial:
+        st.warning("The AI response was cut off, so some sections may be missing.")
     tab1, tab2, tab3, tab4,tab5,tab6 = st.tabs(["📜 AI Insights", "🛠 Step-by-Step Activity", "📝 Quiz", "📺 YouTube Videos","feedback","LeaderBoard"])
 
     with tab1:
         explanation_text = f"""
         🏷 *Detailed Explanation:*
         ----------------------------
-        {structured_output.get('detailed_explanation', 'No explanation available.')}
+        {insight.detailed_explanation or 'No explanation available.'}
 
         🎭 *Combined Usage:*
         ----------------------------
-        {structured_output.get('combined_usage', 'No combined usage available.')}
+        {insight.combined_usage or 'No combined usage available.'}
         """
         st.text_area("📜 AI Insights", explanation_text, height=300)
 
     with tab2:
         st.subheader("🛠 Step-by-Step Activities")
-        activities = structured_output.get("step_by_step_activity", [])
+        activities = insight.activities
         if activities:
             for idx, activity in enumerate(activities):
                 st.write(f"### Activity {idx+1}")
-                st.write(f"*Objects:* {', '.join(activity['objects'])}")
+                st.write(f"*Objects:* {', '.join(activity.objects)}")
                 st.write("*Steps:*")
-                for step in activity["steps"]:
+                for step in activity.steps:
                     st.write(f"- {step}")
         else:
             st.write("No activities available.")
 
     with tab3:
-        st.subheader("📝 Take the Quiz!")
-        score = 0
-        total_questions = len(st.session_state.quiz_data)
-
-        for idx, q in enumerate(st.session_state.quiz_data):
-            st.write(f"*Q{idx+1}: {q['question']}*")
-            options = q["options"]  
-            correct_option = options[q["correct_answer"]]
-
-            selected_answer = st.radio(
-                f"Select an answer for Q{idx+1}:",
-                list(options.values()),
-                key=f"quiz_{idx}",
-                index=None
-            )
-
-            if selected_answer:
-                st.session_state.quiz_answers[idx] = selected_answer
-
-        if st.button("Submit Quiz"):
-            for idx, q in enumerate(st.session_state.quiz_data):
-                if st.session_state.quiz_answers[idx] == q["options"][q["correct_answer"]]:
-                    score += 1
-            st.success(f"🎉 You scored {score}/{total_questions}!")
-
-            save_quiz_score(st.session_state.username, score)
+        quiz_tab()
 
     with tab4:
         st.session_state.active_tab = "📺 YouTube Videos"
         st.markdown(f"<h3 style='text-align: center;'>📺 Recommended YouTube Videos:</h3>", unsafe_allow_html=True)
-        for link in structured_output.get("youtube_links", []):
+        for link in insight.youtube_links:
             embed_youtube_video(link)
 
     with tab5:
         st.session_state.active_tab = "📝 Feedback"
-        st.markdown(f"<h3 style='text-align: center;'>📝 Feedback</h3>", unsafe_allow_html=True)
-
-        if not st.session_state.feedback_submitted:
-            st.write("We value your feedback! Please rate your learning session and let us know how we can improve.")
-            rating = st.slider("Rate your learning session (1 = Poor, 10 = Excellent)", 1, 10, 5)
-            feedback = st.text_area("Any suggestions for improvement?")
-
-            if st.button("Submit Feedback"):
-                save_feedback(st.session_state.username, rating, feedback)
-                st.session_state.feedback_submitted = True
-                st.success("Thank you for your feedback!")
-
-                # Suggest improvements based on the rating
-                if rating <= 5:
-                    st.warning("We're sorry to hear that your experience wasn't great.")
-                    
-                elif 6 <= rating <= 8:
-                    st.info("Thank you for your feedback! Here are some ways we can make your experience even better:")
-                    
-                else:
-                    st.success("We're thrilled you enjoyed the session! Here are some ideas for future enhancements:")
-                    
-        else:
-            st.write("Thank you for your feedback! We appreciate your input.")
-    # --- Leaderboard Tab ---
+        feedback_tab()
+
     with tab6:
         st.session_state.active_tab = "🏆 Leaderboard"
-        st.markdown(f"<h3 style='text-align: center;'>🏆 Leaderboard</h3>", unsafe_allow_html=True)
-
-            # Fetch leaderboard data
-        leaderboard_data = get_leaderboard()
-
-        if leaderboard_data:
-            st.write("Here are the top performers:")
-    
-    # Theme-specific table styling
-        if st.session_state.theme == "dark":
-            table_style = """
-            <style>
-            .leaderboard-table {
-                width: 100%;
-                border-collapse: collapse;
-                color: #ffffff;
-            }
-            .leaderboard-table th, .leaderboard-table td {
-                padding: 12px;
-                text-align: left;
-                border-bottom: 1px solid #444;
-            }
-            .leaderboard-table th {
-                background-color: #4CAF50;
-                color: white;
-            }
-            .leaderboard-table tr:nth-child(even) {
-                background-color: #2d2d2d;
-            }
-            .leaderboard-table tr:hover {
-                background-color: #444;
-            }
-            </style>
-        """
-        else:
-            table_style = """
-            <style>
-            .leaderboard-table {
-                width: 50%;
-                border-collapse: collapse;
-                color: #000000;
-            }
-            .leaderboard-table th, .leaderboard-table td {
-                padding: 12px;
-                text-align: left;
-                border-bottom: 1px solid #ddd;
-            }
-            .leaderboard-table th {
-                background-color: #4CAF50;
-                color: white;
-            }
-            .leaderboard-table tr:nth-child(even) {
-                background-color: #f2f2f2;
-            }
-            .leaderboard-table tr:hover {
-                background-color: #ddd;
-            }
-            </style>
-        """
-    
-    # Inject the table style
-    st.markdown(table_style, unsafe_allow_html=True)
-    
-    # Start the table
-    st.markdown("""
-        <table class="leaderboard-table">
-            <tr>
-                <th>Rank</th>
-                <th>Username</th>
-                <th>Score</th>
-                <th>Date</th>
-            </tr>
-    """, unsafe_allow_html=True)
-    
-    # Add rows to the table
-    for rank, (username, score, timestamp) in enumerate(leaderboard_data, start=1):
-        st.markdown(f"""
-            <tr>
-                <td>{rank}</td>
-                <td>{username}</td>
-                <td>{score}</td>
-                <td>{timestamp}</td>
-            </tr>
-        """, unsafe_allow_html=True)
-    
-    # Close the table
-    st.markdown("</table>", unsafe_allow_html=True)
-else:
-    st.write("No scores yet. Be the first to take the quiz!")
-
-if "theme" not in st.session_state:
-    st.session_state.theme = "light"
+        leaderboard_tab()
 
 # Function to toggle theme
 def toggle_theme():
@@ -477,38 +508,44 @@ def toggle_theme():
 # Add a toggle button in the sidebar
 st.sidebar.button("Toggle Theme (Light/Dark)", on_click=toggle_theme)
 
-def apply_theme():
-    if st.session_state.theme == "dark":
-        st.markdown(
-            """
+THEME_COLORS = {
+    "dark": {"background": "#1e1e1e", "text": "#ffffff", "input": "#2d2d2d"},
+    "light": {"background": "#ffffff", "text": "#000000", "input": "#ffffff"},
+}
+
+# Built once per theme; only the resulting <style> element is sent on each rerun
+@st.cache_data
+def theme_css(theme):
+    colors = THEME_COLORS[theme]
+    return f"""
             <style>
             /* General app background and text color */
-            .stApp {
-                background-color: #1e1e1e;
-                color: #ffffff;
-            }
+            .stApp {{
+                background-color: {colors['background']};
+                color: {colors['text']};
+            }}
             /* Sidebar background and text color */
-            .css-18e3th9 {
-                background-color: #1e1e1e;
-                color: #ffffff;
-            }
+            .css-18e3th9 {{
+                background-color: {colors['background']};
+                color: {colors['text']};
+            }}
             /* Main content area background and text color */
-            .css-1d391kg {
-                background-color: #1e1e1e;
-                color: #ffffff;
-            }
+            .css-1d391kg {{
+                background-color: {colors['background']};
+                color: {colors['text']};
+            }}
             /* Text input fields */
-            .stTextInput>div>div>input {
-                background-color: #2d2d2d;
-                color: #ffffff;
-            }
+            .stTextInput>div>div>input {{
+                background-color: {colors['input']};
+                color: {colors['text']};
+            }}
             /* Text area fields */
-            .stTextArea>div>div>textarea {
-                background-color: #2d2d2d;
-                color: #ffffff;
-            }
+            .stTextArea>div>div>textarea {{
+                background-color: {colors['input']};
+                color: {colors['text']};
+            }}
             /* Buttons */
-            .stButton>button {
+            .stButton>button {{
                 background-color: #4CAF50;
                 color: white;
                 border: none;
@@ -520,90 +557,28 @@ def apply_theme():
                 margin: 4px 2px;
                 cursor: pointer;
                 border-radius: 12px;
-            }
+            }}
             /* Headers and titles */
-            h1, h2, h3, h4, h5, h6 {
-                color: #ffffff !important;
-            }
+            h1, h2, h3, h4, h5, h6 {{
+                color: {colors['text']} !important;
+            }}
             /* Regular text */
-            p, div, span, label {
-                color: #ffffff !important;
-            }
+            p, div, span, label {{
+                color: {colors['text']} !important;
+            }}
             /* Tables */
-            table, th, td {
-                color: #ffffff !important;
-            }
+            table, th, td {{
+                color: {colors['text']} !important;
+            }}
             /* Links */
-            a {
+            a {{
                 color: #4CAF50 !important;
-            }
+            }}
             </style>
-            """,
-            unsafe_allow_html=True,
-        )
-    else:
-        st.markdown(
             """
-            <style>
-            /* General app background and text color */
-            .stApp {
-                background-color: #ffffff;
-                color: #000000;
-            }
-            /* Sidebar background and text color */
-            .css-18e3th9 {
-                background-color: #ffffff;
-                color: #000000;
-            }
-            /* Main content area background and text color */
-            .css-1d391kg {
-                background-color: #ffffff;
-                color: #000000;
-            }
-            /* Text input fields */
-            .stTextInput>div>div>input {
-                background-color: #ffffff;
-                color: #000000;
-            }
-            /* Text area fields */
-            .stTextArea>div>div>textarea {
-                background-color: #ffffff;
-                color: #000000;
-            }
-            /* Buttons */
-            .stButton>button {
-                background-color: #4CAF50;
-                color: white;
-                border: none;
-                padding: 10px 24px;
-                text-align: center;
-                text-decoration: none;
-                display: inline-block;
-                font-size: 16px;
-                margin: 4px 2px;
-                cursor: pointer;
-                border-radius: 12px;
-            }
-            /* Headers and titles */
-            h1, h2, h3, h4, h5, h6 {
-                color: #000000 !important;
-            }
-            /* Regular text */
-            p, div, span, label {
-                color: #000000 !important;
-            }
-            /* Tables */
-            table, th, td {
-                color: #000000 !important;
-            }
-            /* Links */
-            a {
-                color: #4CAF50 !important;
-            }
-            </style>
-            """,
-            unsafe_allow_html=True,
-        )
+
+def apply_theme():
+    st.markdown(theme_css(st.session_state.theme), unsafe_allow_html=True)
 
 # Apply the selected theme
 apply_theme()
@@ -0,0 +1,507 @@
+import atexit
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+
+from auth import SESSION_TTL, dummy_hash, hash_password_bounded, verify_password_bounded
+from metrics import timed
+from storage import ConnectionPool, open_pool
+
+DB_PATH = "users.db"
+# Local writes invalidate the cached leaderboard immediately; the TTL bounds staleness from other processes
+LEADERBOARD_CACHE_TTL = 30
+
+# "sync" writes scores and feedback inside the request. "batched" queues them and commits grouped
+# transactions in the background; "batched-durable" does the same but fsyncs every batch (synchronous=FULL).
+WRITE_MODE = "sync"
+WRITE_BATCH_SIZE = 100
+WRITE_FLUSH_INTERVAL = 0.5
+
+# Schema migrations, applied once in order and tracked with PRAGMA user_version.
+# Never edit an applied migration; append a new one instead.
+MIGRATIONS = [
+    [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE,
+            password TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS leaderboard (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT,
+            score INTEGER,
+            timestamp DATETIME
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS feedback (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT,
+            rating INTEGER,
+            feedback TEXT,
+            timestamp DATETIME
+        )
+        """,
+    ],
+    [
+        # Covers the top-N query so it walks the index instead of sorting the whole table
+        "CREATE INDEX IF NOT EXISTS idx_leaderboard_rank ON leaderboard (score DESC, timestamp, username)",
+        """
+        CREATE TABLE IF NOT EXISTS best_scores (
+            username TEXT PRIMARY KEY,
+            score INTEGER,
+            timestamp DATETIME
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_best_scores_rank ON best_scores (score DESC, timestamp)",
+        """
+        INSERT OR REPLACE INTO best_scores (username, score, timestamp)
+        SELECT l.username, l.score, MIN(l.timestamp)
+        FROM leaderboard l
+        JOIN (SELECT username, MAX(score) AS score FROM leaderboard GROUP BY username) b
+          ON l.username = b.username AND l.score = b.score
+        GROUP BY l.username
+        """,
+    ],
+    [
+        # One row per finished scan: the normalised, comma-joined object set, for the insight precompute job
+        """
+        CREATE TABLE IF NOT EXISTS detection_sets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT,
+            objects TEXT,
+            timestamp DATETIME
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_detection_sets_timestamp ON detection_sets (timestamp)",
+    ],
+    [
+        # Session state keyed by a hash of the session token, so any app worker can pick up a user's session
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_key TEXT PRIMARY KEY,
+            username TEXT,
+            state TEXT,
+            expires_at REAL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)",
+    ],
+]
+
+# The same schema for a PostgreSQL server, tracked in schema_version. A server database starts empty, so the
+# first entry creates the tables as they stand after MIGRATIONS[:3]; append to both lists from here on.
+POSTGRES_MIGRATIONS = [
+    [
+        "CREATE TABLE IF NOT EXISTS users (id SERIAL PRIMARY KEY, username TEXT UNIQUE, password TEXT)",
+        "CREATE TABLE IF NOT EXISTS leaderboard (id SERIAL PRIMARY KEY, username TEXT, score INTEGER, timestamp TEXT)",
+        """
+        CREATE TABLE IF NOT EXISTS feedback (
+            id SERIAL PRIMARY KEY,
+            username TEXT,
+            rating INTEGER,
+            feedback TEXT,
+            timestamp TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_leaderboard_rank ON leaderboard (score DESC, timestamp, username)",
+        "CREATE TABLE IF NOT EXISTS best_scores (username TEXT PRIMARY KEY, score INTEGER, timestamp TEXT)",
+        "CREATE INDEX IF NOT EXISTS idx_best_scores_rank ON best_scores (score DESC, timestamp)",
+        "CREATE TABLE IF NOT EXISTS detection_sets (id SERIAL PRIMARY KEY, username TEXT, objects TEXT, timestamp TEXT)",
+        "CREATE INDEX IF NOT EXISTS idx_detection_sets_timestamp ON detection_sets (timestamp)",
+    ],
+    [
+        "CREATE TABLE IF NOT EXISTS sessions (session_key TEXT PRIMARY KEY, username TEXT, state TEXT, expires_at REAL)",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)",
+    ],
+]
+# Serialises migrations across app workers starting at the same time
+MIGRATION_LOCK_ID = 7243
+
+
+# Same text format the sqlite3 default datetime adapter wrote for the original rows
+def now_timestamp():
+    return datetime.now().isoformat(sep=" ")
+
+
+# BEGIN IMMEDIATE takes the write lock first, so concurrent app processes can't apply the same migration twice
+def migrate(conn):
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {number}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.isolation_level = isolation_level
+
+
+# Runs inside a transaction; the advisory lock does what BEGIN IMMEDIATE does for SQLite
+def migrate_postgres(conn):
+    conn.execute("SELECT pg_advisory_xact_lock(?)", (MIGRATION_LOCK_ID,))
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    row = conn.execute("SELECT version FROM schema_version").fetchone()
+    version = row[0] if row else 0
+    for statements in POSTGRES_MIGRATIONS[version:]:
+        for statement in statements:
+            conn.execute(statement)
+    if row is None:
+        conn.execute("INSERT INTO schema_version (version) VALUES (?)", (len(POSTGRES_MIGRATIONS),))
+    else:
+        conn.execute("UPDATE schema_version SET version = ?", (len(POSTGRES_MIGRATIONS),))
+
+
+def apply_migrations(pool):
+    if pool.dialect == "postgres":
+        with pool.transaction() as conn:
+            migrate_postgres(conn)
+    else:
+        with pool.connection() as conn:
+            migrate(conn)
+
+
+# The SQL strings are constants, so each pooled connection prepares them once and reuses the statement cache
+class Repository:
+    def __init__(self, pool):
+        self.pool = pool
+        self.leaderboard_cache = {}
+        self.leaderboard_version = 0
+        self.cache_lock = threading.Lock()
+        self.write_queue = None
+
+    def enable_write_behind(self, batch_size=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_INTERVAL, durable=False):
+        self.write_queue = WriteBehindQueue(self, batch_size, flush_interval, durable)
+
+    def invalidate_leaderboard(self):
+        with self.cache_lock:
+            self.leaderboard_version += 1
+            self.leaderboard_cache.clear()
+
+    # Hashing happens before a pooled connection is checked out, so slow hashes never hold one
+    def register_user(self, username, password):
+        password_hash = hash_password_bounded(password)
+        try:
+            with self.pool.transaction() as conn:
+                conn.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password_hash))
+            return True
+        except self.pool.IntegrityError:
+            return False
+
+    # Legacy SHA-256 and outdated-cost hashes are upgraded to the current hasher on a successful login
+    def login_user(self, username, password):
+        with self.pool.connection() as conn:
+            user = conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+        if user is None:
+            # Same hashing work as a wrong password, so response time doesn't reveal which usernames exist
+            verify_password_bounded(password, dummy_hash())
+            return None
+        matches, needs_rehash = verify_password_bounded(password, user[2])
+        if not matches:
+            return None
+        if needs_rehash:
+            with self.pool.transaction() as conn:
+                conn.execute("UPDATE users SET password = ? WHERE id = ?", (hash_password_bounded(password), user[0]))
+        return user
+
+    # Attempts and per-user bests are written in the same transaction, so the ranking never lags the log
+    def write_batch(self, scores, feedback, durable=False):
+        with self.pool.transaction(durable) as conn:
+            conn.executemany("INSERT INTO leaderboard (username, score, timestamp) VALUES (?, ?, ?)", scores)
+            conn.executemany("""
+                INSERT INTO best_scores (username, score, timestamp) VALUES (?, ?, ?)
+                ON CONFLICT(username) DO UPDATE SET score = excluded.score, timestamp = excluded.timestamp
+                WHERE excluded.score > best_scores.score
+            """, scores)
+            conn.executemany("INSERT INTO feedback (username, rating, feedback, timestamp) VALUES (?, ?, ?, ?)",
+                             feedback)
+        if scores:
+            self.invalidate_leaderboard()
+
+    def save_quiz_score(self, username, score):
+        if self.write_queue:
+            self.write_queue.enqueue_score(username, score)
+        else:
+            self.write_batch([(username, score, now_timestamp())], [])
+
+    # Like get_user_rank, scores still in the write-behind queue are merged in, so the leaderboard never disagrees
+    # with the rank a user was just shown
+    def get_leaderboard(self, limit=10, offset=0):
+        # Taken before the read: a score committed in between is then in both and dropped once below, never missed
+        pending = self.write_queue.pending_scores() if self.write_queue else []
+        rows = self._committed_leaderboard(limit + offset)
+        if pending:
+            committed = set(map(tuple, rows))
+            rows = sorted([tuple(row) for row in rows] + [row for row in pending if row not in committed],
+                          key=lambda row: (-row[1], row[2]))
+        return rows[offset:offset + limit]
+
+    def _committed_leaderboard(self, top):
+        now = time.monotonic()
+        with self.cache_lock:
+            cached = self.leaderboard_cache.get(top)
+            if cached and now - cached[0] < LEADERBOARD_CACHE_TTL:
+                return cached[1]
+            version = self.leaderboard_version
+
+        with self.pool.connection() as conn:
+            rows = conn.execute("""
+                SELECT username, score, timestamp
+                FROM leaderboard
+                ORDER BY score DESC, timestamp ASC
+                LIMIT ?
+            """, (top,)).fetchall()
+        # A write that landed while we were reading bumps the version; don't cache what might predate it
+        with self.cache_lock:
+            if version == self.leaderboard_version:
+                self.leaderboard_cache[top] = (now, rows)
+        return rows
+
+    # Rank by each user's best score, ties going to whoever got there first; None if the user has no scores.
+    # Scores still sitting in the write-behind queue count too, so users always see their own latest submit.
+    def get_user_rank(self, username):
+        with self.pool.connection() as conn:
+            best = conn.execute("SELECT score, timestamp FROM best_scores WHERE username = ?", (username,)).fetchone()
+            pending = self.write_queue.pending_best(username) if self.write_queue else None
+            if pending and (best is None or pending[0] > best[0]):
+                best = pending
+            if best is None:
+                return None
+            score, timestamp = best
+            ahead = conn.execute("""
+                SELECT COUNT(*) FROM best_scores
+                WHERE score > ? OR (score = ? AND timestamp < ?)
+            """, (score, score, timestamp)).fetchone()[0]
+        return ahead + 1, score
+
+    def save_feedback(self, username, rating, feedback):
+        if self.write_queue:
+            self.write_queue.enqueue_feedback(username, rating, feedback)
+        else:
+            self.write_batch([], [(username, rating, feedback, now_timestamp())])
+
+    def log_detection_set(self, username, objects):
+        with self.pool.transaction() as conn:
+            conn.execute("INSERT INTO detection_sets (username, objects, timestamp) VALUES (?, ?, ?)",
+                         (username, ",".join(sorted(objects)), now_timestamp()))
+
+    # Logged object sets, oldest first, as lists of names
+    def get_detection_sets(self, since=None):
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT objects FROM detection_sets WHERE timestamp >= ? ORDER BY timestamp",
+                (since or "",),
+            ).fetchall()
+        return [objects.split(",") for (objects,) in rows if objects]
+
+    # Expired sessions are swept on every save, which the expires_at index keeps cheap
+    def save_session(self, session_key, username, state, expires_at):
+        with self.pool.transaction() as conn:
+            conn.execute("""
+                INSERT INTO sessions (session_key, username, state, expires_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(session_key) DO UPDATE SET state = excluded.state, expires_at = excluded.expires_at
+            """, (session_key, username, json.dumps(state), expires_at))
+            conn.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),))
+
+    def load_session(self, session_key):
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT username, state FROM sessions WHERE session_key = ? AND expires_at >= ?",
+                               (session_key, time.time())).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def delete_session(self, session_key):
+        with self.pool.transaction() as conn:
+            conn.execute("DELETE FROM sessions WHERE session_key = ?", (session_key,))
+
+
+# Buffers score and feedback rows and commits them in grouped transactions, flushed when a batch fills up
+# or every flush_interval seconds. Pending rows are flushed on interpreter exit (Streamlit stops cleanly
+# on SIGINT/SIGTERM); a hard kill loses at most one interval of writes.
+class WriteBehindQueue:
+    def __init__(self, repository, batch_size=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_INTERVAL, durable=False):
+        self.repository = repository
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.durable = durable
+        self.cond = threading.Condition()
+        self.scores = []
+        self.feedback = []
+        self.unflushed_scores = {}
+        self.enqueued = 0
+        self.flushed = 0
+        self.closed = False
+        self.flush_requested = False
+        self.thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def _pending(self):
+        return len(self.scores) + len(self.feedback)
+
+    def enqueue_score(self, username, score):
+        row = (username, score, now_timestamp())
+        with self.cond:
+            self.scores.append(row)
+            self.unflushed_scores.setdefault(username, []).append(row)
+            self.enqueued += 1
+            if self._pending() >= self.batch_size:
+                self.cond.notify_all()
+
+    def enqueue_feedback(self, username, rating, feedback):
+        with self.cond:
+            self.feedback.append((username, rating, feedback, now_timestamp()))
+            self.enqueued += 1
+            if self._pending() >= self.batch_size:
+                self.cond.notify_all()
+
+    # Best (score, timestamp) among this user's not-yet-committed scores
+    def pending_best(self, username):
+        with self.cond:
+            rows = self.unflushed_scores.get(username)
+            if not rows:
+                return None
+            _, score, timestamp = min(rows, key=lambda row: (-row[1], row[2]))
+            return score, timestamp
+
+    # Every score row enqueued but not yet committed, as (username, score, timestamp)
+    def pending_scores(self):
+        with self.cond:
+            return [row for rows in self.unflushed_scores.values() for row in rows]
+
+    def _run(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(
+                    lambda: self._pending() >= self.batch_size or self.flush_requested or self.closed,
+                    self.flush_interval,
+                )
+                self.flush_requested = False
+                scores, self.scores = self.scores, []
+                feedback, self.feedback = self.feedback, []
+                closing = self.closed
+            if scores or feedback:
+                try:
+                    self.repository.write_batch(scores, feedback, self.durable)
+                except self.repository.pool.Error:
+                    # Put the rows back in front and try again on the next tick rather than dropping them
+                    with self.cond:
+                        self.scores[:0] = scores
+                        self.feedback[:0] = feedback
+                    time.sleep(self.flush_interval)
+                    continue
+                with self.cond:
+                    for row in scores:
+                        rows = self.unflushed_scores[row[0]]
+                        rows.remove(row)
+                        if not rows:
+                            del self.unflushed_scores[row[0]]
+                    self.flushed += len(scores) + len(feedback)
+                    self.cond.notify_all()
+            if closing:
+                with self.cond:
+                    if not self._pending():
+                        return
+
+    # Blocks until everything enqueued before the call has been committed
+    def flush(self, timeout=None):
+        with self.cond:
+            target = self.enqueued
+            self.flush_requested = True
+            self.cond.notify_all()
+            return self.cond.wait_for(lambda: self.flushed >= target, timeout)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join()
+
+
+_repository = None
+_repository_lock = threading.Lock()
+
+
+def get_repository():
+    global _repository
+    with _repository_lock:
+        if _repository is None:
+            pool = open_pool(DB_PATH)
+            apply_migrations(pool)
+            _repository = Repository(pool)
+            if WRITE_MODE != "sync":
+                _repository.enable_write_behind(durable=WRITE_MODE == "batched-durable")
+    return _repository
+
+
+def init_db():
+    get_repository()
+
+
+@timed("db.register_user")
+def register_user(username, password):
+    return get_repository().register_user(username, password)
+
+
+@timed("db.login_user")
+def login_user(username, password):
+    return get_repository().login_user(username, password)
+
+
+# Save quiz score to the leaderboard
+@timed("db.save_quiz_score")
+def save_quiz_score(username, score):
+    get_repository().save_quiz_score(username, score)
+
+
+# Fetch leaderboard data
+@timed("db.get_leaderboard")
+def get_leaderboard(limit=10, offset=0):
+    return get_repository().get_leaderboard(limit, offset)
+
+
+@timed("db.get_user_rank")
+def get_user_rank(username):
+    return get_repository().get_user_rank(username)
+
+
+@timed("db.save_feedback")
+def save_feedback(username, rating, feedback):
+    get_repository().save_feedback(username, rating, feedback)
+
+
+@timed("db.log_detection_set")
+def log_detection_set(username, objects):
+    get_repository().log_detection_set(username, objects)
+
+
+# Sessions are stored under a hash of the token, so the table never holds anything that can log a user in
+def session_key(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+@timed("db.save_session")
+def save_session(token, username, state, ttl=SESSION_TTL):
+    get_repository().save_session(session_key(token), username, state, time.time() + ttl)
+
+
+# (username, state) saved under this token, or None if there is none or it expired
+@timed("db.load_session")
+def load_session(token):
+    return get_repository().load_session(session_key(token))
+
+
+@timed("db.delete_session")
+def delete_session(token):
+    get_repository().delete_session(session_key(token))
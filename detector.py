@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from backends import load_backend
+from metrics import span
+
+MODEL_PATH = "yolov8n.pt"
+# "pytorch" (ultralytics default), "onnx" (ONNX Runtime, OpenVINO provider if installed) or "onnx-int8"
+DETECTOR_BACKEND = os.environ.get("CURIOSCOPE_DETECTOR_BACKEND", "pytorch")
+# Side of the square model input; 320 costs roughly a quarter of 640 and is plenty for tabletop objects
+INFERENCE_SIZE = int(os.environ.get("CURIOSCOPE_INFERENCE_SIZE", "640"))
+CONFIDENCE_THRESHOLD = 0.5
+EXCLUDED_CLASSES = {"person", "face", "human face", "man", "woman", "boy", "girl", "hand", "foot", "eye", "mouth", "leg"}
+DETECTION_DURATION = 10
+WARMUP_FRAME_SHAPE = (480, 640, 3)
+
+Detection = namedtuple("Detection", ["name", "confidence", "box"])
+
+
+# Keep only confident, non-human detections
+def filter_detections(detections):
+    return [det for det in detections if det.confidence > CONFIDENCE_THRESHOLD and det.name not in EXCLUDED_CLASSES]
+
+
+def filter_objects(detections):
+    return {det.name for det in filter_detections(detections)}
+
+
+class Detector:
+    def __init__(self, model_path=MODEL_PATH, backend=DETECTOR_BACKEND, image_size=INFERENCE_SIZE):
+        self.model_path = model_path
+        self.image_size = image_size
+        self.lock = threading.Lock()
+
+        start = time.perf_counter()
+        self.backend = load_backend(model_path, backend)
+        self.load_time = time.perf_counter() - start
+        self.warmup_time = 0.0
+        # Same lower-cased COCO names whichever backend runs, so EXCLUDED_CLASSES filtering is unchanged
+        self.names = {cls: name.lower().strip() for cls, name in self.backend.names.items()}
+
+    # Run one dummy frame so the first real scan doesn't pay the fuse/allocation cost
+    def warmup(self, shape=WARMUP_FRAME_SHAPE):
+        start = time.perf_counter()
+        self.detect(np.zeros(shape, dtype=np.uint8))
+        self.warmup_time = time.perf_counter() - start
+
+    def _to_detections(self, raw):
+        return [Detection(self.names[cls], confidence, box) for cls, confidence, box in raw]
+
+    # The ultralytics predictor keeps per-call state, so sessions take turns on the shared model
+    def detect_batch(self, frames):
+        with self.lock, span("model"):
+            results = self.backend.predict(frames, self.image_size)
+        return [self._to_detections(raw) for raw in results]
+
+    def detect(self, frame):
+        return self.detect_batch([frame])[0]
+
+    def detect_objects(self, frame):
+        return filter_objects(self.detect(frame))
+
+    def metrics(self):
+        return {
+            "model_path": self.model_path,
+            "backend": self.backend.name,
+            "image_size": self.image_size,
+            "load_time_s": self.load_time,
+            "warmup_time_s": self.warmup_time,
+        }
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+# One warmed-up detector per process, shared by every Streamlit session
+def get_detector():
+    global _detector
+    with _detector_lock:
+        if _detector is None:
+            detector = Detector()
+            detector.warmup()
+            _detector = detector
+    return _detector
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import random
+import re
+import time
+
+# Offline stand-in for genai.GenerativeModel: answers the insight prompt with a canned, well-formed payload.
+# Enable it in the app with CURIOSCOPE_FAKE_GEMINI=1. latency and failure_rate mimic a slow, flaky upstream;
+# failures raise ConnectionError, which the insight service treats as transient.
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+def fake_payload(objects):
+    return {
+        "detailed_explanation": f"These objects were detected: {', '.join(objects)}.",
+        "combined_usage": f"{' and '.join(objects)} can be used together in a simple experiment.",
+        "step_by_step_activity": [
+            {
+                "objects": objects,
+                "steps": [
+                    "Step 1: Place the objects on a table.",
+                    "Step 2: Compare their shapes and sizes.",
+                    "Step 3: Note down what each one is used for.",
+                ],
+            }
+        ],
+        "youtube_links": [f"https://www.youtube.com/watch?v=fake{i}" for i in range(3)],
+        "quiz": [
+            {
+                "question": f"Which of these objects was detected? ({i + 1})",
+                "options": {"A": objects[0], "B": "elephant", "C": "rocket", "D": "volcano"},
+                "correct_answer": "A",
+            }
+            for i in range(4)
+        ],
+    }
+
+
+# Answers for the knowledge store's per-object and combination prompts (knowledge.py)
+def fake_object_payload(objects):
+    return {
+        name: {
+            "detailed_explanation": f"A {name} is an everyday object.",
+            "youtube_links": [f"https://www.youtube.com/watch?v=fake-{name.replace(' ', '-')}{i}" for i in range(3)],
+            "quiz": [
+                {
+                    "question": f"What is a {name} mostly used for? ({i + 1})",
+                    "options": {"A": f"Using the {name}", "B": "Flying", "C": "Swimming", "D": "Sleeping"},
+                    "correct_answer": "A",
+                }
+                for i in range(6)
+            ],
+        }
+        for name in objects
+    }
+
+
+def fake_combination_payload(objects):
+    payload = fake_payload(objects)
+    return {key: payload[key] for key in ("combined_usage", "step_by_step_activity")}
+
+
+class FakeGeminiModel:
+    def __init__(self, latency=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+
+    def _objects(self, prompt):
+        match = re.search(r"Objects: (.*)", prompt)
+        objects = [name.strip() for name in match.group(1).split(",")] if match else []
+        return objects or ["object"]
+
+    def _stream(self, text, chunk_size):
+        for start in range(0, len(text), chunk_size):
+            if self.latency:
+                time.sleep(self.latency / 10)
+            yield FakeResponse(text[start:start + chunk_size])
+
+    def _render(self, prompt):
+        self.calls += 1
+        if random.random() < self.failure_rate:
+            raise ConnectionError("fake upstream failure")
+        if "For EACH object separately" in prompt:
+            render = fake_object_payload
+        elif "return ONLY a JSON response" in prompt:
+            render = fake_combination_payload
+        else:
+            render = fake_payload
+        text = json.dumps(render(self._objects(prompt)), indent=2)
+        return f"```json\n{text}\n```"
+
+    def generate_content(self, prompt, stream=False):
+        text = self._render(prompt)
+        if stream:
+            return self._stream(text, max(1, len(text) // 10))
+        if self.latency:
+            time.sleep(self.latency)
+        return FakeResponse(text)
+
+    async def generate_content_async(self, prompt):
+        text = self._render(prompt)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return FakeResponse(text)
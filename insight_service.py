@@ -0,0 +1,342 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from fake_gemini import FakeGeminiModel
+from insights import build_prompt, cache_key, normalize_objects, parse_response, stream_insights
+from knowledge import build_combination_prompt, build_object_prompt, compose, parse_fragments, stream_composed_insights
+from metrics import REGISTRY, Histogram
+
+try:
+    from google.api_core import exceptions as api_exceptions
+    TRANSIENT_ERRORS = (
+        asyncio.TimeoutError,
+        ConnectionError,
+        api_exceptions.ResourceExhausted,
+        api_exceptions.ServiceUnavailable,
+        api_exceptions.DeadlineExceeded,
+        api_exceptions.InternalServerError,
+    )
+except ImportError:
+    TRANSIENT_ERRORS = (asyncio.TimeoutError, ConnectionError)
+
+GEMINI_MODEL = "gemini-1.5-flash"
+
+MAX_CONCURRENCY = 4
+# Token bucket sized to the Gemini per-minute quota
+RATE_PER_SECOND = 1.0
+BURST = 5
+MAX_RETRIES = 3
+REQUEST_TIMEOUT = 30
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8
+# Longest a session waits on another session's identical stream before giving up with a transient error
+JOIN_TIMEOUT = 120
+
+QUEUE_DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64)
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+
+
+# Only ever touched from the service's event loop, so it needs no lock
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# Runs every Gemini call on one background event loop, so the Streamlit script threads only block on a future.
+# Identical in-flight prompts share a single upstream call. With a knowledge store, insights are composed from
+# per-object fragments and only the combination-specific part is requested for each new object set.
+class InsightService:
+    def __init__(self, model, cache=None, store=None, max_concurrency=MAX_CONCURRENCY, rate=RATE_PER_SECOND,
+                 burst=BURST, max_retries=MAX_RETRIES, timeout=REQUEST_TIMEOUT):
+        self.model = model
+        self.cache = cache
+        self.store = store
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.bucket = TokenBucket(rate, burst)
+        self.in_flight = {}
+        self.waiting = 0
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.failures = 0
+        self.queue_depth = Histogram(QUEUE_DEPTH_BUCKETS)
+        self.latency = Histogram(LATENCY_BUCKETS)
+        REGISTRY.register("insight_queue_depth", self.queue_depth)
+        REGISTRY.register("insight_upstream_seconds", self.latency)
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="insight-service", daemon=True)
+        self.thread.start()
+
+    async def _generate(self, prompt):
+        if hasattr(self.model, "generate_content_async"):
+            return await self.model.generate_content_async(prompt)
+        return await asyncio.to_thread(self.model.generate_content, prompt)
+
+    # Retries transient failures with full-jitter exponential backoff; every attempt spends a rate-limit token
+    async def _call_upstream(self, prompt):
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            try:
+                response = await asyncio.wait_for(self._generate(prompt), self.timeout)
+                return response.text
+            except TRANSIENT_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)))
+
+    async def _pull(self, chunks, deadline):
+        return await asyncio.wait_for(asyncio.to_thread(next, chunks, None), max(0.0, deadline - time.monotonic()))
+
+    # Streaming counterpart of _call_upstream: an attempt counts as started once its first chunk arrives, so a
+    # transient failure before that is retried with the same backoff. The timeout covers the whole stream.
+    async def _start_stream(self, prompt):
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            deadline = time.monotonic() + self.timeout
+            try:
+                chunks = await asyncio.wait_for(
+                    asyncio.to_thread(lambda: iter(self.model.generate_content(prompt, stream=True))), self.timeout)
+                return await self._pull(chunks, deadline), chunks, deadline
+            except TRANSIENT_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)))
+
+    # Blocking chunk iterator for the script thread; each chunk is read on the loop so the deadline applies
+    def _stream_chunks(self, prompt):
+        chunk, chunks, deadline = asyncio.run_coroutine_threadsafe(self._start_stream(prompt), self.loop).result()
+        while chunk is not None:
+            yield chunk
+            chunk = asyncio.run_coroutine_threadsafe(self._pull(chunks, deadline), self.loop).result()
+
+    async def _acquire_slot(self):
+        self.waiting += 1
+        self.queue_depth.observe(self.waiting)
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+    async def _request(self, prompt):
+        await self._acquire_slot()
+        started = time.perf_counter()
+        try:
+            self.upstream_calls += 1
+            return await self._call_upstream(prompt)
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self.semaphore.release()
+            self.latency.observe(time.perf_counter() - started)
+
+    async def _fetch_fragments(self, names):
+        missing = await asyncio.to_thread(self.store.missing, names)
+        if not missing:
+            return {}
+        fragments = parse_fragments(await self._request(build_object_prompt(missing)), missing)
+        await asyncio.to_thread(self.store.put_many, fragments)
+        return fragments
+
+    # The fragment and combination calls are independent, so they go out together
+    async def _fetch_composed(self, objects, scene=None):
+        combination_text, _ = await asyncio.gather(
+            self._request(build_combination_prompt(objects, scene)), self._fetch_fragments(objects))
+        fragments = await asyncio.to_thread(self.store.get_many, objects)
+        return compose(objects, fragments, parse_response(combination_text)), \
+            len(fragments) == len(normalize_objects(objects))
+
+    async def _fetch_upstream(self, objects, scene=None):
+        if self.store is None:
+            structured_output, complete = parse_response(await self._request(build_prompt(objects, scene))), True
+        else:
+            structured_output, complete = await self._fetch_composed(objects, scene)
+        if structured_output and complete and self.cache is not None:
+            await asyncio.to_thread(self.cache.put, objects, structured_output)
+        return structured_output, complete
+
+    # Every in-flight call, fetched or streamed, resolves to (payload, complete)
+    def _register(self, key, task):
+        def done(task):
+            self.in_flight.pop(key, None)
+            # Marks a failure as retrieved even when nobody joined; every waiter still gets it from its own await
+            if not task.cancelled():
+                task.exception()
+
+        self.in_flight[key] = task
+        task.add_done_callback(done)
+
+    # The caller either gets the call already in flight for key, or owns a new placeholder that it must settle
+    async def _claim(self, key):
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task, False
+        future = self.loop.create_future()
+        self._register(key, future)
+        return future, True
+
+    async def _join(self, task):
+        return await asyncio.shield(task)
+
+    # Requests are coalesced on the object names alone; a caller joining an in-flight call gets that call's answer,
+    # whatever scene description it was asked with
+    async def fetch_async(self, objects, scene=None):
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cache.get, objects)
+            if cached is not None:
+                return cached
+
+        key = cache_key(objects)
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_upstream(objects, scene))
+            self._register(key, task)
+        else:
+            self.coalesced += 1
+        # Shielded so one caller timing out doesn't cancel the call the others are waiting on
+        payload, _ = await asyncio.shield(task)
+        return payload
+
+    # Non-blocking: returns a concurrent.futures.Future, so batch jobs can queue many sets on the service at once
+    def submit(self, objects, scene=None):
+        return asyncio.run_coroutine_threadsafe(self.fetch_async(objects, scene), self.loop)
+
+    # Blocking entry point for Streamlit script threads
+    def fetch(self, objects, timeout=None, scene=None):
+        return self.submit(objects, scene).result(timeout)
+
+    # Blocking; fetches fragments for whichever of the names the knowledge store lacks and returns them
+    def fetch_fragments(self, names, timeout=None):
+        return asyncio.run_coroutine_threadsafe(self._fetch_fragments(names), self.loop).result(timeout)
+
+    # Streaming counterpart of fetch, for the app's default path; on_event(key, value) fires as sections complete.
+    # Returns (payload, complete). Cache hits return straight away without a slot or a rate-limit token. A miss is
+    # registered under the same single-flight key as fetch, so other sessions asking for the same objects, streaming
+    # or not, wait for this stream instead of making their own upstream call.
+    def stream(self, objects, on_event, scene=None, timeout=JOIN_TIMEOUT):
+        if self.cache is not None:
+            cached = self.cache.get(objects)
+            if cached is not None:
+                return cached, True
+
+        future, owner = asyncio.run_coroutine_threadsafe(self._claim(cache_key(objects)), self.loop).result()
+        if not owner:
+            return asyncio.run_coroutine_threadsafe(self._join(future), self.loop).result(timeout)
+        model = _ServiceStreamModel(self)
+        streaming = False
+        try:
+            if self.store is not None:
+                # Fragment requests take their own slots, so they run before this stream holds one
+                self.fetch_fragments(objects)
+                streaming = True
+                with self.slot():
+                    result = stream_composed_insights(model, objects, on_event, self.store, None, scene)
+            else:
+                streaming = True
+                with self.slot():
+                    result = stream_insights(model, objects, on_event, None, scene)
+            structured_output, complete = result
+            if structured_output and complete and self.cache is not None:
+                self.cache.put(objects, structured_output)
+        except Exception as e:
+            # A failed fragment request was already counted by _request
+            if streaming:
+                self.failures += 1
+            self.loop.call_soon_threadsafe(_settle, future, None, e)
+            raise
+        except BaseException:
+            # Waiters must never hang on an abandoned stream (a Streamlit rerun interrupts the script with a
+            # BaseException); they get a transient error and can retry
+            error = ConnectionError("streamed insight request was interrupted")
+            self.loop.call_soon_threadsafe(_settle, future, None, error)
+            raise
+        self.loop.call_soon_threadsafe(_settle, future, result, None)
+        return result
+
+    # Holds a concurrency slot for a call driven from a script thread (streaming); rate-limit tokens are taken per
+    # attempt by _start_stream
+    @contextmanager
+    def slot(self):
+        asyncio.run_coroutine_threadsafe(self._acquire_slot(), self.loop).result()
+        started = time.perf_counter()
+        self.upstream_calls += 1
+        try:
+            yield
+        finally:
+            self.latency.observe(time.perf_counter() - started)
+            self.loop.call_soon_threadsafe(self.semaphore.release)
+
+    def metrics(self):
+        return {
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "failures": self.failures,
+            "in_flight": len(self.in_flight),
+            "queue_depth": self.queue_depth.snapshot(),
+            "latency_s": self.latency.snapshot(),
+            "latency_p95_s": self.latency.quantile(0.95),
+        }
+
+
+# What the stream_* helpers get as their model, so streamed calls go through the service's retries and timeout
+class _ServiceStreamModel:
+    def __init__(self, service):
+        self.service = service
+
+    def generate_content(self, prompt, stream=False):
+        return self.service._stream_chunks(prompt)
+
+
+def _settle(future, result, error):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+# Shared by the app and the headless jobs; CURIOSCOPE_FAKE_GEMINI=1 swaps in the offline stub
+def create_model():
+    if os.environ.get("CURIOSCOPE_FAKE_GEMINI"):
+        return FakeGeminiModel()
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.environ.get("GEMINI_API_KEY", "YOUR_GEMINI_API_KEY"))
+    return genai.GenerativeModel(GEMINI_MODEL)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_insight_service(model, cache=None, store=None):
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = InsightService(model, cache, store)
+    return _service
@@ -0,0 +1,387 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from contextlib import nullcontext
+
+from metrics import inc, span, timed
+from schema import Insight, InsightSchemaError
+from storage import open_pool
+
+# Bump whenever PROMPT_TEMPLATE changes so cached responses from the old prompt are not served
+PROMPT_VERSION = 1
+
+CACHE_PATH = "insights_cache.db"
+CACHE_TTL = 7 * 24 * 3600
+CACHE_MAX_ENTRIES = 5000
+# With more than one variant per object set, misses keep filling new variants and hits pick one at random
+CACHE_VARIANTS = 1
+# Hits only record their LRU touch in memory; the touches are written together at most this often, and before
+# every put() so eviction sees them
+CACHE_TOUCH_INTERVAL = 30
+
+# Stream the Gemini response and render sections as they complete instead of waiting for the whole payload
+STREAM_RESPONSES = True
+
+PROMPT_TEMPLATE = """
+            You are an AI that provides structured details about objects. Given a list of objects, return a JSON response with:
+
+            1. *"detailed_explanation"* – A detailed explanation of the detected objects and their significance.
+            2. *"combined_usage"* – If objects can interact, describe how they can be used together in a meaningful way.
+            3. *"step_by_step_activity"* – Activities involving detected objects.
+            4. *"quiz"* – At least *4 multiple-choice questions (MCQs)* with:
+               - "question": The question text.
+               - "options": {{"A": "Option A", "B": "Option B", "C": "Option C", "D": "Option D"}}
+               - "correct_answer": The correct option as a string (e.g., "B").
+            5. *"youtube_links"* – Provide at least *3 YouTube links*.
+
+            Objects: {objects}
+
+            ### *Expected JSON Format*
+            {{
+                "detailed_explanation": "Extensive explanation...",
+                "combined_usage": "How objects can be used together...",
+                "step_by_step_activity": [
+                    {{
+                        "objects": ["Object1", "Object2"],
+                        "steps": [
+                            "Step 1: Do this...",
+                            "Step 2: Then do this...",
+                            "Step 3: Complete the action..."
+                        ]
+                    }}
+                ],
+                "youtube_links": ["https://youtube.com/video1", "https://youtube.com/video2"],
+                "quiz": [
+                    {{
+                        "question": "Example question?",
+                        "options": {{"A": "Option A", "B": "Option B", "C": "Option C", "D": "Option D"}},
+                        "correct_answer": "B"
+                    }}
+                ]
+            }}
+            """
+
+
+def normalize_objects(objects):
+    return sorted({name.lower().strip() for name in objects if name.strip()})
+
+
+# scene is the tracker's description of the scan ("3 books, held in view for 6 s"). It only shapes the answer:
+# cache keys stay on the object names, so every scan of the same objects still shares one cached response.
+def objects_line(objects, scene=None):
+    line = ", ".join(normalize_objects(objects))
+    return f"{line}\n            Seen during the scan: {scene}" if scene else line
+
+
+@timed("prompt_build")
+def build_prompt(objects, scene=None):
+    return PROMPT_TEMPLATE.format(objects=objects_line(objects, scene))
+
+
+def cache_key(objects):
+    payload = json.dumps({"objects": normalize_objects(objects), "prompt_version": PROMPT_VERSION})
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# Gemini usually wraps the JSON in a ```json fence; raises json.JSONDecodeError on anything unparseable
+def parse_response(text):
+    with span("json_parse"):
+        output_text = text.strip()
+        if output_text.startswith("```json"):
+            output_text = output_text[7:-3].strip()
+        try:
+            return json.loads(output_text)
+        except json.JSONDecodeError:
+            inc("parse_failures")
+            raise
+
+
+# Incremental parser for the streamed insight JSON. feed() returns (key, value) events as soon as a
+# top-level field is complete; for list fields (quiz, activities, links) every finished item is its own event.
+class StreamingInsightParser:
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.state = "key"
+        self.key = None
+        self.key_start = None
+        self.value_start = None
+        self.array_key = None
+        self.item_start = None
+        self.result = {}
+        self.events = []
+
+    def _emit(self, key, text, item=False):
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError:
+            return
+        if item:
+            self.result[key].append(value)
+        else:
+            self.result[key] = value
+        self.events.append((key, value))
+
+    def _token_start(self, i, char):
+        if self.depth == 1 and self.state == "key" and char == '"':
+            self.key_start = i
+        elif self.depth == 1 and self.state == "value" and self.value_start is None:
+            self.value_start = i
+            if char == "[":
+                self.array_key = self.key
+                self.result[self.key] = []
+        elif self.depth == 2 and self.array_key is not None and self.item_start is None:
+            self.item_start = i
+
+    def _string_closed(self, i):
+        if self.depth == 1 and self.state == "key" and self.key_start is not None:
+            self.key = json.loads(self.buffer[self.key_start:i + 1])
+            self.key_start = None
+            self.state = "colon"
+        elif self.depth == 1 and self.state == "value" and self.value_start is not None:
+            self._emit(self.key, self.buffer[self.value_start:i + 1])
+            self.value_start = None
+            self.state = "comma"
+        elif self.depth == 2 and self.array_key is not None and self.item_start is not None \
+                and self.buffer[self.item_start] == '"':
+            self._emit(self.array_key, self.buffer[self.item_start:i + 1], item=True)
+            self.item_start = None
+
+    # Numbers, booleans and null have no closing delimiter of their own
+    def _flush_literal(self, i):
+        if self.depth == 2 and self.array_key is not None and self.item_start is not None:
+            self._emit(self.array_key, self.buffer[self.item_start:i].strip(), item=True)
+            self.item_start = None
+        elif self.depth == 1 and self.state == "value" and self.value_start is not None \
+                and self.buffer[self.value_start] not in "[{":
+            self._emit(self.key, self.buffer[self.value_start:i].strip())
+            self.value_start = None
+            self.state = "comma"
+
+    def _container_closed(self, i):
+        if self.depth == 1 and self.value_start is not None:
+            if self.array_key is None:
+                self._emit(self.key, self.buffer[self.value_start:i + 1])
+            self.array_key = None
+            self.value_start = None
+            self.state = "comma"
+        elif self.depth == 2 and self.array_key is not None and self.item_start is not None:
+            self._emit(self.array_key, self.buffer[self.item_start:i + 1], item=True)
+            self.item_start = None
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        self.events = []
+        for i in range(self.pos, len(self.buffer)):
+            char = self.buffer[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    self._string_closed(i)
+            elif self.depth == 0:
+                # Skip the markdown fence and any prose around the JSON object
+                if char == "{":
+                    self.depth = 1
+            elif char == '"':
+                self._token_start(i, char)
+                self.in_string = True
+            elif char in "{[":
+                self._token_start(i, char)
+                self.depth += 1
+            elif char in "}]":
+                self._flush_literal(i)
+                self.depth -= 1
+                self._container_closed(i)
+            elif char == ",":
+                self._flush_literal(i)
+                if self.depth == 1:
+                    self.state = "key"
+            elif char == ":" and self.depth == 1 and self.state == "colon":
+                self.state = "value"
+            elif not char.isspace():
+                self._token_start(i, char)
+        self.pos = len(self.buffer)
+        return self.events
+
+    # Returns (payload, complete). A cut-off or malformed stream keeps every section that finished parsing.
+    def finish(self):
+        try:
+            return parse_response(self.buffer), True
+        except json.JSONDecodeError:
+            if not self.result:
+                raise
+            return self.result, False
+
+
+# Content-addressed store of parsed insight payloads with TTL expiry and LRU eviction. Kept in CACHE_PATH, or in
+# the shared server database when CURIOSCOPE_DATABASE_URL is set, so every app worker serves the same entries.
+class InsightCache:
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, variants=CACHE_VARIANTS,
+                 pool=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.variants = variants
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.touched = {}
+        self.touches_written = time.monotonic()
+        self.pool = pool or open_pool(path)
+        with self.pool.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS insight_cache (
+                    key TEXT,
+                    variant INTEGER,
+                    objects TEXT,
+                    payload TEXT,
+                    created_at REAL,
+                    last_access REAL,
+                    PRIMARY KEY (key, variant)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_insight_cache_last_access ON insight_cache (last_access)")
+
+    # A plain read: expired rows are skipped here and deleted by put(), and the LRU touch is deferred
+    def get(self, objects):
+        key = cache_key(objects)
+        now = time.time()
+        with self.pool.connection() as conn:
+            rows = conn.execute("SELECT variant, payload FROM insight_cache WHERE key = ? AND created_at >= ?",
+                                (key, now - self.ttl)).fetchall()
+        if len(rows) < self.variants:
+            with self.lock:
+                self.misses += 1
+            inc("insight_cache_misses")
+            return None
+        variant, payload = random.choice(rows)
+        with self.lock:
+            self.hits += 1
+            self.touched[(key, variant)] = now
+            due = time.monotonic() - self.touches_written >= CACHE_TOUCH_INTERVAL
+        if due:
+            self.write_touches()
+        inc("insight_cache_hits")
+        return json.loads(payload)
+
+    def write_touches(self, conn=None):
+        with self.lock:
+            touched, self.touched = self.touched, {}
+            self.touches_written = time.monotonic()
+        if not touched:
+            return
+        # put() passes its own transaction in
+        with nullcontext(conn) if conn is not None else self.pool.transaction() as conn:
+            conn.executemany("UPDATE insight_cache SET last_access = ? WHERE key = ? AND variant = ?",
+                             [(accessed, key, variant) for (key, variant), accessed in touched.items()])
+
+    # Like get() without touching the hit/miss stats or the LRU order, for jobs that fill the cache
+    def contains(self, objects):
+        with self.pool.connection() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM insight_cache WHERE key = ? AND created_at >= ?",
+                                 (cache_key(objects), time.time() - self.ttl)).fetchone()[0]
+        return count >= self.variants
+
+    # Only validated payloads are stored, normalized the way the page will read them; a malformed or empty response
+    # is dropped (counted as insight_cache_rejects) instead of being served to every session for the whole TTL
+    def put(self, objects, payload):
+        try:
+            insight = Insight.from_payload(payload)
+        except InsightSchemaError:
+            insight = None
+        if insight is None or not (insight.detailed_explanation or insight.quiz):
+            inc("insight_cache_rejects")
+            return False
+        payload = insight.to_payload()
+        key = cache_key(objects)
+        now = time.time()
+        with self.pool.transaction() as conn:
+            variants = [row[0] for row in conn.execute(
+                "SELECT variant FROM insight_cache WHERE key = ? ORDER BY created_at", (key,)).fetchall()]
+            if len(variants) >= self.variants:
+                variant = variants[0]
+            else:
+                variant = max(variants) + 1 if variants else 0
+            conn.execute("""
+                INSERT INTO insight_cache (key, variant, objects, payload, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(key, variant) DO UPDATE SET objects = excluded.objects, payload = excluded.payload,
+                    created_at = excluded.created_at, last_access = excluded.last_access
+            """, (key, variant, ", ".join(normalize_objects(objects)), json.dumps(payload), now, now))
+            self.write_touches(conn)
+            conn.execute("DELETE FROM insight_cache WHERE created_at < ?", (now - self.ttl,))
+            excess = conn.execute("SELECT COUNT(*) FROM insight_cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute("""
+                    DELETE FROM insight_cache WHERE (key, variant) IN (
+                        SELECT key, variant FROM insight_cache ORDER BY last_access ASC LIMIT ?
+                    )
+                """, (excess,))
+        return True
+
+    def stats(self):
+        with self.pool.connection() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM insight_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Serve from the cache when possible, otherwise ask Gemini and remember the parsed result
+def fetch_insights(model, objects, cache=None, scene=None):
+    if cache is not None:
+        cached = cache.get(objects)
+        if cached is not None:
+            return cached
+
+    prompt = build_prompt(objects, scene)
+    with span("generate_content"):
+        response = model.generate_content(prompt)
+    structured_output = parse_response(response.text)
+    if structured_output and cache is not None:
+        cache.put(objects, structured_output)
+    return structured_output
+
+
+# Streaming variant of fetch_insights: on_event(key, value) fires for every completed section or list item.
+# Returns (payload, complete); only complete payloads are cached.
+def stream_insights(model, objects, on_event, cache=None, scene=None):
+    if cache is not None:
+        cached = cache.get(objects)
+        if cached is not None:
+            return cached, True
+
+    parser = StreamingInsightParser()
+    prompt = build_prompt(objects, scene)
+    with span("generate_content_stream"):
+        for chunk in model.generate_content(prompt, stream=True):
+            for key, value in parser.feed(chunk.text):
+                on_event(key, value)
+    structured_output, complete = parser.finish()
+    if complete and structured_output and cache is not None:
+        cache.put(objects, structured_output)
+    return structured_output, complete
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_insight_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = InsightCache()
+    return _cache
@@ -0,0 +1,273 @@
+import json
+import random
+import sqlite3
+import threading
+import time
+
+from insights import StreamingInsightParser, normalize_objects, objects_line, parse_response
+from metrics import inc, span
+from schema import InsightSchemaError
+
+# Insights are composed from per-object fragments (explanation, question bank, links) generated once and kept in
+# KNOWLEDGE_PATH, plus a small per-set call for combined usage and joint activities
+COMPOSE_INSIGHTS = True
+KNOWLEDGE_PATH = "knowledge.db"
+# Bump whenever OBJECT_PROMPT_TEMPLATE changes; fragments from older prompts are regenerated on demand
+KNOWLEDGE_VERSION = 1
+QUESTIONS_PER_OBJECT = 6
+LINKS_PER_OBJECT = 3
+QUIZ_MIN, QUIZ_MAX = 4, 8
+LINKS_MIN, LINKS_MAX = 3, 6
+# Objects per request when filling the store ahead of time
+PREFETCH_BATCH_SIZE = 8
+
+OBJECT_PROMPT_TEMPLATE = """
+            You are an AI that provides structured details about objects. For EACH object separately, return:
+
+            1. *"detailed_explanation"* – A detailed explanation of the object and its significance.
+            2. *"quiz"* – Exactly *{questions} multiple-choice questions (MCQs)* about that object alone, with:
+               - "question": The question text.
+               - "options": {{"A": "Option A", "B": "Option B", "C": "Option C", "D": "Option D"}}
+               - "correct_answer": The correct option as a string (e.g., "B").
+            3. *"youtube_links"* – Provide *{links} YouTube links* about the object.
+
+            Objects: {objects}
+
+            ### *Expected JSON Format*, keyed by the object names exactly as given
+            {{
+                "Object1": {{
+                    "detailed_explanation": "Extensive explanation...",
+                    "youtube_links": ["https://youtube.com/video1", "https://youtube.com/video2"],
+                    "quiz": [
+                        {{
+                            "question": "Example question?",
+                            "options": {{"A": "Option A", "B": "Option B", "C": "Option C", "D": "Option D"}},
+                            "correct_answer": "B"
+                        }}
+                    ]
+                }}
+            }}
+            """
+
+COMBINATION_PROMPT_TEMPLATE = """
+            You are an AI that describes how objects work together. Given a list of objects, return ONLY a JSON response with:
+
+            1. *"combined_usage"* – If objects can interact, describe how they can be used together in a meaningful way.
+            2. *"step_by_step_activity"* – Activities involving the detected objects together.
+
+            Objects: {objects}
+
+            ### *Expected JSON Format*
+            {{
+                "combined_usage": "How objects can be used together...",
+                "step_by_step_activity": [
+                    {{
+                        "objects": ["Object1", "Object2"],
+                        "steps": [
+                            "Step 1: Do this...",
+                            "Step 2: Then do this...",
+                            "Step 3: Complete the action..."
+                        ]
+                    }}
+                ]
+            }}
+            """
+
+
+def build_object_prompt(names):
+    return OBJECT_PROMPT_TEMPLATE.format(objects=", ".join(normalize_objects(names)), questions=QUESTIONS_PER_OBJECT,
+                                         links=LINKS_PER_OBJECT)
+
+
+def build_combination_prompt(objects, scene=None):
+    return COMBINATION_PROMPT_TEMPLATE.format(objects=objects_line(objects, scene))
+
+
+# Gemini can answer with valid JSON that isn't an object (a list, a string); that is a schema error, not a crash
+def _json_object(payload, what):
+    if not isinstance(payload, dict):
+        raise InsightSchemaError(f"{what} must be an object, got {type(payload).__name__}")
+    return payload
+
+
+# Keeps only the requested objects that came back with an explanation and a usable question bank
+def parse_fragments(text, names):
+    payload = _json_object(parse_response(text), "object fragments")
+    by_name = {str(name).lower().strip(): fragment for name, fragment in payload.items() if isinstance(fragment, dict)}
+    fragments = {}
+    for name in normalize_objects(names):
+        fragment = by_name.get(name)
+        if not fragment or not fragment.get("detailed_explanation") or not isinstance(fragment.get("quiz"), list):
+            inc("knowledge_fragment_rejects")
+            continue
+        fragments[name] = {
+            "detailed_explanation": fragment["detailed_explanation"],
+            "quiz": [q for q in fragment["quiz"] if isinstance(q, dict) and q.get("question") and q.get("options")],
+            "youtube_links": [link for link in fragment.get("youtube_links", []) if isinstance(link, str)],
+        }
+    return fragments
+
+
+def _interleave(lists, limit):
+    picked = []
+    for i in range(max((len(items) for items in lists), default=0)):
+        for items in lists:
+            if i < len(items) and len(picked) < limit:
+                picked.append(items[i])
+    return picked
+
+
+def _explanation(objects, fragments):
+    names = [name for name in normalize_objects(objects) if name in fragments]
+    return "\n\n".join(f"**{name.title()}:** {fragments[name]['detailed_explanation']}" for name in names)
+
+
+# Builds a payload with the same keys as the single-prompt response, so the UI and quiz code don't change.
+# The quiz draws a shuffled, evenly spread selection from each object's stored question bank.
+def compose(objects, fragments, combination):
+    _json_object(combination, "combination payload")
+    names = [name for name in normalize_objects(objects) if name in fragments]
+    banks = [random.sample(fragments[name]["quiz"], len(fragments[name]["quiz"])) for name in names]
+    quiz_size = max(QUIZ_MIN, min(QUIZ_MAX, 2 * len(names)))
+    links_size = max(LINKS_MIN, min(LINKS_MAX, len(names)))
+    return {
+        "detailed_explanation": _explanation(objects, fragments),
+        "combined_usage": combination.get("combined_usage", ""),
+        "step_by_step_activity": combination.get("step_by_step_activity", []),
+        "youtube_links": _interleave([fragments[name]["youtube_links"] for name in names], links_size),
+        "quiz": _interleave(banks, quiz_size),
+    }
+
+
+# Per-object fragments shared by every session and every object set they appear in
+class KnowledgeStore:
+    def __init__(self, path=KNOWLEDGE_PATH, version=KNOWLEDGE_VERSION):
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS object_knowledge (
+                name TEXT,
+                version INTEGER,
+                fragment TEXT,
+                created_at REAL,
+                PRIMARY KEY (name, version)
+            )
+        """)
+        self.conn.commit()
+
+    def get_many(self, names):
+        names = normalize_objects(names)
+        if not names:
+            return {}
+        placeholders = ", ".join("?" * len(names))
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT name, fragment FROM object_knowledge WHERE version = ? AND name IN ({placeholders})",
+                (self.version, *names),
+            ).fetchall()
+            found = {name: json.loads(fragment) for name, fragment in rows}
+            self.hits += len(found)
+            self.misses += len(names) - len(found)
+        inc("knowledge_hits", len(found))
+        inc("knowledge_misses", len(names) - len(found))
+        return found
+
+    def missing(self, names):
+        names = normalize_objects(names)
+        placeholders = ", ".join("?" * len(names))
+        with self.lock:
+            known = {row[0] for row in self.conn.execute(
+                f"SELECT name FROM object_knowledge WHERE version = ? AND name IN ({placeholders})",
+                (self.version, *names))}
+        return [name for name in names if name not in known]
+
+    def put_many(self, fragments):
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO object_knowledge (name, version, fragment, created_at) VALUES (?, ?, ?, ?)",
+                [(name, self.version, json.dumps(fragment), now) for name, fragment in fragments.items()],
+            )
+            self.conn.commit()
+
+    def stats(self):
+        with self.lock:
+            objects = self.conn.execute(
+                "SELECT COUNT(*) FROM object_knowledge WHERE version = ?", (self.version,)).fetchone()[0]
+        lookups = self.hits + self.misses
+        return {"objects": objects, "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+def fetch_fragments(model, names, store):
+    missing = store.missing(names)
+    if not missing:
+        return {}
+    with span("generate_content"):
+        response = model.generate_content(build_object_prompt(missing))
+    fragments = parse_fragments(response.text, missing)
+    store.put_many(fragments)
+    return fragments
+
+
+# Composed counterpart of insights.fetch_insights: one small call per new object set, plus one call covering
+# every object the store has not seen yet
+def fetch_composed_insights(model, objects, store, cache=None, scene=None):
+    if cache is not None:
+        cached = cache.get(objects)
+        if cached is not None:
+            return cached
+
+    fetch_fragments(model, objects, store)
+    fragments = store.get_many(objects)
+    with span("generate_content"):
+        response = model.generate_content(build_combination_prompt(objects, scene))
+    structured_output = compose(objects, fragments, parse_response(response.text))
+    if len(fragments) == len(normalize_objects(objects)) and cache is not None:
+        cache.put(objects, structured_output)
+    return structured_output
+
+
+# Composed counterpart of insights.stream_insights. Stored fragments are emitted straight away; only the
+# combination call is streamed. Missing fragments should be fetched first (InsightService.fetch_fragments).
+def stream_composed_insights(model, objects, on_event, store, cache=None, scene=None):
+    if cache is not None:
+        cached = cache.get(objects)
+        if cached is not None:
+            return cached, True
+
+    fragments = store.get_many(objects)
+    known = compose(objects, fragments, {})
+    if known["detailed_explanation"]:
+        on_event("detailed_explanation", known["detailed_explanation"])
+    for question in known["quiz"]:
+        on_event("quiz", question)
+
+    parser = StreamingInsightParser()
+    with span("generate_content_stream"):
+        for chunk in model.generate_content(build_combination_prompt(objects, scene), stream=True):
+            for key, value in parser.feed(chunk.text):
+                on_event(key, value)
+    combination, complete = parser.finish()
+    _json_object(combination, "combination payload")
+    structured_output = dict(known, combined_usage=combination.get("combined_usage", ""),
+                             step_by_step_activity=combination.get("step_by_step_activity", []))
+    complete = complete and len(fragments) == len(normalize_objects(objects))
+    if complete and cache is not None:
+        cache.put(objects, structured_output)
+    return structured_output, complete
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_knowledge_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = KnowledgeStore()
+    return _store
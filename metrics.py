@@ -0,0 +1,214 @@
+import cProfile
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Fixed-bucket histogram; bucket bounds are upper limits, with an implicit +Inf bucket at the end
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        with self.lock:
+            index = len(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    index = i
+                    break
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    # Upper bound of the bucket holding the given quantile, which is as precise as a bucketed histogram gets
+    def quantile(self, q):
+        with self.lock:
+            if not self.count:
+                return 0.0
+            target = q * self.count
+            seen = 0
+            for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+                seen += count
+                if seen >= target:
+                    return bound
+        return float("inf")
+
+    def snapshot(self):
+        with self.lock:
+            cumulative = {}
+            seen = 0
+            for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+                seen += count
+                cumulative[bound] = seen
+            return {"buckets": cumulative, "count": self.count, "sum": self.sum}
+
+
+SPAN_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PROFILE_DIR = "profiles"
+
+
+# Process-wide counters and histograms, rendered in the Prometheus text format
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.spans = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe_span(self, name, seconds):
+        with self.lock:
+            histogram = self.spans.get(name)
+            if histogram is None:
+                histogram = self.spans[name] = Histogram(SPAN_BUCKETS)
+        histogram.observe(seconds)
+
+    # Expose a histogram owned by another component (e.g. the insight service) under its own metric name
+    def register(self, name, histogram):
+        with self.lock:
+            self.histograms[name] = histogram
+
+    def render(self):
+        with self.lock:
+            counters = sorted(self.counters.items())
+            spans = sorted(self.spans.items())
+            histograms = sorted(self.histograms.items())
+
+        lines = []
+        for name, value in counters:
+            lines.append(f"# TYPE curioscope_{name}_total counter")
+            lines.append(f"curioscope_{name}_total {value}")
+        if spans:
+            lines.append("# TYPE curioscope_span_seconds histogram")
+        for name, histogram in spans:
+            lines.extend(_render_histogram("curioscope_span_seconds", histogram, f'span="{name}",'))
+        for name, histogram in histograms:
+            lines.append(f"# TYPE curioscope_{name} histogram")
+            lines.extend(_render_histogram(f"curioscope_{name}", histogram, ""))
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        with self.lock:
+            counters = dict(self.counters)
+            spans = dict(self.spans)
+        return {
+            "counters": counters,
+            "spans": {
+                name: {"count": h.count, "mean_ms": h.sum / h.count * 1000 if h.count else 0.0,
+                       "p95_ms": h.quantile(0.95) * 1000}
+                for name, h in spans.items()
+            },
+        }
+
+
+def _render_histogram(metric, histogram, labels):
+    snapshot = histogram.snapshot()
+    lines = []
+    for bound, count in snapshot["buckets"].items():
+        le = "+Inf" if bound == float("inf") else repr(float(bound))
+        lines.append(f'{metric}_bucket{{{labels}le="{le}"}} {count}')
+    labels = "{" + labels.rstrip(",") + "}" if labels else ""
+    lines.append(f"{metric}_sum{labels} {snapshot['sum']}")
+    lines.append(f"{metric}_count{labels} {snapshot['count']}")
+    return lines
+
+
+REGISTRY = Registry()
+
+
+def inc(name, value=1):
+    REGISTRY.inc(name, value)
+
+
+@contextmanager
+def span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe_span(name, time.perf_counter() - start)
+
+
+def timed(name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _log_periodically(interval):
+    logger = logging.getLogger("curioscope.metrics")
+    while True:
+        time.sleep(interval)
+        logger.info(json.dumps(REGISTRY.summary()))
+
+
+_exporter_started = False
+_exporter_lock = threading.Lock()
+
+
+# CURIOSCOPE_METRICS_PORT serves /metrics for Prometheus; CURIOSCOPE_METRICS_LOG_INTERVAL logs a JSON summary
+# every N seconds instead. Safe to call on every rerun: only the first call in a process starts anything.
+def start_exporter():
+    global _exporter_started
+    with _exporter_lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+        port = os.environ.get("CURIOSCOPE_METRICS_PORT")
+        if port:
+            server = ThreadingHTTPServer(("0.0.0.0", int(port)), _MetricsHandler)
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        interval = os.environ.get("CURIOSCOPE_METRICS_LOG_INTERVAL")
+        if interval:
+            logging.basicConfig(level=logging.INFO)
+            threading.Thread(target=_log_periodically, args=(float(interval),), name="metrics-log", daemon=True).start()
+
+
+# cProfile of the calling (script) thread, dumped to PROFILE_DIR for snakeviz/pstats. The capture, inference
+# and batching threads are named so `py-spy dump/top` output shows which stage is busy.
+@contextmanager
+def profiled(label, enabled=True):
+    if not enabled:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        safe_label = "".join(c if c.isalnum() else "_" for c in label)
+        profiler.dump_stats(os.path.join(PROFILE_DIR, f"{safe_label}-{int(time.time())}.prof"))
@@ -0,0 +1,284 @@
+import threading
+import time
+from collections import Counter
+
+import cv2
+
+from detector import DETECTION_DURATION, Detection, filter_detections
+from metrics import inc, span
+from tracker import IoUTracker
+
+DISPLAY_FPS = 15
+
+# Adaptive scans stop once the confirmed object set has stopped changing; DETECTION_DURATION stays the upper bound
+SCAN_MODE = "adaptive"  # or "fixed"
+MIN_HITS = 3
+STABLE_FRAMES = 20
+STABLE_MS = 2000
+
+# Which frames reach the model. Skipped frames keep the previous result, which is all the scan needs since
+# it only collects object names. benchmarks/detection_policies.py reports calls saved and recall lost.
+FRAME_STRIDE = 1  # detect on every Nth frame the inference stage picks up
+MOTION_THRESHOLD = 0.0  # mean absolute grey-level change (0-255) below which a frame is skipped; 0 disables
+MOTION_MAX_SKIP = 10  # force a detection after this many skipped frames, static scene or not
+ROI = None  # (x1, y1, x2, y2) as fractions of the frame, e.g. (0.2, 0.2, 0.8, 0.8) for the centre
+MOTION_THUMBNAIL = (64, 48)
+
+# Follow each object across frames for per-object counts, dwell time and confidence (see tracker.py)
+TRACK_OBJECTS = True
+
+
+# Bounded queue of size one: a newer frame replaces an unread one, which counts as dropped
+class LatestFrameSlot:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.item = None
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self.cond:
+            if self.item is not None:
+                self.dropped += 1
+            self.item = item
+            self.cond.notify_all()
+
+    def get(self, timeout=None):
+        with self.cond:
+            self.cond.wait_for(lambda: self.item is not None or self.closed, timeout)
+            item, self.item = self.item, None
+            return item
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class StageStats:
+    def __init__(self):
+        self.frames = 0
+        self.started = time.monotonic()
+        self.stopped = None
+
+    def tick(self):
+        self.frames += 1
+
+    def fps(self):
+        elapsed = (self.stopped or time.monotonic()) - self.started
+        return self.frames / elapsed if elapsed > 0 else 0.0
+
+
+# A class only counts once it has been seen in min_hits frames, which drops one-frame false positives
+class ScanStabilizer:
+    def __init__(self, min_hits=MIN_HITS, stable_frames=STABLE_FRAMES, stable_ms=STABLE_MS):
+        self.min_hits = min_hits
+        self.stable_frames = stable_frames
+        self.stable_ms = stable_ms
+        self.hits = Counter()
+        self.confirmed = set()
+        self.frames = 0
+        self.frames_since_change = 0
+        self.changed_at = time.monotonic()
+
+    def update(self, objects, now=None):
+        now = time.monotonic() if now is None else now
+        self.frames += 1
+        self.hits.update(objects)
+        confirmed = {name for name, hits in self.hits.items() if hits >= self.min_hits}
+        if confirmed != self.confirmed:
+            self.confirmed = confirmed
+            self.frames_since_change = 0
+            self.changed_at = now
+        else:
+            self.frames_since_change += 1
+        return self.is_stable(now)
+
+    # An empty scene never counts as stable, so the user still gets the full window to bring objects into view
+    def is_stable(self, now=None):
+        if not self.confirmed:
+            return False
+        now = time.monotonic() if now is None else now
+        return (self.frames_since_change >= self.stable_frames
+                or (now - self.changed_at) * 1000 >= self.stable_ms)
+
+
+class DetectionPolicy:
+    def __init__(self, stride=FRAME_STRIDE, motion_threshold=MOTION_THRESHOLD, max_skip=MOTION_MAX_SKIP, roi=ROI):
+        self.stride = max(1, stride)
+        self.motion_threshold = motion_threshold
+        self.max_skip = max_skip
+        self.roi = roi
+        self.frames = 0
+        self.calls = 0
+        self.skipped_stride = 0
+        self.skipped_motion = 0
+        self.since_detect = 0
+        self.reference = None
+
+    # A tiny grey thumbnail makes the diff cost a few microseconds next to a model call
+    def _thumbnail(self, frame):
+        return cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), MOTION_THUMBNAIL, interpolation=cv2.INTER_AREA)
+
+    def should_detect(self, frame):
+        self.frames += 1
+        if (self.frames - 1) % self.stride:
+            self.skipped_stride += 1
+            return False
+        if self.motion_threshold > 0:
+            thumbnail = self._thumbnail(frame)
+            # Compared against the last frame that was detected on, so slow drift still adds up to a detection
+            if (self.reference is not None and self.since_detect < self.max_skip
+                    and cv2.absdiff(thumbnail, self.reference).mean() < self.motion_threshold):
+                self.since_detect += 1
+                self.skipped_motion += 1
+                return False
+            self.reference = thumbnail
+        self.since_detect = 0
+        self.calls += 1
+        return True
+
+    def prepare(self, frame):
+        if self.roi is None:
+            return frame
+        height, width = frame.shape[:2]
+        x1, y1, x2, y2 = self.roi
+        return frame[int(y1 * height):int(y2 * height), int(x1 * width):int(x2 * width)]
+
+    # Moves boxes from ROI coordinates back to full-frame coordinates
+    def restore(self, detections, frame):
+        if self.roi is None:
+            return detections
+        height, width = frame.shape[:2]
+        dx, dy = int(self.roi[0] * width), int(self.roi[1] * height)
+        return [Detection(det.name, det.confidence, [det.box[0] + dx, det.box[1] + dy, det.box[2] + dx, det.box[3] + dy])
+                for det in detections]
+
+    def metrics(self):
+        return {
+            "frames": self.frames,
+            "inference_calls": self.calls,
+            "skipped_stride": self.skipped_stride,
+            "skipped_motion": self.skipped_motion,
+            "saved_fraction": round(1 - self.calls / self.frames, 3) if self.frames else 0.0,
+        }
+
+
+# Capture, inference and display run at their own rates so slow inference never stalls the camera.
+# detect takes a frame and returns raw Detections; the pipeline applies the confidence/exclusion filter.
+class DetectionPipeline:
+    def __init__(self, cap, detect, duration=DETECTION_DURATION, display_fps=DISPLAY_FPS, stabilizer=None,
+                 policy=None, tracker=None):
+        self.cap = cap
+        self.detect = detect
+        self.duration = duration
+        self.stabilizer = stabilizer
+        self.policy = policy or DetectionPolicy()
+        self.tracker = tracker or (IoUTracker() if TRACK_OBJECTS else None)
+        self.stopped_early = False
+        self.elapsed = 0.0
+        self.display_interval = 1.0 / display_fps
+        self.inference_slot = LatestFrameSlot()
+        self.display_slot = LatestFrameSlot()
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.detected_objects = set()
+        self.latest_detections = []
+        self.error = None
+        self.stats = {"capture": StageStats(), "inference": StageStats(), "display": StageStats()}
+
+    def _capture_loop(self):
+        while not self.stop_event.is_set():
+            with span("capture"):
+                ret, frame = self.cap.read()
+            if not ret:
+                self.error = "Failed to capture frame."
+                self.stop_event.set()
+                break
+            self.stats["capture"].tick()
+            self.inference_slot.put(frame)
+            self.display_slot.put(frame)
+        self.inference_slot.close()
+        self.display_slot.close()
+
+    def _inference_loop(self):
+        while not self.stop_event.is_set():
+            frame = self.inference_slot.get(timeout=0.1)
+            if frame is None:
+                continue
+            if not self.policy.should_detect(frame):
+                inc("inference_skipped")
+                continue
+            try:
+                with span("inference"):
+                    detections = filter_detections(self.detect(self.policy.prepare(frame)))
+            except Exception as e:
+                # A dead model or detector worker ends the scan with the real error instead of an empty result
+                inc("inference_errors")
+                self.error = f"Detection failed: {e}"
+                self.stop_event.set()
+                break
+            inc("frames_processed")
+            objects = {det.name for det in detections}
+            # Swapped whole, so the display stage can read it without taking the lock
+            self.latest_detections = self.policy.restore(detections, frame)
+            # Only the inference thread touches the tracker until the scan is over
+            if self.tracker:
+                self.tracker.update(self.latest_detections)
+            with self.lock:
+                self.detected_objects |= objects
+                if self.stabilizer and self.stabilizer.update(objects):
+                    self.stopped_early = True
+                    self.stop_event.set()
+            self.stats["inference"].tick()
+
+    # Drives the display stage on the calling thread, since Streamlit elements must be updated from the script thread.
+    # show(frame, detections) gets the newest frame and the most recent detections, which may be a few frames old.
+    def run(self, show):
+        workers = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="inference", daemon=True),
+        ]
+        for stats in self.stats.values():
+            stats.started = time.monotonic()
+        for worker in workers:
+            worker.start()
+
+        started = time.monotonic()
+        deadline = started + self.duration
+        while time.monotonic() < deadline and not self.stop_event.is_set():
+            shown_at = time.monotonic()
+            frame = self.display_slot.get(timeout=self.display_interval)
+            if frame is not None:
+                show(frame, self.latest_detections)
+                self.stats["display"].tick()
+            remaining = self.display_interval - (time.monotonic() - shown_at)
+            if remaining > 0:
+                time.sleep(remaining)
+
+        self.stop_event.set()
+        for worker in workers:
+            worker.join()
+        self.elapsed = time.monotonic() - started
+        inc("frames_dropped", self.inference_slot.dropped)
+        inc("scans")
+        for stats in self.stats.values():
+            stats.stopped = time.monotonic()
+        with self.lock:
+            if self.stabilizer:
+                return set(self.stabilizer.confirmed)
+            return set(self.detected_objects)
+
+    def report(self):
+        report = {stage: {"frames": stats.frames, "fps": round(stats.fps(), 2)} for stage, stats in self.stats.items()}
+        report["inference"]["dropped_frames"] = self.inference_slot.dropped
+        report["display"]["dropped_frames"] = self.display_slot.dropped
+        report["scan"] = {
+            "mode": "adaptive" if self.stabilizer else "fixed",
+            "elapsed_s": round(self.elapsed, 2),
+            "stopped_early": self.stopped_early,
+        }
+        report["policy"] = self.policy.metrics()
+        if self.tracker:
+            report["tracker"] = {"tracks": self.tracker.next_id - 1, "objects": self.tracker.summary()}
+        return report
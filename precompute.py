@@ -0,0 +1,69 @@
+from collections import Counter
+
+from insights import normalize_objects
+
+# The most frequent logged object sets get their insights generated ahead of time
+PRECOMPUTE_TOP = 200
+PRECOMPUTE_MIN_COUNT = 2
+# Newest share of the log held out when estimating how well the ranking predicts future scans
+HOLDOUT_FRACTION = 0.2
+
+
+def rank_combinations(detection_sets, top=PRECOMPUTE_TOP, min_count=PRECOMPUTE_MIN_COUNT):
+    counts = Counter(tuple(normalize_objects(objects)) for objects in detection_sets)
+    counts.pop((), None)
+    return [(list(objects), count) for objects, count in counts.most_common(top) if count >= min_count]
+
+
+# Share of scans whose exact object set would be precomputed. in_sample ranks and scores the whole log; holdout
+# ranks the older scans and scores the newest ones, which is the better guess for the traffic still to come.
+def expected_hit_rate(detection_sets, top=PRECOMPUTE_TOP, min_count=PRECOMPUTE_MIN_COUNT, holdout=HOLDOUT_FRACTION):
+    keys = [tuple(normalize_objects(objects)) for objects in detection_sets]
+    keys = [key for key in keys if key]
+    if not keys:
+        return {"in_sample": 0.0, "holdout": 0.0, "holdout_scans": 0}
+
+    def coverage(ranked_from, scored):
+        selected = {tuple(objects) for objects, _ in rank_combinations(ranked_from, top, min_count)}
+        return sum(key in selected for key in scored) / len(scored) if scored else 0.0
+
+    split = int(len(keys) * (1 - holdout))
+    return {
+        "in_sample": round(coverage(keys, keys), 3),
+        "holdout": round(coverage(keys[:split], keys[split:]), 3),
+        "holdout_scans": len(keys) - split,
+    }
+
+
+# Queues every uncached set on the insight service at once; its semaphore and token bucket pace the upstream
+# calls, and results land in the same insight cache (and knowledge store) the app reads
+def precompute(service, detection_sets, top=PRECOMPUTE_TOP, min_count=PRECOMPUTE_MIN_COUNT, dry_run=False):
+    ranked = rank_combinations(detection_sets, top, min_count)
+    pending = [objects for objects, _ in ranked if service.cache is None or not service.cache.contains(objects)]
+    report = {
+        "logged_scans": len(detection_sets),
+        "distinct_sets": len({tuple(normalize_objects(objects)) for objects in detection_sets}),
+        "selected": len(ranked),
+        "already_cached": len(ranked) - len(pending),
+        "generated": 0,
+        "failed": 0,
+        "expected_hit_rate": expected_hit_rate(detection_sets, top, min_count),
+    }
+    if dry_run:
+        report["would_generate"] = [", ".join(objects) for objects in pending]
+        return report
+
+    futures = [service.submit(objects) for objects in pending]
+    for objects, future in zip(pending, futures):
+        try:
+            payload = future.result()
+        except Exception:
+            report["failed"] += 1
+            continue
+        # The cache drops payloads that fail validation and never stores incomplete ones; only what landed counts
+        if payload and (service.cache is None or service.cache.contains(objects)):
+            report["generated"] += 1
+        else:
+            report["failed"] += 1
+    report["service"] = {key: value for key, value in service.metrics().items() if isinstance(value, (int, float))}
+    return report
@@ -0,0 +1,70 @@
+import time
+
+import cv2
+import numpy as np
+
+from metrics import inc, span
+
+# The preview only has to show the user what the camera sees; pipeline.DISPLAY_FPS caps how often it is sent
+PREVIEW_WIDTH = 480
+JPEG_QUALITY = 70
+DRAW_BOXES = True
+BOX_COLOR = (0, 200, 255)
+
+
+# Downscales BGR frames into a reused buffer and JPEG-encodes them there. cv2 encodes BGR natively, so there is no
+# RGB conversion, and Streamlit ships the JPEG bytes as-is instead of PNG-encoding a full-resolution array.
+class PreviewEncoder:
+    def __init__(self, width=PREVIEW_WIDTH, quality=JPEG_QUALITY, draw_boxes=DRAW_BOXES):
+        self.width = width
+        self.draw_boxes = draw_boxes
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        self.buffer = None
+        self.frames = 0
+        self.bytes = 0
+        self.cpu_time = 0.0
+        self.started = time.monotonic()
+
+    def _target(self, frame):
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.width / width)
+        if scale == 1.0 and not self.draw_boxes:
+            return frame, scale
+        size = (round(width * scale), round(height * scale))
+        if self.buffer is None or self.buffer.shape[:2] != (size[1], size[0]):
+            self.buffer = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        cv2.resize(frame, size, dst=self.buffer, interpolation=cv2.INTER_AREA)
+        return self.buffer, scale
+
+    # Boxes are drawn on the downscaled buffer, never on the captured frame the inference stage may still read
+    def _draw(self, image, scale, detections):
+        for det in detections:
+            x1, y1, x2, y2 = (int(v * scale) for v in det.box)
+            cv2.rectangle(image, (x1, y1), (x2, y2), BOX_COLOR, 2)
+            cv2.putText(image, det.name, (x1 + 3, max(12, y1 - 4)), cv2.FONT_HERSHEY_SIMPLEX, 0.45, BOX_COLOR, 1)
+
+    def encode(self, frame, detections=()):
+        # Per-thread CPU: process_time would also count the inference thread and every other session's work
+        cpu_start = time.thread_time()
+        with span("preview_encode"):
+            image, scale = self._target(frame)
+            if self.draw_boxes:
+                self._draw(image, scale, detections)
+            ok, jpeg = cv2.imencode(".jpg", image, self.params)
+        self.cpu_time += time.thread_time() - cpu_start
+        if not ok:
+            return None
+        data = jpeg.tobytes()
+        self.frames += 1
+        self.bytes += len(data)
+        inc("preview_bytes", len(data))
+        return data
+
+    def metrics(self):
+        elapsed = time.monotonic() - self.started
+        return {
+            "frames": self.frames,
+            "kb_per_frame": round(self.bytes / self.frames / 1024, 1) if self.frames else 0.0,
+            "kb_per_s": round(self.bytes / elapsed / 1024, 1) if elapsed > 0 else 0.0,
+            "cpu_ms_per_frame": round(self.cpu_time / self.frames * 1000, 2) if self.frames else 0.0,
+        }
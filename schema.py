@@ -0,0 +1,144 @@
+import hashlib
+import json
+import threading
+import weakref
+import zlib
+
+from metrics import inc
+
+# Text sections longer than this are kept zlib-compressed and decoded on access
+COMPRESS_MIN_CHARS = 1024
+
+
+class InsightSchemaError(ValueError):
+    pass
+
+
+def _text(value):
+    return value.strip() if isinstance(value, str) else ""
+
+
+def _pack(text):
+    return zlib.compress(text.encode()) if len(text) >= COMPRESS_MIN_CHARS else text
+
+
+def _unpack(value):
+    return zlib.decompress(value).decode() if isinstance(value, bytes) else value
+
+
+# Options keep the letter order Gemini used; correct_text is resolved once so scoring is a single comparison
+class QuizItem:
+    __slots__ = ("question", "letters", "options", "correct_answer", "correct_text")
+
+    def __init__(self, question, letters, options, correct_answer):
+        self.question = question
+        self.letters = letters
+        self.options = options
+        self.correct_answer = correct_answer
+        self.correct_text = options[letters.index(correct_answer)]
+
+    # None if the item can't be shown or scored: no question, fewer than two options, or an answer not among them
+    @classmethod
+    def from_payload(cls, item):
+        if not isinstance(item, dict) or not _text(item.get("question")) or not isinstance(item.get("options"), dict):
+            return None
+        options = [(str(letter).strip().upper(), _text(text)) for letter, text in item["options"].items()]
+        options = [(letter, text) for letter, text in options if text]
+        letters = tuple(letter for letter, _ in options)
+        correct = _text(item.get("correct_answer")).upper()
+        if len(options) < 2 or correct not in letters or len(set(letters)) != len(letters):
+            return None
+        return cls(_text(item["question"]), letters, tuple(text for _, text in options), correct)
+
+    def is_correct(self, answer):
+        return answer == self.correct_text
+
+    def to_payload(self):
+        return {"question": self.question, "options": dict(zip(self.letters, self.options)),
+                "correct_answer": self.correct_answer}
+
+
+class Activity:
+    __slots__ = ("objects", "steps")
+
+    def __init__(self, objects, steps):
+        self.objects = objects
+        self.steps = steps
+
+    @classmethod
+    def from_payload(cls, item):
+        if not isinstance(item, dict) or not isinstance(item.get("steps"), list):
+            return None
+        steps = tuple(_text(step) for step in item["steps"] if _text(step))
+        objects = item.get("objects") if isinstance(item.get("objects"), list) else []
+        return cls(tuple(_text(name) for name in objects if _text(name)), steps) if steps else None
+
+    def to_payload(self):
+        return {"objects": list(self.objects), "steps": list(self.steps)}
+
+
+# Validated, read-only view of one insight payload. Malformed quiz items, activities and links are dropped
+# (counted as schema_rejects) instead of breaking the page later.
+class Insight:
+    __slots__ = ("_explanation", "_combined_usage", "activities", "quiz", "youtube_links", "__weakref__")
+
+    def __init__(self, explanation, combined_usage, activities, quiz, youtube_links):
+        self._explanation = _pack(explanation)
+        self._combined_usage = _pack(combined_usage)
+        self.activities = activities
+        self.quiz = quiz
+        self.youtube_links = youtube_links
+
+    @property
+    def detailed_explanation(self):
+        return _unpack(self._explanation)
+
+    @property
+    def combined_usage(self):
+        return _unpack(self._combined_usage)
+
+    @classmethod
+    def from_payload(cls, payload):
+        if not isinstance(payload, dict):
+            raise InsightSchemaError(f"insight payload must be an object, got {type(payload).__name__}")
+
+        def items(key, parse):
+            raw = payload.get(key)
+            raw = raw if isinstance(raw, list) else []
+            parsed = tuple(item for item in map(parse, raw) if item is not None)
+            if len(parsed) < len(raw):
+                inc("schema_rejects", len(raw) - len(parsed))
+            return parsed
+
+        return cls(
+            _text(payload.get("detailed_explanation")),
+            _text(payload.get("combined_usage")),
+            items("step_by_step_activity", Activity.from_payload),
+            items("quiz", QuizItem.from_payload),
+            items("youtube_links", lambda link: _text(link) or None),
+        )
+
+    def to_payload(self):
+        return {
+            "detailed_explanation": self.detailed_explanation,
+            "combined_usage": self.combined_usage,
+            "step_by_step_activity": [activity.to_payload() for activity in self.activities],
+            "youtube_links": list(self.youtube_links),
+            "quiz": [item.to_payload() for item in self.quiz],
+        }
+
+
+_shared = weakref.WeakValueDictionary()
+_shared_lock = threading.Lock()
+
+
+# Sessions that get the same payload (a cache hit, or coalesced requests) hold the same Insight object instead of
+# one decoded copy each. Entries disappear once no session references them.
+def shared_insight(payload):
+    digest = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).digest()
+    with _shared_lock:
+        insight = _shared.get(digest)
+        if insight is None:
+            insight = Insight.from_payload(payload)
+            _shared[digest] = insight
+    return insight
@@ -0,0 +1,142 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Unset: SQLite files next to the app, which pins every app worker to one host. A postgresql:// URL puts users,
+# scores, feedback, sessions and the insight cache in one server database shared by workers on any host.
+DATABASE_URL = os.environ.get("CURIOSCOPE_DATABASE_URL", "")
+POOL_SIZE = 8
+BUSY_TIMEOUT_MS = 5000
+
+
+# Fixed set of long-lived WAL connections shared by all sessions, instead of a connect/close per query
+class ConnectionPool:
+    dialect = "sqlite"
+    Error = sqlite3.Error
+    IntegrityError = sqlite3.IntegrityError
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self.commits = 0
+        self.commit_lock = threading.Lock()
+        self.connections = queue.LifoQueue(maxsize=size)
+        for _ in range(size):
+            self.connections.put(self._connect())
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False, cached_statements=64)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = self.connections.get()
+        try:
+            yield conn
+        finally:
+            self.connections.put(conn)
+
+    # durable=True fsyncs this commit (synchronous=FULL) instead of relying on the WAL checkpoint
+    @contextmanager
+    def transaction(self, durable=False):
+        with self.connection() as conn:
+            if durable:
+                conn.execute("PRAGMA synchronous=FULL")
+            try:
+                yield conn
+                conn.commit()
+                with self.commit_lock:
+                    self.commits += 1
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                if durable:
+                    conn.execute("PRAGMA synchronous=NORMAL")
+
+    def close(self):
+        for _ in range(self.size):
+            self.connections.get().close()
+
+
+# Gives a psycopg connection the sqlite3 surface the repositories use: qmark parameters, execute and executemany
+class PostgresConnection:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, statement, params=()):
+        return self.conn.execute(statement.replace("?", "%s"), params)
+
+    def executemany(self, statement, rows):
+        with self.conn.cursor() as cursor:
+            cursor.executemany(statement.replace("?", "%s"), rows)
+
+    def close(self):
+        self.conn.close()
+
+
+# Same interface as ConnectionPool over a PostgreSQL server. Needs `pip install "psycopg[binary]"`.
+# Connections run in autocommit so plain reads never leave a transaction open; transaction() issues BEGIN/COMMIT.
+# Every commit is already durable there, so durable=True changes nothing.
+class PostgresPool:
+    dialect = "postgres"
+
+    def __init__(self, url=DATABASE_URL, size=POOL_SIZE):
+        import psycopg
+
+        self.psycopg = psycopg
+        self.Error = psycopg.Error
+        self.IntegrityError = psycopg.IntegrityError
+        self.url = url
+        self.size = size
+        self.commits = 0
+        self.commit_lock = threading.Lock()
+        self.connections = queue.LifoQueue(maxsize=size)
+        for _ in range(size):
+            self.connections.put(self._connect())
+
+    def _connect(self):
+        return PostgresConnection(self.psycopg.connect(self.url, autocommit=True))
+
+    # A connection the server dropped (restart, failover, idle timeout) is replaced instead of handed out again
+    @contextmanager
+    def connection(self):
+        conn = self.connections.get()
+        try:
+            yield conn
+        except self.psycopg.OperationalError:
+            if conn.conn.closed:
+                conn = self._connect()
+            raise
+        finally:
+            self.connections.put(conn)
+
+    @contextmanager
+    def transaction(self, durable=False):
+        with self.connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+                with self.commit_lock:
+                    self.commits += 1
+            except Exception:
+                if not conn.conn.closed:
+                    conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        for _ in range(self.size):
+            self.connections.get().close()
+
+
+# path names the SQLite file this store keeps when no database server is configured
+def open_pool(path, size=POOL_SIZE):
+    if DATABASE_URL:
+        return PostgresPool(DATABASE_URL, size)
+    return ConnectionPool(path, size)
@@ -0,0 +1,44 @@
+import base64
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import auth
+
+
+def _token(text):
+    return base64.urlsafe_b64encode(text.encode()).decode()
+
+
+class SessionTokenTest(unittest.TestCase):
+    def test_round_trip(self):
+        self.assertEqual(auth.verify_session_token(auth.issue_session_token("ada")), "ada")
+
+    def test_tokens_issued_together_differ(self):
+        self.assertNotEqual(auth.issue_session_token("ada"), auth.issue_session_token("ada"))
+
+    def test_username_with_separator(self):
+        self.assertEqual(auth.verify_session_token(auth.issue_session_token("a|b")), "a|b")
+
+    def test_expired_token_is_rejected(self):
+        self.assertIsNone(auth.verify_session_token(auth.issue_session_token("ada", ttl=-1)))
+
+    def test_renewal_only_past_half_the_lifetime(self):
+        fresh = auth.issue_session_token("ada")
+        self.assertEqual(auth.renew_session_token(fresh), fresh)
+        ageing = auth.issue_session_token("ada", ttl=auth.SESSION_TTL // 4)
+        renewed = auth.renew_session_token(ageing)
+        self.assertNotEqual(renewed, ageing)
+        self.assertEqual(auth.verify_session_token(renewed), "ada")
+        self.assertIsNone(auth.renew_session_token(auth.issue_session_token("ada", ttl=-1)))
+
+    def test_malformed_tokens_are_rejected(self):
+        for token in ("", "!!!", _token("ada"), _token("ada|soon|n|abc"), _token("ada|9999999999|n|é"),
+                      _token("ada|9999999999|n|c2lnbmF0dXJl")):
+            self.assertIsNone(auth.verify_session_token(token), token)
+
+
+if __name__ == "__main__":
+    unittest.main()
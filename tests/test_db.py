@@ -0,0 +1,57 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import Repository, apply_migrations
+from storage import ConnectionPool
+
+
+class WriteBehindTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.pool = ConnectionPool(os.path.join(tmp.name, "users.db"), size=2)
+        self.addCleanup(self.pool.close)
+        apply_migrations(self.pool)
+        self.repository = Repository(self.pool)
+        # Long interval and large batch: nothing is committed until the test flushes or closes the queue
+        self.repository.enable_write_behind(batch_size=1000, flush_interval=60)
+        self.addCleanup(self.repository.write_queue.close)
+
+    def committed_scores(self):
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT username, score FROM leaderboard ORDER BY score DESC").fetchall()
+
+    def test_pending_score_shows_in_rank_and_leaderboard(self):
+        self.repository.save_quiz_score("grace", 3)
+        self.repository.write_queue.flush()
+        self.repository.save_quiz_score("ada", 5)
+
+        self.assertEqual(self.committed_scores(), [("grace", 3)])
+        self.assertEqual(self.repository.get_user_rank("ada"), (1, 5))
+        self.assertEqual([row[:2] for row in self.repository.get_leaderboard()], [("ada", 5), ("grace", 3)])
+        self.assertEqual([row[:2] for row in self.repository.get_leaderboard(limit=1, offset=1)], [("grace", 3)])
+
+    def test_flush_does_not_duplicate_rows(self):
+        self.repository.save_quiz_score("ada", 5)
+        self.repository.get_leaderboard()
+        self.repository.write_queue.flush()
+        self.assertEqual([row[:2] for row in self.repository.get_leaderboard()], [("ada", 5)])
+        self.assertEqual(self.repository.get_user_rank("ada"), (1, 5))
+
+    def test_close_flushes_pending_rows(self):
+        self.repository.save_quiz_score("ada", 5)
+        self.repository.save_feedback("ada", 9, "great")
+        self.repository.write_queue.close()
+
+        self.assertEqual(self.committed_scores(), [("ada", 5)])
+        with self.pool.connection() as conn:
+            self.assertEqual(conn.execute("SELECT username, rating FROM feedback").fetchall(), [("ada", 9)])
+        self.assertEqual(self.repository.write_queue.pending_scores(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import insight_service
+from fake_gemini import FakeGeminiModel, fake_payload
+from insight_service import TRANSIENT_ERRORS, InsightService
+from insights import InsightCache
+from knowledge import compose, parse_fragments
+from schema import InsightSchemaError
+
+OBJECTS = ["cup", "book"]
+
+
+class InsightServiceStreamTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_concurrent_streams_share_one_upstream_call(self):
+        model = FakeGeminiModel(latency=0.5)
+        service = InsightService(model)
+        results = []
+
+        def session():
+            results.append(service.stream(OBJECTS, lambda key, value: None))
+
+        threads = [threading.Thread(target=session) for _ in range(2)]
+        threads[0].start()
+        # Let the first session claim the key before the second one asks
+        time.sleep(0.1)
+        threads[1].start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(service.metrics()["coalesced"], 1)
+        self.assertEqual(results[0], results[1])
+        self.assertTrue(results[0][1])
+        self.assertFalse(service.in_flight)
+
+    @mock.patch.object(insight_service, "BACKOFF_BASE", 0.001)
+    def test_transient_failures_before_the_first_chunk_are_retried(self):
+        random_state = insight_service.random.getstate()
+        insight_service.random.seed(7)
+        self.addCleanup(insight_service.random.setstate, random_state)
+        service = InsightService(FakeGeminiModel(failure_rate=0.5), rate=1000, burst=1000)
+        ok = 0
+        for n in range(20):
+            try:
+                payload, complete = service.stream([f"object{n}"], lambda key, value: None)
+                ok += complete
+            except TRANSIENT_ERRORS:
+                pass
+        metrics = service.metrics()
+        self.assertGreater(metrics["retries"], 0)
+        self.assertGreaterEqual(ok, 17)
+        self.assertEqual(metrics["failures"], 20 - ok)
+
+    def test_a_stalled_stream_times_out(self):
+        class StalledModel:
+            def generate_content(self, prompt, stream=False):
+                time.sleep(1)
+                return iter(())
+
+        service = InsightService(StalledModel(), max_retries=0, timeout=0.1)
+        with self.assertRaises(TRANSIENT_ERRORS):
+            service.stream(OBJECTS, lambda key, value: None)
+        self.assertEqual(service.metrics()["failures"], 1)
+        self.assertFalse(service.in_flight)
+
+    def test_cache_hits_skip_the_rate_limit(self):
+        model = FakeGeminiModel()
+        cache = InsightCache(os.path.join(self.tmp.name, "cache.db"))
+        cache.put(OBJECTS, fake_payload(OBJECTS))
+        service = InsightService(model, cache, rate=0.01, burst=1)
+
+        start = time.monotonic()
+        for _ in range(5):
+            payload, complete = service.stream(OBJECTS, lambda key, value: None)
+            self.assertTrue(complete)
+            self.assertEqual(payload, fake_payload(OBJECTS))
+
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(model.calls, 0)
+        self.assertEqual(service.metrics()["upstream_calls"], 0)
+
+
+class InsightCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache = InsightCache(os.path.join(self.tmp.name, "cache.db"))
+
+    def test_invalid_payloads_are_not_stored(self):
+        self.assertFalse(self.cache.put(OBJECTS, ["not", "an", "object"]))
+        self.assertFalse(self.cache.put(OBJECTS, {"quiz": [{"question": "broken"}]}))
+        self.assertIsNone(self.cache.get(OBJECTS))
+
+    def test_hits_do_not_write(self):
+        self.cache.put(OBJECTS, fake_payload(OBJECTS))
+        commits = self.cache.pool.commits
+        for _ in range(5):
+            self.assertIsNotNone(self.cache.get(OBJECTS))
+        self.assertEqual(self.cache.pool.commits, commits)
+        self.assertEqual(len(self.cache.touched), 1)
+
+        # Pending touches go out with the next put, before eviction looks at last_access
+        self.cache.put(["book"], fake_payload(["book"]))
+        self.assertEqual(self.cache.touched, {})
+
+    def test_expired_entries_are_not_served(self):
+        self.cache.put(OBJECTS, fake_payload(OBJECTS))
+        self.cache.ttl = -1
+        self.assertIsNone(self.cache.get(OBJECTS))
+
+    def test_malformed_items_are_dropped_before_storing(self):
+        payload = fake_payload(OBJECTS)
+        payload["quiz"].append({"question": "No options"})
+        self.assertTrue(self.cache.put(OBJECTS, payload))
+        self.assertEqual(self.cache.get(OBJECTS), fake_payload(OBJECTS))
+
+
+class KnowledgeSchemaTest(unittest.TestCase):
+    def test_non_object_json_is_a_schema_error(self):
+        with self.assertRaises(InsightSchemaError):
+            parse_fragments('["cup", "book"]', OBJECTS)
+        with self.assertRaises(InsightSchemaError):
+            compose(OBJECTS, {}, ["not", "an", "object"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import glob
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from insights import StreamingInsightParser, parse_response
+
+RESPONSE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fixtures",
+                            "gemini_responses")
+
+# Strings with escaped quotes, backslashes, braces, brackets and commas, plus bare literals inside and outside lists
+TRICKY = {
+    "detailed_explanation": 'A "cup" {holds} [liquids], \\ and \\"more\\" — ☕',
+    "combined_usage": "Use them together: {a, b} and [c]",
+    "step_by_step_activity": [
+        {"objects": ["cup", "laptop"], "steps": ["Step 1: say \"hi\"", "Step 2: } ] , {"]},
+        {"objects": [], "steps": []},
+    ],
+    "youtube_links": ["https://www.youtube.com/watch?v=a,b", "https://www.youtube.com/watch?v=\\u00e9"],
+    "quiz": [{"question": "Q?", "options": {"A": "x", "B": "y"}, "correct_answer": "A"}],
+    "rating": 4.5,
+    "flags": [True, False, None, 12, -3.25e2],
+    "done": True,
+    "extra": None,
+}
+
+
+def fenced(payload):
+    return f"```json\n{json.dumps(payload, indent=2, ensure_ascii=False)}\n```"
+
+
+def expected_events(payload):
+    events = []
+    for key, value in payload.items():
+        if isinstance(value, list):
+            events.extend((key, item) for item in value)
+        else:
+            events.append((key, value))
+    return events
+
+
+def stream(text, chunk_size):
+    parser = StreamingInsightParser()
+    events = []
+    for start in range(0, len(text), chunk_size):
+        events.extend(parser.feed(text[start:start + chunk_size]))
+    return parser, events
+
+
+class StreamingInsightParserTest(unittest.TestCase):
+    def check_every_chunk_size(self, payload, text):
+        for chunk_size in range(1, len(text) + 1):
+            parser, events = stream(text, chunk_size)
+            self.assertEqual(events, expected_events(payload), f"chunk size {chunk_size}")
+            self.assertEqual(parser.finish(), (payload, True), f"chunk size {chunk_size}")
+
+    def test_tricky_payload_at_every_chunk_size(self):
+        self.check_every_chunk_size(TRICKY, fenced(TRICKY))
+
+    def test_compact_json_without_fence(self):
+        self.check_every_chunk_size(TRICKY, json.dumps(TRICKY, separators=(",", ":")))
+
+    def test_recorded_responses(self):
+        paths = sorted(glob.glob(os.path.join(RESPONSE_DIR, "*.txt")))
+        self.assertTrue(paths)
+        for path in paths:
+            with open(path) as f:
+                text = f.read()
+            payload = parse_response(text)
+            for chunk_size in (1, 2, 3, 7, 64, 1000, len(text)):
+                parser, events = stream(text, chunk_size)
+                self.assertEqual(events, expected_events(payload), f"{path} chunk size {chunk_size}")
+                self.assertEqual(parser.finish(), (payload, True))
+
+    def test_truncated_stream_keeps_finished_sections(self):
+        text = fenced(TRICKY)
+        cut = text.index('"Step 2')
+        for chunk_size in (1, 5, cut):
+            parser, events = stream(text[:cut], chunk_size)
+            self.assertEqual(events, [("detailed_explanation", TRICKY["detailed_explanation"]),
+                                      ("combined_usage", TRICKY["combined_usage"])])
+            self.assertEqual(parser.finish(), ({
+                "detailed_explanation": TRICKY["detailed_explanation"],
+                "combined_usage": TRICKY["combined_usage"],
+                "step_by_step_activity": [],
+            }, False))
+
+    def test_truncated_before_any_section_raises(self):
+        parser, events = stream(fenced(TRICKY)[:30], 4)
+        self.assertEqual(events, [])
+        with self.assertRaises(json.JSONDecodeError):
+            parser.finish()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from pipeline import ScanStabilizer
+except ImportError:  # pipeline needs OpenCV
+    ScanStabilizer = None
+
+
+@unittest.skipIf(ScanStabilizer is None, "needs opencv-python")
+class ScanStabilizerTest(unittest.TestCase):
+    def test_stable_after_enough_unchanged_frames(self):
+        stabilizer = ScanStabilizer(min_hits=2, stable_frames=3, stable_ms=60_000)
+        self.assertFalse(stabilizer.update({"cup"}, now=0.0))
+        # Second sighting confirms the cup, which counts as a change
+        self.assertFalse(stabilizer.update({"cup"}, now=0.1))
+        self.assertFalse(stabilizer.update({"cup"}, now=0.2))
+        self.assertFalse(stabilizer.update({"cup"}, now=0.3))
+        self.assertTrue(stabilizer.update({"cup"}, now=0.4))
+        self.assertEqual(stabilizer.confirmed, {"cup"})
+
+    def test_single_frame_flicker_does_not_reset(self):
+        stabilizer = ScanStabilizer(min_hits=2, stable_frames=3, stable_ms=60_000)
+        for n in range(5):
+            stabilizer.update({"cup"}, now=n * 0.1)
+        self.assertTrue(stabilizer.update({"cup", "bottle"}, now=0.5))
+        self.assertEqual(stabilizer.confirmed, {"cup"})
+        # A second sighting confirms the bottle, and the set has to settle again
+        self.assertFalse(stabilizer.update({"bottle"}, now=0.6))
+        self.assertEqual(stabilizer.confirmed, {"cup", "bottle"})
+
+    def test_stable_after_enough_time(self):
+        stabilizer = ScanStabilizer(min_hits=1, stable_frames=100, stable_ms=500)
+        self.assertFalse(stabilizer.update({"cup"}, now=10.0))
+        self.assertFalse(stabilizer.update({"cup"}, now=10.4))
+        self.assertTrue(stabilizer.update({"cup"}, now=10.6))
+
+    def test_empty_scene_is_never_stable(self):
+        stabilizer = ScanStabilizer(min_hits=1, stable_frames=1, stable_ms=0)
+        for n in range(10):
+            self.assertFalse(stabilizer.update(set(), now=float(n)))
+        self.assertFalse(stabilizer.is_stable(now=100.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
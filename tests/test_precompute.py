@@ -0,0 +1,40 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_gemini import FakeGeminiModel, FakeResponse
+from insight_service import InsightService
+from insights import InsightCache
+from precompute import precompute
+
+DETECTION_SETS = [["cup", "book"]] * 3 + [["laptop"]] * 2
+
+
+# Well-formed JSON with nothing the app can show, which the insight cache refuses to store
+class EmptyPayloadModel:
+    def generate_content(self, prompt, stream=False):
+        return FakeResponse('{"detailed_explanation": "", "quiz": []}')
+
+
+class PrecomputeTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache = InsightCache(os.path.join(tmp.name, "cache.db"))
+
+    def test_generates_and_caches_the_ranked_sets(self):
+        report = precompute(InsightService(FakeGeminiModel(), self.cache), DETECTION_SETS)
+        self.assertEqual((report["selected"], report["generated"], report["failed"]), (2, 2, 0))
+        self.assertTrue(self.cache.contains(["book", "cup"]))
+
+    def test_payloads_the_cache_rejects_count_as_failed(self):
+        report = precompute(InsightService(EmptyPayloadModel(), self.cache), DETECTION_SETS)
+        self.assertEqual((report["generated"], report["failed"]), (0, 2))
+        self.assertFalse(self.cache.contains(["book", "cup"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
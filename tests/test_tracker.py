@@ -0,0 +1,66 @@
+import os
+import sys
+import unittest
+from collections import namedtuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import numpy as np
+
+    from tracker import IoUTracker, describe_summary, iou_matrix
+except ImportError:  # the tracker needs numpy
+    np = None
+
+# Same fields as detector.Detection, without loading a detector backend
+Det = namedtuple("Det", ["name", "confidence", "box"])
+
+
+@unittest.skipIf(np is None, "needs numpy")
+class IoUTrackerTest(unittest.TestCase):
+    def test_iou_matrix(self):
+        a = np.array([[0, 0, 10, 10]], dtype=np.float32)
+        b = np.array([[0, 0, 10, 10], [20, 20, 30, 30], [5, 0, 15, 10]], dtype=np.float32)
+        np.testing.assert_allclose(iou_matrix(a, b), [[1.0, 0.0, 1 / 3]], rtol=1e-6)
+
+    def test_counts_dwell_and_confidence(self):
+        tracker = IoUTracker(match_iou=0.3, max_age=1.0, min_hits=3)
+        for n in range(5):
+            detections = [Det("cup", 0.8, (5 * n, 0, 100 + 5 * n, 100)), Det("cup", 0.9, (200, 0, 300, 100))]
+            # Seen twice only: below min_hits, so it is noise
+            if n < 2:
+                detections.append(Det("book", 0.7, (0, 200, 100, 300)))
+            tracker.update(detections, now=n * 0.5)
+
+        summary = tracker.summary()
+        self.assertEqual(set(summary), {"cup"})
+        cup = summary["cup"]
+        self.assertEqual((cup["count"], cup["tracks"], cup["dwell_s"]), (2, 2, 2.0))
+        self.assertAlmostEqual(cup["confidence_max"], 0.9)
+        self.assertAlmostEqual(cup["confidence_mean"], 0.85)
+
+    def test_different_classes_never_match(self):
+        tracker = IoUTracker(min_hits=1)
+        tracker.update([Det("cup", 0.8, (0, 0, 100, 100))], now=0.0)
+        tracker.update([Det("bottle", 0.8, (0, 0, 100, 100))], now=0.1)
+        self.assertEqual(sorted(track.name for track in tracker.active), ["bottle", "cup"])
+
+    def test_a_gap_longer_than_max_age_starts_a_new_track(self):
+        tracker = IoUTracker(max_age=1.0, min_hits=1)
+        for now in (0.0, 0.1, 0.2):
+            tracker.update([Det("cup", 0.8, (0, 0, 100, 100))], now=now)
+        tracker.update([], now=1.5)
+        self.assertEqual([track.id for track in tracker.closed], [1])
+        tracker.update([Det("cup", 0.8, (0, 0, 100, 100))], now=1.6)
+        self.assertEqual([track.id for track in tracker.active], [2])
+
+        cup = tracker.summary()["cup"]
+        self.assertEqual((cup["count"], cup["tracks"], cup["dwell_s"]), (1, 2, 0.2))
+
+    def test_describe_summary(self):
+        summary = {"cup": {"count": 1, "dwell_s": 2.0}, "book": {"count": 3, "dwell_s": 6.0}}
+        self.assertEqual(describe_summary(summary), "3 books, held in view for 6 s; 1 cup, held in view for 2 s")
+
+
+if __name__ == "__main__":
+    unittest.main()
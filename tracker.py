@@ -0,0 +1,137 @@
+import time
+
+import numpy as np
+
+from metrics import span
+
+# IoU tracker: each frame's detections are matched to live tracks of the same class, highest overlap first
+MATCH_IOU = 0.3
+# A track survives this long without a match (occlusion, a missed frame) before it is closed
+MAX_AGE_S = 1.0
+# Tracks matched fewer times than this are treated as noise in the summary
+MIN_TRACK_HITS = 3
+
+
+class Track:
+    __slots__ = ("id", "name", "box", "first_seen", "last_seen", "hits", "confidence_sum", "confidence_max")
+
+    def __init__(self, track_id, name, box, confidence, now):
+        self.id = track_id
+        self.name = name
+        self.box = box
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 1
+        self.confidence_sum = confidence
+        self.confidence_max = confidence
+
+    def update(self, box, confidence, now):
+        self.box = box
+        self.last_seen = now
+        self.hits += 1
+        self.confidence_sum += confidence
+        self.confidence_max = max(self.confidence_max, confidence)
+
+    def dwell(self):
+        return self.last_seen - self.first_seen
+
+
+# (T, 4) x (D, 4) boxes -> (T, D) IoU matrix
+def iou_matrix(a, b):
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+class IoUTracker:
+    def __init__(self, match_iou=MATCH_IOU, max_age=MAX_AGE_S, min_hits=MIN_TRACK_HITS):
+        self.match_iou = match_iou
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.active = []
+        self.closed = []
+        self.next_id = 1
+        self.peak_counts = {}
+
+    # Greedy assignment over the IoU matrix, best pair first; pairs of different classes never match
+    def _associate(self, detections):
+        if not self.active or not detections:
+            return []
+        iou = iou_matrix(np.array([track.box for track in self.active], dtype=np.float32),
+                         np.array([det.box for det in detections], dtype=np.float32))
+        track_names = np.array([track.name for track in self.active])
+        det_names = np.array([det.name for det in detections])
+        iou[track_names[:, None] != det_names[None, :]] = 0.0
+
+        candidates = np.argwhere(iou >= self.match_iou)
+        order = np.argsort(-iou[candidates[:, 0], candidates[:, 1]], kind="stable")
+        used_tracks, used_dets, matches = set(), set(), []
+        for t, d in candidates[order]:
+            if t not in used_tracks and d not in used_dets:
+                used_tracks.add(t)
+                used_dets.add(d)
+                matches.append((t, d))
+        return matches
+
+    def update(self, detections, now=None):
+        now = time.monotonic() if now is None else now
+        with span("tracker"):
+            matches = self._associate(detections)
+            matched = set()
+            for t, d in matches:
+                det = detections[d]
+                self.active[t].update(det.box, det.confidence, now)
+                matched.add(d)
+            for d, det in enumerate(detections):
+                if d not in matched:
+                    self.active.append(Track(self.next_id, det.name, det.box, det.confidence, now))
+                    self.next_id += 1
+
+            still_active = []
+            for track in self.active:
+                (still_active if now - track.last_seen <= self.max_age else self.closed).append(track)
+            self.active = still_active
+
+            # How many of each object were in view at once, counting only tracks that have proven themselves
+            visible = {}
+            for track in self.active:
+                if track.last_seen == now and track.hits >= self.min_hits:
+                    visible[track.name] = visible.get(track.name, 0) + 1
+            for name, count in visible.items():
+                self.peak_counts[name] = max(self.peak_counts.get(name, 0), count)
+
+    # Per object: peak simultaneous count, longest time one instance stayed in view, and confidence aggregates
+    def summary(self):
+        summary = {}
+        for track in self.closed + self.active:
+            if track.hits < self.min_hits:
+                continue
+            entry = summary.setdefault(track.name, {"count": self.peak_counts.get(track.name, 1), "tracks": 0,
+                                                    "dwell_s": 0.0, "confidence_max": 0.0, "_sum": 0.0, "_hits": 0})
+            entry["tracks"] += 1
+            entry["dwell_s"] = max(entry["dwell_s"], track.dwell())
+            entry["confidence_max"] = max(entry["confidence_max"], track.confidence_max)
+            entry["_sum"] += track.confidence_sum
+            entry["_hits"] += track.hits
+        for entry in summary.values():
+            entry["confidence_mean"] = round(entry.pop("_sum") / entry.pop("_hits"), 3)
+            entry["confidence_max"] = round(entry["confidence_max"], 3)
+            entry["dwell_s"] = round(entry["dwell_s"], 1)
+        return summary
+
+
+# "3 books, held in view for 6 s; 1 cup, held in view for 2 s"
+def describe_summary(summary):
+    parts = []
+    for name in sorted(summary):
+        entry = summary[name]
+        count = entry["count"]
+        label = name if count == 1 or name.endswith("s") else f"{name}s"
+        parts.append(f"{count} {label}, held in view for {entry['dwell_s']:.0f} s")
+    return "; ".join(parts)
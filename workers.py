@@ -0,0 +1,148 @@
+import ipaddress
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import AuthenticationError, Client, Listener
+
+import cv2
+import numpy as np
+
+from detector import Detection, filter_objects
+from metrics import inc, span
+
+# host:port of detector worker processes (`python -m curioscope detector-worker --listen host:port`), comma-separated.
+# Empty runs the model inside each app process. With workers, app processes never load the model and detection
+# scales on its own: frames from every app worker are micro-batched together inside each detector worker.
+DETECTOR_WORKERS = [address.strip() for address in os.environ.get("CURIOSCOPE_DETECTOR_WORKERS", "").split(",")
+                    if address.strip()]
+# Shared by app and detector workers; connections with a different key are refused. Without
+# CURIOSCOPE_WORKER_AUTHKEY a well-known local key is used, and workers will only listen on loopback with it.
+LOCAL_AUTHKEY = b"curioscope-local"
+WORKER_AUTHKEY = os.environ.get("CURIOSCOPE_WORKER_AUTHKEY", "").encode() or LOCAL_AUTHKEY
+CONNECTIONS_PER_WORKER = 4
+# Frames cross the network as JPEG: about 40 KB at 640x480 instead of 900 KB raw
+FRAME_JPEG_QUALITY = 90
+WORKER_RETRIES = 2
+
+
+def parse_address(text):
+    host, port = text.rsplit(":", 1)
+    return host, int(port)
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+# Replies are JSON rather than pickles, so a peer can never make the other side unpickle arbitrary objects
+def _reply(conn, status, result):
+    conn.send_bytes(json.dumps([status, result]).encode())
+
+
+def _handle(conn, scheduler):
+    with conn:
+        while True:
+            try:
+                data = conn.recv_bytes()
+            except (EOFError, OSError):
+                return
+            try:
+                frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+                detections = scheduler.detect(frame)
+                _reply(conn, "ok", [(det.name, float(det.confidence), [float(v) for v in det.box]) for det in detections])
+            except Exception as e:
+                _reply(conn, "error", repr(e))
+
+
+# Runs in the detector worker process: one thread per app connection, all feeding the same BatchScheduler
+def serve(address, scheduler):
+    if WORKER_AUTHKEY == LOCAL_AUTHKEY and not is_loopback(address[0]):
+        raise RuntimeError(f"set CURIOSCOPE_WORKER_AUTHKEY to a shared secret before listening on {address[0]}")
+    with Listener(address, authkey=WORKER_AUTHKEY) as listener:
+        while True:
+            try:
+                conn = listener.accept()
+            except (AuthenticationError, OSError):
+                continue
+            threading.Thread(target=_handle, args=(conn, scheduler), name="detector-conn", daemon=True).start()
+
+
+class RemoteDetectorError(RuntimeError):
+    pass
+
+
+# Client side, with the same detect(frame) as BatchScheduler. Connections are opened on demand, spread over the
+# workers round-robin and reused; one that fails is dropped and the frame retried on another.
+class RemoteDetectorPool:
+    def __init__(self, addresses=DETECTOR_WORKERS, connections_per_worker=CONNECTIONS_PER_WORKER):
+        self.addresses = [parse_address(address) if isinstance(address, str) else address for address in addresses]
+        self.next_address = itertools.cycle(self.addresses)
+        self.address_lock = threading.Lock()
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(len(self.addresses) * connections_per_worker)
+        self.frames = 0
+        self.failures = 0
+        self.round_trip = 0.0
+        self.stats_lock = threading.Lock()
+
+    def _connect(self):
+        with self.address_lock:
+            address = next(self.next_address)
+        return Client(address, authkey=WORKER_AUTHKEY)
+
+    def _round_trip(self, data):
+        try:
+            conn = self.idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            conn.send_bytes(data)
+            status, result = json.loads(conn.recv_bytes())
+        except (EOFError, OSError):
+            conn.close()
+            raise
+        self.idle.put(conn)
+        if status != "ok":
+            raise RemoteDetectorError(result)
+        return [Detection(name, confidence, box) for name, confidence, box in result]
+
+    def detect(self, frame):
+        with span("frame_encode"):
+            data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, FRAME_JPEG_QUALITY])[1].tobytes()
+        started = time.perf_counter()
+        with self.slots:
+            for attempt in range(WORKER_RETRIES + 1):
+                try:
+                    detections = self._round_trip(data)
+                    break
+                except (EOFError, OSError, AuthenticationError) as e:
+                    inc("detector_worker_failures")
+                    with self.stats_lock:
+                        self.failures += 1
+                    if attempt == WORKER_RETRIES:
+                        raise RemoteDetectorError(f"no detector worker reachable: {e!r}") from e
+        with self.stats_lock:
+            self.frames += 1
+            self.round_trip += time.perf_counter() - started
+        return detections
+
+    def detect_objects(self, frame):
+        return filter_objects(self.detect(frame))
+
+    def metrics(self):
+        with self.stats_lock:
+            return {
+                "workers": len(self.addresses),
+                "frames": self.frames,
+                "failures": self.failures,
+                "mean_round_trip_ms": round(self.round_trip / self.frames * 1000, 2) if self.frames else 0.0,
+                "idle_connections": self.idle.qsize(),
+            }